@@ -0,0 +1,163 @@
+# agregacoes.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import metricas
+
+CASAL = "Casal"
+
+
+def versao_dados(df):
+    """
+    Identificador da versão dos dados: o checksum gravado no snapshot
+    ou, na falta dele, um hash do conteúdo do DataFrame.
+    """
+    versao = df.attrs.get("versao")
+    if versao is None:
+        versao = str(pd.util.hash_pandas_object(df, index=False).sum())
+    return versao
+
+
+def _saldo_diario(impacto_por_dia):
+    """
+    Transforma a soma dos lançamentos de cada dia no saldo ao fim do dia,
+    com um ponto por dia corrido (dias sem lançamento repetem o saldo anterior).
+    """
+    saldo = impacto_por_dia.sort_index().cumsum()
+    saldo = saldo.resample("D").last().ffill()
+    saldo.index.name = "Data"
+    return saldo.rename("Saldo Diario").reset_index()
+
+
+def _agregar(cubo):
+    """
+    Monta as agregações de um usuário (ou do casal) a partir do cubo
+    Mes/Ano x Tipo x Categoria já somado.
+    """
+    # Receitas e despesas por mês, lado a lado (uma linha por mês, em ordem cronológica)
+    mensal = (
+        cubo.groupby(["Mes/Ano", "Tipo"], observed=True)["Valor"].sum()
+        .unstack("Tipo", fill_value=0)
+        .reindex(columns=["Receita", "Despesa"], fill_value=0)
+        .sort_index()
+    )
+    mensal.columns = list(mensal.columns)
+    mensal.index = mensal.index.astype(str)
+    mensal.index.name = "Mes/Ano"
+
+    despesas = cubo[cubo["Tipo"] == "Despesa"]
+    receita_total = float(mensal["Receita"].sum())
+    despesa_total = float(mensal["Despesa"].sum())
+
+    saldo_mensal = (mensal["Receita"] - mensal["Despesa"]).rename("Saldo Mensal").reset_index()
+    saldo_mensal["Saldo Acumulado Mensal"] = saldo_mensal["Saldo Mensal"].cumsum()
+
+    return {
+        "receita_total": receita_total,
+        "despesa_total": despesa_total,
+        "saldo": receita_total - despesa_total,
+        "despesas_categoria": (
+            despesas.groupby("Categoria", observed=True)["Valor"].sum().reset_index()
+        ),
+        "despesas_mensais_categoria": (
+            despesas.groupby(["Mes/Ano", "Categoria"], observed=True)["Valor"].sum().reset_index()
+            .astype({"Mes/Ano": str})
+        ),
+        "mensal": mensal.reset_index().melt(
+            id_vars=["Mes/Ano"], value_vars=["Receita", "Despesa"],
+            var_name="Tipo de Lançamento", value_name="Valor Mensal",
+        ),
+        "saldo_mensal": saldo_mensal,
+    }
+
+
+def calcular_agregados(df):
+    """
+    Calcula, em uma única passada, todas as agregações dos gráficos para cada
+    usuário e para o casal. Retorna um dicionário {usuario: agregações}.
+    """
+    # Cubo base: uma linha por (Usuario, Mes/Ano, Tipo, Categoria). Todo o resto sai dele.
+    cubo = df.groupby(["Usuario", "Mes/Ano", "Tipo", "Categoria"], observed=True)["Valor"].sum().reset_index()
+
+    # Impacto de cada lançamento no saldo: receitas somam, despesas subtraem
+    sinal = np.where(df["Tipo"] == "Receita", 1.0, -1.0)
+    impacto = pd.DataFrame({"Usuario": df["Usuario"], "Data": df["Data"], "Impacto": df["Valor"].to_numpy() * sinal})
+    impacto_diario = impacto.groupby(["Usuario", "Data"], observed=True)["Impacto"].sum().reset_index()
+
+    return agregar_cubo(cubo, impacto_diario)
+
+
+def agregar_cubo(cubo, impacto_diario):
+    """
+    Monta as agregações a partir do cubo (Usuario, Mes/Ano, Tipo, Categoria, Valor)
+    e do impacto diário no saldo (Usuario, Data, Impacto), já somados.
+    Esses dois podem vir do pandas ou direto de um banco (ver armazenamento.py).
+    """
+    impacto_diario = impacto_diario.set_index(["Usuario", "Data"])["Impacto"]
+
+    agregados = {}
+    for usuario, cubo_usuario in cubo.groupby("Usuario", observed=True):
+        agregados[str(usuario)] = _agregar(cubo_usuario)
+        agregados[str(usuario)]["saldo_diario"] = _saldo_diario(impacto_diario.xs(usuario, level="Usuario"))
+
+    casal = _agregar(cubo.groupby(["Mes/Ano", "Tipo", "Categoria"], observed=True)["Valor"].sum().reset_index())
+    casal["despesas_por_usuario"] = (
+        cubo[cubo["Tipo"] == "Despesa"].groupby("Usuario", observed=True)["Valor"].sum().reset_index()
+    )
+    casal["saldo_diario"] = _saldo_diario(impacto_diario.groupby(level="Data").sum())
+    agregados[CASAL] = casal
+    return agregados
+
+
+def reduzir_lttb(x, y, pontos):
+    """
+    Reduz uma série para no máximo `pontos` pontos com o algoritmo
+    Largest-Triangle-Three-Buckets, preservando picos e vales do desenho.
+    Retorna os índices dos pontos escolhidos.
+    """
+    n = len(y)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # Primeiro e último pontos ficam sempre; o miolo é dividido em baldes
+    limites = np.linspace(1, n - 1, pontos - 1).astype(int)
+    escolhidos = np.empty(pontos, dtype=int)
+    escolhidos[0] = 0
+    escolhidos[-1] = n - 1
+
+    anterior = 0
+    for i in range(pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo balde (ou o último ponto, no último balde)
+        prox_inicio, prox_fim = fim, limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+
+        # Ponto do balde que forma o maior triângulo com o anterior e a média do próximo
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(areas.argmax())
+        escolhidos[i + 1] = anterior
+
+    return escolhidos
+
+
+@st.cache_data(max_entries=4)
+def _agregados_por_versao(versao, _df, _armazenamento=None):
+    metricas.marcar_execucao()
+    # Se o armazenamento souber agregar sozinho (SQL), só o resultado vem para o pandas
+    if _armazenamento is not None and hasattr(_armazenamento, "consultar_cubo"):
+        return agregar_cubo(*_armazenamento.consultar_cubo())
+    return calcular_agregados(_df)
+
+
+def obter_agregados(df, armazenamento=None):
+    """
+    Retorna as agregações do DataFrame, calculadas uma vez por versão dos dados.
+    """
+    return metricas.chamar_cacheado("agregados", _agregados_por_versao, versao_dados(df), df, armazenamento)
@@ -1,16 +1,38 @@
+import time
+import json
+import logging
+inicio_script = time.perf_counter() # Para o relatório de tempos de inicialização
+
 import streamlit as st
 import pandas as pd
 from datetime import date
-import plotly.express as px
-from sheets_connector import salvar_dado, carregar_dados
-from gpt_insights import gerar_insight
+from sheets_connector import salvar_dado, salvar_lancamentos, recarregar_dados, lancamentos_pendentes, carregar_dados, estado_dados, status_fila, obter_armazenamento
+from gpt_insights import iniciar_insight, gerar_insight_stream
+from agregacoes import obter_agregados, versao_dados, CASAL
+from graficos import (figura_despesas_categoria, figura_evolucao_saldo, figura_despesas_mensais_categoria,
+                      figura_mensal, figura_saldo_acumulado, figura_despesas_por_usuario, figura_memorizada)
+from consultas import obter_indice
+from importacao import ler_extrato, importar_extrato, obter_indice_hashes
+import metricas
 import os # Importe o módulo os para depuração, se necessário
+fim_importacoes = time.perf_counter()
 
 st.set_page_config(page_title="Finanças do casal Carol e Marcio", layout="wide")
 
+# Abrir o app com ?debug=1 liga as métricas de desempenho desta sessão (ver metricas.py) e o painel na sidebar
+modo_debug = st.query_params.get("debug") == "1"
+metricas.ativar_sessao(modo_debug)
+
 
 
 st.title("Finanças do casal Carol e Marcio")
+# Planilha e OpenAI só se conectam no primeiro uso (ver sheets_connector.obter_worksheet e gpt_insights.obter_backend)
+tempos_inicializacao = {
+    "importacoes_ms": (fim_importacoes - inicio_script) * 1000,
+    "primeira_pintura_ms": (time.perf_counter() - inicio_script) * 1000,
+}
+logging.getLogger(__name__).info("Tempos de inicialização: %s", tempos_inicializacao)
+metricas.registrar_etapa("app/importacoes", fim_importacoes - inicio_script)
 
 # --- Adicionado: Imagem e botões de visualização na Sidebar ---
 st.sidebar.image("foto.jpg", use_container_width=True) # Logo com fundo azul e texto branco
@@ -29,6 +51,32 @@ with col_desktop:
 
 st.sidebar.info(f"Modo de exibição: **{st.session_state.display_mode.capitalize()}**")
 
+# Status da fila de envio para a planilha, atualizado sozinho a cada INTERVALO_STATUS segundos
+INTERVALO_STATUS = 5
+
+@st.fragment(run_every=INTERVALO_STATUS)
+def status_envio():
+    """
+    Os dados são atualizados em segundo plano (ver sheets_connector.obter_atualizador):
+    quando chega uma versão nova, recarrega a página para mostrá-la.
+    """
+    if modo_debug:
+        metricas.ativar_sessao() # Mantém a sessão em debug enquanto a página estiver aberta
+    pendentes_fila, enviados_fila, erro_fila = status_fila()
+    st.caption(f"Fila de envio: {pendentes_fila} pendente(s), {enviados_fila} enviado(s)")
+    if erro_fila:
+        st.warning(f"Falha ao enviar para a planilha, tentando novamente: {erro_fila}")
+    # Só depois que a página mostrou os dados (no modo mobile eles nem são carregados)
+    if "versao_vista" not in st.session_state:
+        return
+    _, versao_atual, _ = estado_dados()
+    if versao_atual != st.session_state.versao_vista:
+        st.session_state.versao_vista = versao_atual
+        st.rerun()
+
+# Preenchido no fim do script, depois que a página registrou a versão dos dados que mostrou
+status_envio_slot = st.sidebar.container()
+
 # Sidebar com seleção de usuário (existente)
 usuario = st.sidebar.selectbox("Quem está usando?", ["Carol", "Marcio", "Casal"])
 
@@ -36,287 +84,416 @@ usuario = st.sidebar.selectbox("Quem está usando?", ["Carol", "Marcio", "Casal"
 st.sidebar.markdown("---") # Adiciona um separador visual
 st.sidebar.markdown("Desenvolvido por **Marcio .V**")
 
-# --- Lógica de exibição condicional ---
-if st.session_state.display_mode == 'mobile':
-    with st.form("form_lancamento_mobile"):
-        st.subheader("Adicionar Receita ou Despesa")
-        data = st.date_input("Data", value=date.today())
-        tipo = st.radio("Tipo", ["Receita", "Despesa"], horizontal=True)
-        categoria = st.selectbox("Categoria", ["Alimentação", "Transporte", "Lazer", "Moradia", "Salário", "Outros", "Investimento", "Educação", "Saúde"])
-        descricao = st.text_input("Descrição")
-        valor = st.number_input("Valor (R$)", min_value=0.0, step=0.01)
-        forma_pgto = st.selectbox("Forma de pagamento", ["Pix", "Crédito", "Débito", "Dinheiro", "Transferência"])
-        
-        enviar = st.form_submit_button("Salvar Lançamento")
+# Relatório de tempos de inicialização, visível abrindo o app com ?debug=1
+if modo_debug:
+    with st.sidebar.expander("Tempos de inicialização"):
+        st.write(f"Importações: {tempos_inicializacao['importacoes_ms']:.0f} ms")
+        st.write(f"Até o título na tela: {tempos_inicializacao['primeira_pintura_ms']:.0f} ms")
+
+# --- Seções da página ---
+def secao_individual(df, usuario, agregados, indice):
+    versao = versao_dados(df)
+    st.header(f"Análise Individual de {usuario}")
+    if usuario == "Casal":
+        st.warning("Selecione 'Carol' ou 'Marcio' na barra lateral para ver a análise individual.")
+    else:
+        df_user = indice.selecionar(usuario=usuario)
+        agg_ind = agregados.get(usuario)
 
-        if enviar:
-            if usuario == "Casal":
-                st.warning("Por favor, selecione 'Carol' ou 'Marcio' para adicionar um lançamento individual.")
+        if df_user.empty or agg_ind is None:
+            st.info(f"Não há lançamentos para {usuario}. Adicione dados para ver a análise individual.")
+        else:
+            col1_ind, col2_ind, col3_ind = st.columns(3)
+            with col1_ind:
+                receita_total_ind = agg_ind['receita_total']
+                st.metric("Receita Total", f"R$ {receita_total_ind:,.2f}")
+            with col2_ind:
+                despesa_total_ind = agg_ind['despesa_total']
+                st.metric("Despesa Total", f"R$ {despesa_total_ind:,.2f}")
+            with col3_ind:
+                saldo_ind = agg_ind['saldo']
+                st.metric("Saldo Atual", f"R$ {saldo_ind:,.2f}")
+
+            st.markdown("---")
+
+            st.subheader("Despesas por Categoria (Individual)")
+            df_despesas_ind = agg_ind['despesas_categoria']
+            if not df_despesas_ind.empty:
+                fig_pie_ind = figura_memorizada(versao, usuario, "despesas_categoria", lambda: figura_despesas_categoria(
+                    df_despesas_ind, f'Despesas de {usuario} por Categoria'))
+                st.plotly_chart(fig_pie_ind, use_container_width=True)
             else:
-                salvar_dado(usuario, data, tipo, categoria, descricao, valor, forma_pgto)
-                st.success("Lançamento salvo com sucesso!")
-    st.info("Alterne para 'Desktop View' para ver as análises e gráficos.")
+                st.info(f"Não há despesas para {usuario} para gerar o gráfico.")
+
+            st.markdown("---")
+
+            st.subheader("Evolução do Saldo (Individual)")
+            # Saldo ao fim de cada dia, reduzido para um número fixo de pontos
+            fig_line_ind = figura_memorizada(versao, usuario, "evolucao_saldo", lambda: figura_evolucao_saldo(
+                agg_ind['saldo_diario'],
+                f'Evolução do Saldo de {usuario}',
+                "#0041BB")) # Azul vibrante
+            st.plotly_chart(fig_line_ind, use_container_width=True)
+
+            st.markdown("---")
+
+            st.subheader("Despesas Mensais por Categoria (Individual)")
+            df_despesas_mensal_ind = agg_ind['despesas_mensais_categoria']
+            if not df_despesas_mensal_ind.empty:
+                fig_bar_ind = figura_memorizada(versao, usuario, "despesas_mensais_categoria", lambda: figura_despesas_mensais_categoria(
+                    df_despesas_mensal_ind, f'Despesas Mensais de {usuario} por Categoria'))
+                st.plotly_chart(fig_bar_ind, use_container_width=True)
+            else:
+                st.info(f"Não há despesas mensais para {usuario} para gerar o gráfico.")
 
-else: # desktop
-    with st.form("form_lancamento_desktop"):
-        st.subheader("Adicionar Receita ou Despesa")
-        col_form1, col_form2 = st.columns(2)
-        with col_form1:
+            st.markdown("---")
+
+            st.subheader("Receitas e Despesas Mensais (Individual)")
+            # Já em formato longo (Mes/Ano, Tipo de Lançamento, Valor Mensal) e em ordem cronológica
+            df_mensal_ind_long = agg_ind['mensal']
+
+            if not df_mensal_ind_long.empty:
+                fig_mensal_ind = figura_memorizada(versao, usuario, "mensal", lambda: figura_mensal(
+                    df_mensal_ind_long, f'Receitas e Despesas Mensais de {usuario}',
+                    '#DC3545')) # Azul e Vermelho
+                st.plotly_chart(fig_mensal_ind, use_container_width=True)
+            else:
+                st.info(f"Não há dados mensais para {usuario} para gerar o gráfico de receitas e despesas.")
+
+            st.markdown("---")
+
+            st.subheader("Saldo Acumulado Mensal (Individual)")
+            df_saldo_mensal_ind = agg_ind['saldo_mensal']
+            if not df_saldo_mensal_ind.empty:
+                fig_saldo_acum_ind = figura_memorizada(versao, usuario, "saldo_acumulado", lambda: figura_saldo_acumulado(
+                    df_saldo_mensal_ind, f'Evolução do Saldo Acumulado Mensal de {usuario}'))
+                st.plotly_chart(fig_saldo_acum_ind, use_container_width=True)
+            else:
+                st.info(f"Não há dados mensais para {usuario} para gerar o gráfico de saldo acumulado.")
+
+            st.markdown("---")
+
+            st.subheader("🧠 Insight Inteligente (Individual)")
+            col_insight1, col_insight2 = st.columns(2)
+            gerar_ind = col_insight1.button(f"Gerar insight para {usuario}", key=f"insight_ind_{usuario}")
+            gerar_ambos = col_insight2.button(f"Gerar insights de {usuario} e do casal", key=f"insight_ambos_{usuario}")
+            if gerar_ind:
+                # O texto aparece conforme a IA responde
+                with st.container(border=True):
+                    st.write_stream(gerar_insight_stream(df_user))
+            elif gerar_ambos:
+                # Os dois começam antes de mostrar o primeiro, para a IA gerá-los ao mesmo tempo
+                insight_ind, insight_casal = iniciar_insight(df_user), iniciar_insight(df)
+                col_resp1, col_resp2 = st.columns(2)
+                with col_resp1.container(border=True):
+                    st.markdown(f"**{usuario}**")
+                    st.write_stream(insight_ind.tokens())
+                with col_resp2.container(border=True):
+                    st.markdown("**Casal**")
+                    st.write_stream(insight_casal.tokens())
+
+
+def secao_casal(df, agregados):
+    versao = versao_dados(df)
+    st.header("Análise Financeira do Casal")
+    agg_casal = agregados[CASAL]
+
+    col1_casal, col2_casal, col3_casal = st.columns(3)
+    with col1_casal:
+        receita_total_casal = agg_casal['receita_total']
+        st.metric("Receita Total do Casal", f"R$ {receita_total_casal:,.2f}")
+    with col2_casal:
+        despesa_total_casal = agg_casal['despesa_total']
+        st.metric("Despesa Total do Casal", f"R$ {despesa_total_casal:,.2f}")
+    with col3_casal:
+        saldo_casal = agg_casal['saldo']
+        st.metric("Saldo Atual do Casal", f"R$ {saldo_casal:,.2f}")
+
+    st.markdown("---")
+
+    st.subheader("Despesas por Categoria (Casal)")
+    df_despesas_casal = agg_casal['despesas_categoria']
+    if not df_despesas_casal.empty:
+        fig_pie_casal = figura_memorizada(versao, CASAL, "despesas_categoria", lambda: figura_despesas_categoria(
+            df_despesas_casal, 'Despesas do Casal por Categoria'))
+        st.plotly_chart(fig_pie_casal, use_container_width=True)
+    else:
+        st.info("Não há despesas para o casal para gerar o gráfico.")
+
+    st.markdown("---")
+
+    st.subheader("Evolução do Saldo (Casal)")
+    # Saldo ao fim de cada dia, reduzido para um número fixo de pontos
+    fig_line_casal = figura_memorizada(versao, CASAL, "evolucao_saldo", lambda: figura_evolucao_saldo(
+        agg_casal['saldo_diario'],
+        'Evolução do Saldo do Casal',
+        '#007BFF')) # Azul vibrante
+    st.plotly_chart(fig_line_casal, use_container_width=True)
+
+    st.markdown("---")
+
+    st.subheader("Comparativo de Despesas por Usuário")
+    df_despesas_por_usuario = agg_casal['despesas_por_usuario']
+    if not df_despesas_por_usuario.empty:
+        fig_bar_user = figura_memorizada(versao, CASAL, "despesas_por_usuario", lambda: figura_despesas_por_usuario(
+            df_despesas_por_usuario, 'Total de Despesas por Usuário'))
+        st.plotly_chart(fig_bar_user, use_container_width=True)
+    else:
+        st.info("Não há despesas para comparar entre os usuários.")
+
+    st.markdown("---")
+
+    st.subheader("Receitas e Despesas Mensais (Casal)")
+    # Já em formato longo (Mes/Ano, Tipo de Lançamento, Valor Mensal) e em ordem cronológica
+    df_mensal_casal_long = agg_casal['mensal']
+
+    if not df_mensal_casal_long.empty:
+        fig_mensal_casal = figura_memorizada(versao, CASAL, "mensal", lambda: figura_mensal(
+            df_mensal_casal_long, 'Receitas e Despesas Mensais do Casal',
+            "#C5C5C5")) # Azul e Cinza
+        st.plotly_chart(fig_mensal_casal, use_container_width=True)
+    else:
+        st.info("Não há dados mensais para o casal para gerar o gráfico de receitas e despesas.")
+
+    st.markdown("---")
+
+    st.subheader("Saldo Acumulado Mensal (Casal)")
+    df_saldo_mensal_casal = agg_casal['saldo_mensal']
+    if not df_saldo_mensal_casal.empty:
+        fig_saldo_acum_casal = figura_memorizada(versao, CASAL, "saldo_acumulado", lambda: figura_saldo_acumulado(
+            df_saldo_mensal_casal, 'Evolução do Saldo Acumulado Mensal do Casal'))
+        st.plotly_chart(fig_saldo_acum_casal, use_container_width=True)
+    else:
+        st.info("Não há dados mensais para o casal para gerar o gráfico de saldo acumulado.")
+
+    st.markdown("---")
+
+    st.subheader("🧠 Insight Inteligente (Casal)")
+    if st.button("Gerar insight para o Casal", key="insight_casal"):
+        with st.container(border=True):
+            st.write_stream(gerar_insight_stream(df))
+
+
+def secao_lancamentos(df, usuario, indice):
+    st.header("Lançamentos")
+
+    col_filtro1, col_filtro2, col_filtro3 = st.columns(3)
+    with col_filtro1:
+        opcoes_usuario = ["Todos"] + indice.valores("Usuario")
+        usuario_filtro = st.selectbox("Usuário", opcoes_usuario,
+                                      index=opcoes_usuario.index(usuario) if usuario in opcoes_usuario else 0)
+        tipo_filtro = st.selectbox("Tipo", ["Todos", "Receita", "Despesa"])
+    with col_filtro2:
+        categorias_filtro = st.multiselect("Categorias", indice.valores("Categoria"))
+        periodo_filtro = st.date_input("Período", value=(df['Data'].min().date(), df['Data'].max().date()))
+    with col_filtro3:
+        texto_filtro = st.text_input("Buscar na descrição")
+        tamanho_pagina = st.selectbox("Lançamentos por página", [25, 50, 100], index=1)
+
+    # O período só é aplicado quando as duas datas foram escolhidas
+    data_inicio, data_fim = periodo_filtro if len(periodo_filtro) == 2 else (None, None)
+    posicoes = indice.filtrar(usuario=None if usuario_filtro == "Todos" else usuario_filtro,
+                              tipo=None if tipo_filtro == "Todos" else tipo_filtro,
+                              categorias=categorias_filtro,
+                              data_inicio=data_inicio, data_fim=data_fim,
+                              texto=texto_filtro)
+
+    total_paginas = max(1, -(-len(posicoes) // tamanho_pagina))
+    numero_pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+    df_pagina, total_paginas = indice.pagina(posicoes, numero_pagina, tamanho_pagina)
+
+    st.caption(f"{len(posicoes)} lançamento(s) encontrado(s) — página {numero_pagina} de {total_paginas}")
+    st.dataframe(df_pagina[['Data', 'Usuario', 'Tipo', 'Categoria', 'Descricao', 'Valor', 'Forma_pgto']],
+                 hide_index=True, use_container_width=True,
+                 column_config={"Data": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                                "Valor": st.column_config.NumberColumn(format="R$ %.2f")})
+
+
+@st.fragment
+def painel_analises(df, usuario):
+    """
+    Abas de análise. Só a aba aberta é calculada, e trocar de aba ou usar
+    os filtros e botões de dentro dela refaz apenas este trecho da página.
+    """
+    # Agregações de todos os usuários e do casal, calculadas uma vez por versão dos dados
+    agregados = obter_agregados(df, obter_armazenamento())
+    # Índices por usuário, tipo, categoria e mês para filtrar sem varrer a tabela
+    indice = obter_indice(df)
+
+    # --- Abas para Análise Individual e do Casal ---
+    tab_individual, tab_casal, tab_lancamentos = st.tabs(["Análise Individual", "Análise do Casal", "Lançamentos"],
+                                                         key="aba_analise", on_change="rerun")
+
+    # Só a aba aberta roda: as outras não montam gráficos nem consultas
+    if tab_individual.open:
+        with tab_individual, metricas.etapa("app/secao_individual", len(df)):
+            secao_individual(df, usuario, agregados, indice)
+    if tab_casal.open:
+        with tab_casal, metricas.etapa("app/secao_casal", len(df)):
+            secao_casal(df, agregados)
+    if tab_lancamentos.open:
+        with tab_lancamentos, metricas.etapa("app/secao_lancamentos", len(df)):
+            secao_lancamentos(df, usuario, indice)
+
+
+# --- Formulários (fragmentos: enviar um formulário não refaz as análises) ---
+def avisar_gravacao(mensagem, recarregar=True):
+    """
+    Mostra o aviso de sucesso de uma gravação. Com o armazenamento local os dados
+    já mudaram, então a página inteira é recarregada para as análises mostrarem o
+    lançamento novo. Na planilha, isso acontece quando a fila enviar o lote (ver status_envio).
+    """
+    if recarregar and not obter_armazenamento().usa_snapshot:
+        st.session_state.aviso_gravacao = mensagem
+        st.rerun()
+    st.success(mensagem)
+
+
+def mensagem_lancamento_salvo():
+    # Só fala em envio para a planilha se o armazenamento em uso de fato envia (o SQLite pode rodar sem ela)
+    if obter_armazenamento().envia_para_planilha:
+        return "Lançamento salvo! Ele será enviado para a planilha em instantes."
+    return "Lançamento salvo!"
+
+
+@st.fragment
+def formulario_lancamento(modo, usuario):
+    if modo == 'mobile':
+        with st.form("form_lancamento_mobile"):
+            st.subheader("Adicionar Receita ou Despesa")
             data = st.date_input("Data", value=date.today())
             tipo = st.radio("Tipo", ["Receita", "Despesa"], horizontal=True)
             categoria = st.selectbox("Categoria", ["Alimentação", "Transporte", "Lazer", "Moradia", "Salário", "Outros", "Investimento", "Educação", "Saúde"])
-        with col_form2:
             descricao = st.text_input("Descrição")
             valor = st.number_input("Valor (R$)", min_value=0.0, step=0.01)
             forma_pgto = st.selectbox("Forma de pagamento", ["Pix", "Crédito", "Débito", "Dinheiro", "Transferência"])
         
-        enviar = st.form_submit_button("Salvar Lançamento")
-
-        if enviar:
-            if usuario == "Casal":
-                st.warning("Por favor, selecione 'Carol' ou 'Marcio' para adicionar um lançamento individual.")
-            else:
-                salvar_dado(usuario, data, tipo, categoria, descricao, valor, forma_pgto)
-                st.success("Lançamento salvo com sucesso!")
-
-    st.subheader("Resumo Financeiro e Análises")
-    df = carregar_dados()
+            enviar = st.form_submit_button("Salvar Lançamento")
 
-    # Verifica se o DataFrame está vazio OU se a coluna 'Valor' não existe
-    if df.empty or 'Valor' not in df.columns:
-        st.info("Não há dados financeiros para exibir ou as colunas necessárias estão faltando. Adicione alguns lançamentos para começar a análise!")
-    else:
-        # Garante que as colunas 'Valor' e 'Data' estão no formato correto
-        df['Valor'] = pd.to_numeric(df['Valor'], errors='coerce')
-        # CONVERSÃO DA COLUNA 'Data' PARA OBJETOS date, REMOVENDO O COMPONENTE DE TEMPO
-        df['Data'] = pd.to_datetime(df['Data'], errors='coerce').dt.date
+            if enviar:
+                if usuario == "Casal":
+                    st.warning("Por favor, selecione 'Carol' ou 'Marcio' para adicionar um lançamento individual.")
+                else:
+                    if salvar_dado(usuario, data, tipo, categoria, descricao, valor, forma_pgto):
+                        avisar_gravacao(mensagem_lancamento_salvo())
+    else: # desktop
+        with st.form("form_lancamento_desktop"):
+            st.subheader("Adicionar Receita ou Despesa")
+            col_form1, col_form2 = st.columns(2)
+            with col_form1:
+                data = st.date_input("Data", value=date.today())
+                tipo = st.radio("Tipo", ["Receita", "Despesa"], horizontal=True)
+                categoria = st.selectbox("Categoria", ["Alimentação", "Transporte", "Lazer", "Moradia", "Salário", "Outros", "Investimento", "Educação", "Saúde"])
+            with col_form2:
+                descricao = st.text_input("Descrição")
+                valor = st.number_input("Valor (R$)", min_value=0.0, step=0.01)
+                forma_pgto = st.selectbox("Forma de pagamento", ["Pix", "Crédito", "Débito", "Dinheiro", "Transferência"])
         
-        # Remove linhas com valores nulos que podem ter surgido da conversão
-        df.dropna(subset=['Valor', 'Data'], inplace=True)
-
-        # Re-check if df became empty after dropping NaNs
-        if df.empty:
-            st.info("Não há dados financeiros válidos para exibir após a limpeza. Adicione ou corrija os lançamentos para começar a análise!")
-        else:
-            # Cria uma coluna 'Mês/Ano' para análises mensais
-            # Converte 'Data' para datetime temporariamente para usar dt.to_period, depois para string
-            df['Mes/Ano'] = pd.to_datetime(df['Data']).dt.to_period('M').astype(str)
+            enviar = st.form_submit_button("Salvar Lançamento")
 
-            # --- Abas para Análise Individual e do Casal ---
-            tab_individual, tab_casal = st.tabs(["Análise Individual", "Análise do Casal"])
-
-            with tab_individual:
-                st.header(f"Análise Individual de {usuario}")
+            if enviar:
                 if usuario == "Casal":
-                    st.warning("Selecione 'Carol' ou 'Marcio' na barra lateral para ver a análise individual.")
-                else:
-                    df_user = df[df['Usuario'] == usuario].copy()
-
-                    if df_user.empty:
-                        st.info(f"Não há lançamentos para {usuario}. Adicione dados para ver a análise individual.")
-                    else:
-                        col1_ind, col2_ind, col3_ind = st.columns(3)
-                        with col1_ind:
-                            receita_total_ind = df_user[df_user['Tipo'] == 'Receita']['Valor'].sum()
-                            st.metric("Receita Total", f"R$ {receita_total_ind:,.2f}")
-                        with col2_ind:
-                            despesa_total_ind = df_user[df_user['Tipo'] == 'Despesa']['Valor'].sum()
-                            st.metric("Despesa Total", f"R$ {despesa_total_ind:,.2f}")
-                        with col3_ind:
-                            saldo_ind = receita_total_ind - despesa_total_ind
-                            st.metric("Saldo Atual", f"R$ {saldo_ind:,.2f}")
-
-                        st.markdown("---")
-
-                        st.subheader("Despesas por Categoria (Individual)")
-                        df_despesas_ind = df_user[df_user['Tipo'] == 'Despesa']
-                        if not df_despesas_ind.empty:
-                            fig_pie_ind = px.pie(df_despesas_ind, values='Valor', names='Categoria', 
-                                                 title=f'Despesas de {usuario} por Categoria',
-                                                 hole=0.3,
-                                                 color_discrete_sequence=px.colors.qualitative.Pastel) # Manter pastel para diversidade
-                            st.plotly_chart(fig_pie_ind, use_container_width=True)
-                        else:
-                            st.info(f"Não há despesas para {usuario} para gerar o gráfico.")
-
-                        st.markdown("---")
-
-                        st.subheader("Evolução do Saldo (Individual)")
-                        df_user_sorted = df_user.sort_values("Data")
-                        df_user_sorted['Impacto'] = df_user_sorted.apply(lambda row: row['Valor'] if row['Tipo'] == 'Receita' else -row['Valor'], axis=1)
-                        df_user_sorted['Saldo Diario'] = df_user_sorted['Impacto'].cumsum()
-                        fig_line_ind = px.line(df_user_sorted, x='Data', y='Saldo Diario', 
-                                               title=f'Evolução do Saldo de {usuario}',
-                                               markers=True,
-                                               line_shape='spline',
-                                               color_discrete_sequence=["#0041BB"]) # Azul vibrante
-                        fig_line_ind.update_xaxes(dtick="D1", tickformat="%d/%m/%Y")
-                        st.plotly_chart(fig_line_ind, use_container_width=True)
-
-                        st.markdown("---")
-
-                        st.subheader("Despesas Mensais por Categoria (Individual)")
-                        df_despesas_mensal_ind = df_despesas_ind.groupby(['Mes/Ano', 'Categoria'])['Valor'].sum().reset_index()
-                        if not df_despesas_mensal_ind.empty:
-                            fig_bar_ind = px.bar(df_despesas_mensal_ind, x='Mes/Ano', y='Valor', color='Categoria',
-                                                 title=f'Despesas Mensais de {usuario} por Categoria',
-                                                 barmode='group',
-                                                 color_discrete_sequence=px.colors.qualitative.Set2) # Manter Set2 para diversidade
-                            st.plotly_chart(fig_bar_ind, use_container_width=True)
-                        else:
-                            st.info(f"Não há despesas mensais para {usuario} para gerar o gráfico.")
-
-                        st.markdown("---")
-
-                        st.subheader("Receitas e Despesas Mensais (Individual)")
-                        df_mensal_ind = df_user.groupby(['Mes/Ano', 'Tipo'])['Valor'].sum().unstack(fill_value=0).reset_index()
-                        if 'Receita' not in df_mensal_ind.columns:
-                            df_mensal_ind['Receita'] = 0
-                        if 'Despesa' not in df_mensal_ind.columns:
-                            df_mensal_ind['Despesa'] = 0
-                        
-                        df_mensal_ind['Mes/Ano_dt'] = pd.to_datetime(df_mensal_ind['Mes/Ano'])
-                        df_mensal_ind = df_mensal_ind.sort_values('Mes/Ano_dt').drop(columns='Mes/Ano_dt')
-
-                        if not df_mensal_ind.empty:
-                            df_mensal_ind_long = df_mensal_ind.melt(id_vars=['Mes/Ano'], value_vars=['Receita', 'Despesa'], 
-                                                                    var_name='Tipo de Lançamento', value_name='Valor Mensal')
-                            
-                            fig_mensal_ind = px.bar(df_mensal_ind_long, x='Mes/Ano', y='Valor Mensal', color='Tipo de Lançamento',
-                                                    title=f'Receitas e Despesas Mensais de {usuario}',
-                                                    barmode='group',
-                                                    color_discrete_map={'Receita': '#007BFF', 'Despesa': '#DC3545'}) # Azul e Vermelho
-                            st.plotly_chart(fig_mensal_ind, use_container_width=True)
-                        else:
-                            st.info(f"Não há dados mensais para {usuario} para gerar o gráfico de receitas e despesas.")
-
-                        st.markdown("---")
-
-                        st.subheader("Saldo Acumulado Mensal (Individual)")
-                        df_saldo_mensal_ind = df_user.groupby('Mes/Ano').apply(
-                            lambda x: x[x['Tipo'] == 'Receita']['Valor'].sum() - x[x['Tipo'] == 'Despesa']['Valor'].sum()
-                        ).reset_index(name='Saldo Mensal')
-                        df_saldo_mensal_ind['Saldo Acumulado Mensal'] = df_saldo_mensal_ind['Saldo Mensal'].cumsum()
-                        if not df_saldo_mensal_ind.empty:
-                            fig_saldo_acum_ind = px.line(df_saldo_mensal_ind, x='Mes/Ano', y='Saldo Acumulado Mensal',
-                                                         title=f'Evolução do Saldo Acumulado Mensal de {usuario}',
-                                                         markers=True,
-                                                         line_shape='spline',
-                                                         color_discrete_sequence=['#007BFF']) # Azul vibrante
-                            st.plotly_chart(fig_saldo_acum_ind, use_container_width=True)
-                        else:
-                            st.info(f"Não há dados mensais para {usuario} para gerar o gráfico de saldo acumulado.")
-
-                        st.markdown("---")
-
-                        st.subheader("🧠 Insight Inteligente (Individual)")
-                        if st.button(f"Gerar insight para {usuario}", key=f"insight_ind_{usuario}"):
-                            with st.spinner('Gerando insight...'):
-                                insight_ind = gerar_insight(df_user)
-                                st.info(insight_ind)
-
-            with tab_casal:
-                st.header("Análise Financeira do Casal")
-
-                col1_casal, col2_casal, col3_casal = st.columns(3)
-                with col1_casal:
-                    receita_total_casal = df[df['Tipo'] == 'Receita']['Valor'].sum()
-                    st.metric("Receita Total do Casal", f"R$ {receita_total_casal:,.2f}")
-                with col2_casal:
-                    despesa_total_casal = df[df['Tipo'] == 'Despesa']['Valor'].sum()
-                    st.metric("Despesa Total do Casal", f"R$ {despesa_total_casal:,.2f}")
-                with col3_casal:
-                    saldo_casal = receita_total_casal - despesa_total_casal
-                    st.metric("Saldo Atual do Casal", f"R$ {saldo_casal:,.2f}")
-
-                st.markdown("---")
-
-                st.subheader("Despesas por Categoria (Casal)")
-                df_despesas_casal = df[df['Tipo'] == 'Despesa']
-                if not df_despesas_casal.empty:
-                    fig_pie_casal = px.pie(df_despesas_casal, values='Valor', names='Categoria', 
-                                           title='Despesas do Casal por Categoria',
-                                           hole=0.3,
-                                           color_discrete_sequence=px.colors.qualitative.Pastel) # Manter pastel para diversidade
-                    st.plotly_chart(fig_pie_casal, use_container_width=True)
-                else:
-                    st.info("Não há despesas para o casal para gerar o gráfico.")
-
-                st.markdown("---")
-
-                st.subheader("Evolução do Saldo (Casal)")
-                df_casal_sorted = df.sort_values("Data")
-                df_casal_sorted['Impacto'] = df_casal_sorted.apply(lambda row: row['Valor'] if row['Tipo'] == 'Receita' else -row['Valor'], axis=1)
-                df_casal_sorted['Saldo Diario'] = df_casal_sorted['Impacto'].cumsum()
-                fig_line_casal = px.line(df_casal_sorted, x='Data', y='Saldo Diario', 
-                                         title='Evolução do Saldo do Casal',
-                                         markers=True,
-                                         line_shape='spline',
-                                         color_discrete_sequence=['#007BFF']) # Azul vibrante
-                fig_line_casal.update_xaxes(dtick="D1", tickformat="%d/%m/%Y")
-                st.plotly_chart(fig_line_casal, use_container_width=True)
-
-                st.markdown("---")
-
-                st.subheader("Comparativo de Despesas por Usuário")
-                df_despesas_por_usuario = df_despesas_casal.groupby('Usuario')['Valor'].sum().reset_index()
-                if not df_despesas_por_usuario.empty:
-                    fig_bar_user = px.bar(df_despesas_por_usuario, x='Usuario', y='Valor', 
-                                          title='Total de Despesas por Usuário',
-                                          color='Usuario',
-                                          color_discrete_map={'Carol': '#007BFF', 'Marcio': '#DC3545'}) # Azul e Vermelho
-                    st.plotly_chart(fig_bar_user, use_container_width=True)
+                    st.warning("Por favor, selecione 'Carol' ou 'Marcio' para adicionar um lançamento individual.")
                 else:
-                    st.info("Não há despesas para comparar entre os usuários.")
+                    if salvar_dado(usuario, data, tipo, categoria, descricao, valor, forma_pgto):
+                        avisar_gravacao(mensagem_lancamento_salvo())
+
+
+@st.fragment
+def importacao_extrato(usuario):
+    with st.expander("Importar extrato bancário (CSV ou OFX)"):
+        arquivo_extrato = st.file_uploader("Arquivo do extrato", type=["csv", "ofx"])
+        forma_pgto_extrato = st.selectbox("Forma de pagamento dos lançamentos", ["Pix", "Crédito", "Débito", "Dinheiro", "Transferência"],
+                                          index=4, key="forma_pgto_extrato")
+        st.caption("Valores negativos viram despesas e positivos, receitas. Lançamentos que já estão na base são ignorados.")
+        if st.button("Importar extrato", disabled=arquivo_extrato is None):
+            if usuario == "Casal":
+                st.warning("Por favor, selecione 'Carol' ou 'Marcio' para importar um extrato.")
+            else:
+                barra_importacao = st.progress(0.0, text="Lendo o extrato...")
+
+                def mostrar_progresso(resumo):
+                    # A posição no arquivo enviado dá a fração já lida
+                    fracao = min(arquivo_extrato.tell() / max(arquivo_extrato.size, 1), 1.0)
+                    barra_importacao.progress(fracao, text=f"{resumo['lidas']} linha(s) lida(s), {resumo['importadas']} importada(s)")
+
+                try:
+                    # Os dados são recarregados uma vez no fim, e não a cada bloco gravado. Lançamentos
+                    # ainda na fila de envio contam como existentes, para reimportar não duplicá-los
+                    resumo = importar_extrato(ler_extrato(arquivo_extrato, arquivo_extrato.name), usuario,
+                                              obter_indice_hashes(carregar_dados(), lancamentos_pendentes()),
+                                              lambda lote: salvar_lancamentos(lote, recarregar=False),
+                                              forma_pgto=forma_pgto_extrato, ao_progresso=mostrar_progresso)
+                    if resumo['importadas']:
+                        recarregar_dados()
+                    barra_importacao.progress(1.0, text="Importação concluída")
+                    avisar_gravacao(f"{resumo['importadas']} lançamento(s) importado(s). Ignorados: {resumo['duplicadas']} já existente(s) "
+                                    f"e {resumo['invalidas']} linha(s) inválida(s).", recarregar=resumo['importadas'] > 0)
+                except Exception as e:
+                    st.error(f"Erro ao importar o extrato: {e}")
 
-                st.markdown("---")
 
-                st.subheader("Receitas e Despesas Mensais (Casal)")
-                df_mensal_casal = df.groupby(['Mes/Ano', 'Tipo'])['Valor'].sum().unstack(fill_value=0).reset_index()
-                if 'Receita' not in df_mensal_casal.columns:
-                    df_mensal_casal['Receita'] = 0
-                if 'Despesa' not in df_mensal_casal.columns:
-                    df_mensal_casal['Despesa'] = 0
+# --- Lógica de exibição condicional ---
+# Aviso de uma gravação que recarregou a página
+if "aviso_gravacao" in st.session_state:
+    st.success(st.session_state.pop("aviso_gravacao"))
 
-                df_mensal_casal['Mes/Ano_dt'] = pd.to_datetime(df_mensal_casal['Mes/Ano'])
-                df_mensal_casal = df_mensal_casal.sort_values('Mes/Ano_dt').drop(columns='Mes/Ano_dt')
+formulario_lancamento(st.session_state.display_mode, usuario)
 
-                if not df_mensal_casal.empty:
-                    df_mensal_casal_long = df_mensal_casal.melt(id_vars=['Mes/Ano'], value_vars=['Receita', 'Despesa'],
-                                                                var_name='Tipo de Lançamento', value_name='Valor Mensal')
+if st.session_state.display_mode == 'mobile':
+    st.info("Alterne para 'Desktop View' para ver as análises e gráficos.")
 
-                    fig_mensal_casal = px.bar(df_mensal_casal_long, x='Mes/Ano', y='Valor Mensal', color='Tipo de Lançamento',
-                                              title='Receitas e Despesas Mensais do Casal',
-                                              barmode='group',
-                                              color_discrete_map={'Receita': '#007BFF', 'Despesa': "#C5C5C5"}) # Azul e Cinza
-                    st.plotly_chart(fig_mensal_casal, use_container_width=True)
-                else:
-                    st.info("Não há dados mensais para o casal para gerar o gráfico de receitas e despesas.")
-
-                st.markdown("---")
-
-                st.subheader("Saldo Acumulado Mensal (Casal)")
-                df_saldo_mensal_casal = df.groupby('Mes/Ano').apply(
-                    lambda x: x[x['Tipo'] == 'Receita']['Valor'].sum() - x[x['Tipo'] == 'Despesa']['Valor'].sum()
-                ).reset_index(name='Saldo Mensal')
-                df_saldo_mensal_casal['Saldo Acumulado Mensal'] = df_saldo_mensal_casal['Saldo Mensal'].cumsum()
-                if not df_saldo_mensal_casal.empty:
-                    fig_saldo_acum_casal = px.line(df_saldo_mensal_casal, x='Mes/Ano', y='Saldo Acumulado Mensal',
-                                              title='Evolução do Saldo Acumulado Mensal do Casal',
-                                              markers=True,
-                                              line_shape='spline',
-                                              color_discrete_sequence=['#007BFF']) # Azul vibrante
-                    st.plotly_chart(fig_saldo_acum_casal, use_container_width=True)
-                else:
-                    st.info("Não há dados mensais para o casal para gerar o gráfico de saldo acumulado.")
+else: # desktop
+    importacao_extrato(usuario)
 
-                st.markdown("---")
+    st.subheader("Resumo Financeiro e Análises")
+    df = carregar_dados()
+    # A página mostra esta versão; o status da fila recarrega a página quando chegar outra
+    idade_dados, st.session_state.versao_vista, erro_atualizacao = estado_dados()
+    if erro_atualizacao:
+        st.warning(f"Não foi possível atualizar os dados agora; mostrando a versão de {idade_dados / 60:.0f} min atrás. "
+                   f"Erro: {erro_atualizacao}")
+    elif idade_dados != float("inf"):
+        st.caption(f"Dados atualizados há {idade_dados:.0f} s")
 
-                st.subheader("🧠 Insight Inteligente (Casal)")
-                if st.button("Gerar insight para o Casal", key="insight_casal"):
-                    with st.spinner('Gerando insight...'):
-                        insight_casal = gerar_insight(df)
-                        st.info(insight_casal)
+    # Verifica se o DataFrame está vazio OU se a coluna 'Valor' não existe
+    if df.empty or 'Valor' not in df.columns:
+        st.info("Não há dados financeiros para exibir ou as colunas necessárias estão faltando. Adicione alguns lançamentos para começar a análise!")
+    else:
+        # As colunas já chegam tipadas do snapshot local (ver cache_local.py)
+        painel_analises(df, usuario)
+
+# --- Status da fila de envio na sidebar ---
+with status_envio_slot:
+    status_envio()
+
+# --- Painel de desempenho (só com ?debug=1) ---
+if modo_debug:
+    metricas.registrar_etapa("app/script", time.perf_counter() - inicio_script)
+    with st.sidebar.expander("Desempenho"):
+        medidas = metricas.resumo()
+        st.caption("Etapas (tempo de parede)")
+        if medidas["etapas"]:
+            st.dataframe(pd.DataFrame(medidas["etapas"])[["etapa", "chamadas", "media_ms", "max_s", "linhas"]],
+                         hide_index=True, use_container_width=True)
+        st.caption("Caches")
+        if medidas["caches"]:
+            st.dataframe(pd.DataFrame(medidas["caches"]), hide_index=True, use_container_width=True)
+        st.caption("Chamadas externas (Google Sheets e OpenAI)")
+        if medidas["apis"]:
+            st.dataframe(pd.DataFrame(medidas["apis"])[["servico", "operacao", "chamadas", "erros", "media_ms",
+                                                        "tokens_prompt", "tokens_resposta"]],
+                         hide_index=True, use_container_width=True)
+        st.caption("Prompts (tokens do resumo enviado x todas as linhas)")
+        if medidas["prompts"]:
+            st.dataframe(pd.DataFrame(medidas["prompts"])[["prompt", "chamadas", "linhas", "tokens", "tokens_completo"]],
+                         hide_index=True, use_container_width=True)
+        st.download_button("Exportar métricas (JSON)", json.dumps(medidas, ensure_ascii=False, indent=2, default=str),
+                           file_name="metricas_lovefintech.json", mime="application/json")
+        if metricas.CAMINHO_METRICAS:
+            st.caption(f"Eventos também gravados em {metricas.CAMINHO_METRICAS}")
+        if st.button("Zerar métricas"):
+            metricas.limpar()
 
 # --- Novo rodapé para a área de conteúdo principal ---
 st.markdown("---") # Separador antes do rodapé
@@ -0,0 +1,552 @@
+# armazenamento.py
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from sincronizacao import sincronizar, sincronizar_imutavel, descartar_copia
+from fila_escrita import FilaEscrita, ha_pendentes
+from importacao import converter_datas
+import metricas
+
+COLUNAS = ["Usuario", "Data", "Tipo", "Categoria", "Descricao", "Valor", "Forma_pgto"]
+
+logger = logging.getLogger(__name__)
+
+
+class ArmazenamentoPlanilha:
+    """
+    Lançamentos guardados na planilha do Google Sheets (o caminho original).
+    A leitura é incremental (sincronizacao.py) e a escrita passa pela fila local (fila_escrita.py).
+    """
+    nome = "planilha"
+    usa_snapshot = True # A leitura depende da rede: vale manter o snapshot Parquet local
+    envia_para_planilha = True # Os lançamentos salvos vão para a planilha pela fila
+
+    def __init__(self, obter_worksheet, nome_aba, ao_descarregar=None):
+        self.obter_worksheet = obter_worksheet
+        self.nome_aba = nome_aba
+        self.ao_descarregar = ao_descarregar
+        self._fila = None
+        self._lock = threading.Lock()
+
+    @property
+    def fila(self):
+        # A fila (e sua thread) só é criada quando alguém precisar dela
+        with self._lock:
+            if self._fila is None:
+                self._fila = self._criar_fila().iniciar()
+            return self._fila
+
+    def _criar_fila(self):
+        return FilaEscrita(self.obter_worksheet, ao_descarregar=self.ao_descarregar)
+
+    def carregar(self):
+        """
+        Retorna (cabecalho, linhas, versao).
+        """
+        return sincronizar(self.obter_worksheet(), self.nome_aba)
+
+    def salvar(self, linhas):
+        self.fila.enfileirar_lote(linhas)
+
+    def marca_modificacao(self):
+        """
+        Data da última modificação da planilha (metadado do Drive): muito mais
+        barato que baixar as linhas para saber se algo mudou.
+        """
+        with metricas.etapa("sheets/lastUpdateTime"):
+            return self.obter_worksheet().spreadsheet.get_lastUpdateTime()
+
+    def status(self):
+        """
+        Retorna (pendentes, enviados, ultimo_erro) do envio para a planilha.
+        Não cria a fila (nem sua thread) se nada foi salvo e o diário está vazio.
+        """
+        if self._fila is None and not ha_pendentes():
+            return 0, 0, None
+        # Lançamentos de uma execução anterior esperando no diário: a fila começa a enviá-los
+        fila = self.fila
+        return fila.pendentes, fila.enviados, fila.ultimo_erro
+
+    def lancamentos_pendentes(self):
+        """
+        Lançamentos salvos que ainda estão no diário esperando envio (e, portanto,
+        ainda não aparecem em carregar()), como listas na ordem de COLUNAS.
+        """
+        if self._fila is None and not ha_pendentes():
+            return []
+        return self.fila.linhas_pendentes()
+
+
+PREFIXO_PARTICAO = "Lançamentos " # Abas de partição: "Lançamentos 2024" (por ano) ou "Lançamentos 2024-06" (por mês)
+_ABA_PARTICAO = re.compile(re.escape(PREFIXO_PARTICAO) + r"(\d{4}(?:-\d{2})?)$")
+_DATA_ISO = re.compile(r"\d{4}-\d{2}")
+
+
+def chave_particao(data, granularidade="ano"):
+    """
+    Partição de uma data (date, Timestamp ou texto): "2024" por ano ou "2024-06" por mês.
+    Retorna None se a data não der para entender.
+    """
+    if hasattr(data, "strftime"):
+        texto = data.strftime("%Y-%m")
+    else:
+        achado = _DATA_ISO.match(str(data).strip())
+        if achado:
+            texto = achado.group(0)
+        else:
+            convertida = pd.to_datetime(str(data), dayfirst=True, errors="coerce")
+            if pd.isna(convertida):
+                return None
+            texto = convertida.strftime("%Y-%m")
+    return texto[:4] if granularidade == "ano" else texto
+
+
+class _AbasParticionadas:
+    """
+    Faz o papel de uma aba única para a fila de escrita: append_rows manda
+    cada linha para a aba da partição da sua Data, criando a aba se preciso.
+    """
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+
+    @property
+    def spreadsheet(self):
+        return self.armazenamento.obter_planilha()
+
+    def append_row(self, valores, **kwargs):
+        self.append_rows([valores], **kwargs)
+
+    def append_rows(self, valores, **kwargs):
+        armazenamento = self.armazenamento
+        por_particao = defaultdict(list)
+        for linha in valores:
+            chave = armazenamento.chave(linha[COLUNAS.index("Data")])
+            if chave is None:
+                # O formulário e a importação sempre mandam datas válidas; se não, a linha não se perde
+                logger.warning("Data inválida %r; lançamento gravado na partição atual", linha[COLUNAS.index("Data")])
+                chave = armazenamento.chave(date.today())
+            por_particao[chave].append(linha)
+        for chave, linhas in por_particao.items():
+            armazenamento.obter_aba(chave, criar=True).append_rows(linhas, **kwargs)
+            if armazenamento.fechada(chave):
+                # Lançamento atrasado num período encerrado: a cópia permanente dele ficou velha
+                armazenamento.descartar_particao(chave)
+
+
+class ArmazenamentoParticionado(ArmazenamentoPlanilha):
+    """
+    Lançamentos divididos em uma aba por ano (ou por mês) na mesma planilha,
+    como "Lançamentos 2024", em vez de todo o histórico na mesma aba. Cada
+    lançamento novo vai para a aba do período da sua Data.
+
+    As abas são lidas em paralelo, e as que ficam fora do período pedido nem
+    são consultadas. Períodos encerrados não mudam mais: depois da primeira
+    leitura ficam na cópia local, e só a aba do período atual (e as de datas
+    futuras) é relida a cada atualização. A cada `intervalo_revalidacao`
+    segundos, cada período encerrado é conferido pela última linha conhecida
+    (uma chamada pequena): linhas acrescentadas ou a última linha editada ou
+    apagada são percebidas. Edições no meio de um período encerrado feitas
+    direto na planilha só aparecem depois de descartar_particao().
+    """
+    nome = "particionado"
+
+    def __init__(self, obter_planilha, granularidade="ano", ao_descarregar=None, inicio=None, max_leituras=4,
+                 intervalo_revalidacao=600.0):
+        if granularidade not in ("ano", "mes"):
+            raise ValueError(f"Partição desconhecida: '{granularidade}' (use 'ano' ou 'mes')")
+        self.obter_planilha = obter_planilha
+        self.granularidade = granularidade
+        self.inicio = date.fromisoformat(inicio) if isinstance(inicio, str) else inicio
+        self.max_leituras = max_leituras # Quantas abas são baixadas ao mesmo tempo
+        self.intervalo_revalidacao = intervalo_revalidacao
+        self._roteador = _AbasParticionadas(self)
+        super().__init__(lambda: self._roteador, PREFIXO_PARTICAO.strip(), ao_descarregar)
+        self._abas = None
+        self._lock_abas = threading.Lock() # Protege _abas e _fechadas (lidos pelas threads de leitura e pela fila)
+        self._fechadas = {} # chave -> ((cabecalho, linhas, versao), conferido_em) dos períodos encerrados
+
+    def chave(self, data):
+        return chave_particao(data, self.granularidade)
+
+    def fechada(self, chave):
+        return chave < self.chave(date.today())
+
+    def _criar_fila(self):
+        # Cada lote da fila vai inteiro para uma única aba
+        return FilaEscrita(self.obter_worksheet, ao_descarregar=self.ao_descarregar,
+                           chave_lote=lambda linha: self.chave(linha[COLUNAS.index("Data")]) or self.chave(date.today()))
+
+    def _listar_abas(self):
+        """
+        Relê a lista de abas da planilha (uma chamada de metadados) e retorna {chave: aba}.
+        """
+        with metricas.etapa("sheets/listar_abas"):
+            abas = {}
+            for worksheet in self.obter_planilha().worksheets():
+                achado = _ABA_PARTICAO.match(worksheet.title)
+                # Só as abas da granularidade em uso ("2024" por ano, "2024-06" por mês)
+                if achado and len(achado.group(1)) == (4 if self.granularidade == "ano" else 7):
+                    abas[achado.group(1)] = metricas.WorksheetMedida(worksheet)
+        with self._lock_abas:
+            self._abas = abas
+        return abas
+
+    def obter_aba(self, chave, criar=False):
+        with self._lock_abas:
+            abas = self._abas
+        if abas is None or chave not in abas:
+            abas = self._listar_abas()
+        if chave in abas or not criar:
+            return abas.get(chave)
+
+        try:
+            worksheet = self.obter_planilha().add_worksheet(PREFIXO_PARTICAO + chave, rows=1000, cols=len(COLUNAS))
+            worksheet.append_row(COLUNAS)
+        except Exception:
+            # Outra sessão pode ter criado a mesma aba ao mesmo tempo
+            abas = self._listar_abas()
+            if chave in abas:
+                return abas[chave]
+            raise
+        with self._lock_abas:
+            self._abas[chave] = metricas.WorksheetMedida(worksheet)
+            return self._abas[chave]
+
+    def descartar_particao(self, chave):
+        """
+        Esquece a cópia de uma partição: a próxima carga baixa a aba inteira de novo.
+        """
+        with self._lock_abas:
+            self._fechadas.pop(chave, None)
+            descartar_copia(f"particao_{chave}")
+
+    def _ler_particao(self, chave, worksheet):
+        nome_copia = f"particao_{chave}"
+        if not self.fechada(chave):
+            return sincronizar(worksheet, nome_copia)
+        with self._lock_abas:
+            guardada = self._fechadas.get(chave)
+        if guardada is None:
+            # Primeira leitura neste processo: a cópia local vale sem consultar a planilha
+            resultado = sincronizar_imutavel(worksheet, nome_copia)
+        elif time.time() - guardada[1] >= self.intervalo_revalidacao:
+            # Conferência barata: relê só a última linha conhecida e o que vier depois dela
+            resultado = sincronizar(worksheet, nome_copia, intervalo_resync=None)
+        else:
+            return guardada[0]
+        with self._lock_abas:
+            self._fechadas[chave] = (resultado, time.time())
+        return resultado
+
+    def carregar(self, inicio=None, fim=None):
+        """
+        Retorna (cabecalho, linhas, versao) das partições entre `inicio` e `fim`
+        (datas; por padrão, desde o `inicio` do armazenamento até o fim). O corte
+        é por partição inteira: um período que começa antes de `inicio` vem todo.
+        """
+        inicio = self.inicio if inicio is None else inicio
+        abas = self._listar_abas()
+        chaves = sorted(
+            c for c in abas
+            if (inicio is None or c >= self.chave(inicio)) and (fim is None or c <= self.chave(fim))
+        )
+
+        with metricas.etapa("particoes/ler", len(chaves)):
+            with ThreadPoolExecutor(max_workers=self.max_leituras, thread_name_prefix="particao") as executor:
+                resultados = list(executor.map(lambda c: self._ler_particao(c, abas[c]), chaves))
+
+        linhas = []
+        versoes = []
+        for chave, (cabecalho, linhas_particao, versao) in zip(chaves, resultados):
+            versoes.append(f"{chave}:{versao}")
+            if not cabecalho:
+                continue
+            if cabecalho[:len(COLUNAS)] == COLUNAS:
+                linhas.extend(linhas_particao)
+            else:
+                # Colunas em outra ordem nesta aba: reorganiza pelo nome
+                posicoes = [cabecalho.index(c) if c in cabecalho else None for c in COLUNAS]
+                linhas.extend([[l[p] if p is not None else "" for p in posicoes] for l in linhas_particao])
+        versao = hashlib.sha256("|".join(versoes).encode("utf-8")).hexdigest()
+        return list(COLUNAS), linhas, versao
+
+    def marca_modificacao(self):
+        with metricas.etapa("sheets/lastUpdateTime"):
+            return self.obter_planilha().get_lastUpdateTime()
+
+    def migrar(self, worksheet_origem):
+        """
+        Copia os lançamentos de uma aba única (a Sheet1 antiga) para as abas de
+        partição. Pode ser repetida depois de uma falha: partições que já têm
+        todas as suas linhas são puladas e as que ficaram vazias são completadas
+        (cada partição é gravada numa única chamada, então fica inteira ou vazia).
+        Linhas com data inválida não são copiadas, e sim listadas no resultado.
+
+        Retorna {"copiadas": n, "ja_migradas": n, "datas_invalidas": [(linha na aba, data), ...]}.
+        """
+        valores = worksheet_origem.get_all_values()
+        resultado = {"copiadas": 0, "ja_migradas": 0, "datas_invalidas": []}
+        if len(valores) < 2:
+            return resultado
+        cabecalho = valores[0]
+        posicoes = [cabecalho.index(c) for c in COLUNAS]
+        por_particao = defaultdict(list)
+        for numero, valor in enumerate(valores[1:], start=2):
+            linha = [valor[p] if p < len(valor) else "" for p in posicoes]
+            chave = self.chave(linha[COLUNAS.index("Data")])
+            if chave is None:
+                resultado["datas_invalidas"].append((numero, linha[COLUNAS.index("Data")]))
+            else:
+                por_particao[chave].append(linha)
+
+        abas = self._listar_abas()
+        for chave, linhas in sorted(por_particao.items()):
+            aba = abas.get(chave)
+            existentes = aba.get_all_values() if aba is not None else []
+            if len(existentes) - 1 == len(linhas):
+                resultado["ja_migradas"] += len(linhas)
+                continue
+            if len(existentes) > 1:
+                raise RuntimeError(f"A aba '{PREFIXO_PARTICAO}{chave}' já tem {len(existentes) - 1} lançamento(s), "
+                                   f"mas a origem tem {len(linhas)}; confira a aba antes de migrar de novo.")
+            if aba is None:
+                aba = self.obter_aba(chave, criar=True)
+            elif not existentes:
+                aba.append_row(COLUNAS) # A aba foi criada, mas a falha veio antes do cabeçalho
+            aba.append_rows(linhas)
+            resultado["copiadas"] += len(linhas)
+        return resultado
+
+
+def _datas_iso(datas):
+    """
+    Datas no formato 'AAAA-MM-DD', lidas como na importação de extratos (ISO ou
+    DD/MM/AAAA). As que não dão para entender ficam como estão.
+    """
+    convertidas = converter_datas(pd.Series(list(datas), dtype=object))
+    return [original if pd.isna(d) else d.strftime("%Y-%m-%d") for d, original in zip(convertidas, datas)]
+
+
+def _hash_lancamento(linha):
+    """
+    Identifica um lançamento pelo conteúdo, para comparar o banco local com a planilha.
+    """
+    usuario, data, tipo, categoria, descricao, valor, forma_pgto = linha
+    try:
+        valor = f"{float(valor):.2f}"
+    except (TypeError, ValueError):
+        valor = str(valor)
+    conteudo = "|".join(str(c) for c in (usuario, data, tipo, categoria, descricao, valor, forma_pgto))
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+class ArmazenamentoSQLite:
+    """
+    Lançamentos guardados em um banco SQLite local (modo WAL), com índices em
+    (Usuario, Data) e (Tipo, Categoria) e agregações mensais feitas no próprio SQL.
+    A Data é gravada sempre como 'AAAA-MM-DD', para que o SQL e o pandas
+    entendam as mesmas datas.
+
+    Opcionalmente sincroniza nos dois sentidos com a planilha: lançamentos
+    locais ainda não enviados vão para a planilha e linhas novas da planilha
+    entram no banco. A planilha manda nas linhas que já foram sincronizadas.
+    """
+    nome = "sqlite"
+    usa_snapshot = False # O banco já é local
+
+    def __init__(self, caminho, obter_worksheet=None, nome_aba=None):
+        self.caminho = Path(caminho)
+        self.obter_worksheet = obter_worksheet # Só usado na sincronização com a planilha
+        self.nome_aba = nome_aba
+        self.envia_para_planilha = obter_worksheet is not None
+        self.enviados = 0
+        self.ultimo_erro = None
+        self._lock_sync = threading.Lock()
+        self._criar_tabelas()
+
+    def _conectar(self):
+        # Uma conexão por operação: as sessões do Streamlit rodam em threads diferentes
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    def _criar_tabelas(self):
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS lancamentos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Usuario TEXT NOT NULL,
+                    Data TEXT NOT NULL,
+                    Tipo TEXT NOT NULL,
+                    Categoria TEXT,
+                    Descricao TEXT,
+                    Valor REAL,
+                    Forma_pgto TEXT,
+                    hash TEXT NOT NULL,
+                    sincronizado INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_lancamentos_usuario_data ON lancamentos (Usuario, Data);
+                CREATE INDEX IF NOT EXISTS idx_lancamentos_tipo_categoria ON lancamentos (Tipo, Categoria);
+                CREATE INDEX IF NOT EXISTS idx_lancamentos_hash ON lancamentos (hash);
+                CREATE INDEX IF NOT EXISTS idx_lancamentos_sincronizado ON lancamentos (sincronizado);
+
+                -- Versão dos dados: muda a cada alteração, para invalidar os caches do app
+                CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+                INSERT OR IGNORE INTO meta (chave, valor) VALUES ('versao', 0);
+                CREATE TRIGGER IF NOT EXISTS tg_lancamentos_insert AFTER INSERT ON lancamentos
+                    BEGIN UPDATE meta SET valor = valor + 1 WHERE chave = 'versao'; END;
+                CREATE TRIGGER IF NOT EXISTS tg_lancamentos_update AFTER UPDATE OF Usuario, Data, Tipo, Categoria, Descricao, Valor, Forma_pgto ON lancamentos
+                    BEGIN UPDATE meta SET valor = valor + 1 WHERE chave = 'versao'; END;
+                CREATE TRIGGER IF NOT EXISTS tg_lancamentos_delete AFTER DELETE ON lancamentos
+                    BEGIN UPDATE meta SET valor = valor + 1 WHERE chave = 'versao'; END;
+            """)
+            # Bancos antigos podem ter datas como vieram da planilha (por exemplo, 15/03/2024)
+            fora_do_padrao = conexao.execute("SELECT id, Data FROM lancamentos WHERE date(Data) IS NULL").fetchall()
+            if fora_do_padrao:
+                ids, datas = zip(*fora_do_padrao)
+                conexao.executemany("UPDATE lancamentos SET Data = ? WHERE id = ? AND Data <> ?",
+                                    [(nova, i, nova) for i, nova in zip(ids, _datas_iso(datas))])
+
+    def _versao(self, conexao):
+        versao = conexao.execute("SELECT valor FROM meta WHERE chave = 'versao'").fetchone()[0]
+        return f"sqlite-{versao}"
+
+    def carregar(self):
+        """
+        Retorna (cabecalho, linhas, versao), na ordem em que os lançamentos foram gravados.
+        """
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(f"SELECT {', '.join(COLUNAS)} FROM lancamentos ORDER BY id").fetchall()
+            return list(COLUNAS), [list(l) for l in linhas], self._versao(conexao)
+
+    def marca_modificacao(self):
+        """
+        Versão do banco e, com a sincronização ligada, a data de modificação da planilha.
+        """
+        with closing(self._conectar()) as conexao:
+            versao = self._versao(conexao)
+        if self.obter_worksheet is None:
+            return versao
+        return versao, self.obter_worksheet().spreadsheet.get_lastUpdateTime()
+
+    def salvar(self, linhas, sincronizado=False):
+        # O hash é o da linha como veio, para continuar batendo com a planilha
+        datas = _datas_iso([l[1] for l in linhas])
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.executemany(
+                f"INSERT INTO lancamentos ({', '.join(COLUNAS)}, hash, sincronizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [[l[0], data, *l[2:]] + [_hash_lancamento(l), int(sincronizado)] for l, data in zip(linhas, datas)],
+            )
+
+    def consultar_cubo(self):
+        """
+        Agregações feitas no SQL: o cubo (Usuario, Mes/Ano, Tipo, Categoria, Valor)
+        e o impacto diário no saldo (Usuario, Data, Impacto). Ver agregacoes.agregar_cubo.
+        """
+        # Ignora linhas com data ou valor inválidos, como o tipar_dados faz
+        validas = "date(Data) IS NOT NULL AND typeof(Valor) IN ('real', 'integer')"
+        with closing(self._conectar()) as conexao:
+            cubo = pd.read_sql_query(
+                f"""SELECT Usuario, substr(Data, 1, 7) AS "Mes/Ano", Tipo, Categoria, SUM(Valor) AS Valor
+                    FROM lancamentos WHERE {validas}
+                    GROUP BY Usuario, "Mes/Ano", Tipo, Categoria""",
+                conexao,
+            )
+            impacto = pd.read_sql_query(
+                f"""SELECT Usuario, date(Data) AS Data,
+                           SUM(CASE WHEN Tipo = 'Receita' THEN Valor ELSE -Valor END) AS Impacto
+                    FROM lancamentos WHERE {validas}
+                    GROUP BY Usuario, date(Data)""",
+                conexao,
+            )
+        impacto["Data"] = pd.to_datetime(impacto["Data"])
+        return cubo, impacto
+
+    def sincronizar_com_planilha(self):
+        """
+        Envia para a planilha os lançamentos locais ainda não sincronizados e
+        traz as linhas da planilha que ainda não estão no banco. Linhas
+        sincronizadas que sumiram da planilha são removidas do banco.
+        """
+        with self._lock_sync:
+            try:
+                worksheet = self.obter_worksheet()
+
+                # 1) Envia os pendentes em um único append_rows
+                with closing(self._conectar()) as conexao:
+                    pendentes = conexao.execute(
+                        f"SELECT id, {', '.join(COLUNAS)} FROM lancamentos WHERE sincronizado = 0 ORDER BY id"
+                    ).fetchall()
+                if pendentes:
+                    worksheet.append_rows([list(p[1:]) for p in pendentes])
+                    with closing(self._conectar()) as conexao, conexao:
+                        conexao.executemany("UPDATE lancamentos SET sincronizado = 1 WHERE id = ?",
+                                            [(p[0],) for p in pendentes])
+                    self.enviados += len(pendentes)
+
+                # 2) Compara as linhas da planilha (leitura incremental) com as já sincronizadas
+                cabecalho, linhas, _ = sincronizar(worksheet, self.nome_aba)
+                posicoes = [cabecalho.index(c) for c in COLUNAS]
+                linhas_planilha = [[l[i] for i in posicoes] for l in linhas]
+                na_planilha = Counter(_hash_lancamento(l) for l in linhas_planilha)
+
+                with closing(self._conectar()) as conexao, conexao:
+                    no_banco = Counter(dict(conexao.execute(
+                        "SELECT hash, COUNT(*) FROM lancamentos WHERE sincronizado = 1 GROUP BY hash"
+                    ).fetchall()))
+
+                    # Linhas novas na planilha entram no banco
+                    faltando = na_planilha - no_banco
+                    novas = []
+                    for linha in linhas_planilha:
+                        h = _hash_lancamento(linha)
+                        if faltando[h] > 0:
+                            faltando[h] -= 1
+                            novas.append(linha + [h, 1])
+                    for linha, data in zip(novas, _datas_iso([l[1] for l in novas])):
+                        linha[1] = data
+                    conexao.executemany(
+                        f"INSERT INTO lancamentos ({', '.join(COLUNAS)}, hash, sincronizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        novas,
+                    )
+
+                    # Linhas apagadas da planilha saem do banco
+                    for h, quantidade in (no_banco - na_planilha).items():
+                        conexao.execute(
+                            "DELETE FROM lancamentos WHERE id IN "
+                            "(SELECT id FROM lancamentos WHERE hash = ? AND sincronizado = 1 ORDER BY id DESC LIMIT ?)",
+                            (h, quantidade),
+                        )
+                self.ultimo_erro = None
+            except Exception as e:
+                self.ultimo_erro = str(e)
+                raise
+
+    def status(self):
+        """
+        Retorna (pendentes, enviados, ultimo_erro): pendentes são os lançamentos
+        ainda não enviados para a planilha (zero se não houver sincronização).
+        """
+        if self.obter_worksheet is None:
+            return 0, 0, None
+        with closing(self._conectar()) as conexao:
+            pendentes = conexao.execute("SELECT COUNT(*) FROM lancamentos WHERE sincronizado = 0").fetchone()[0]
+        return pendentes, self.enviados, self.ultimo_erro
+
+    def lancamentos_pendentes(self):
+        # Os lançamentos entram no banco assim que são salvos: carregar() já os devolve
+        return []
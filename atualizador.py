@@ -0,0 +1,147 @@
+# atualizador.py
+import logging
+import threading
+import time
+
+import metricas
+
+logger = logging.getLogger(__name__)
+
+
+class AtualizadorDados:
+    """
+    Guarda em memória a versão mais recente do livro-caixa e a renova em
+    segundo plano (stale-while-revalidate): quem lê recebe na hora a última
+    versão boa, junto com a idade dela, e nunca espera a planilha, exceto na
+    primeira carga quando ainda não há nada guardado.
+
+    A thread de atualização consulta `obter_marca` (uma marca barata de
+    modificação, como o lastUpdateTime da planilha) a cada
+    `intervalo_verificacao` segundos e recarrega quando ela muda, quando
+    alguém chama disparar() ou, de qualquer forma, a cada `intervalo_maximo`
+    segundos. Se a recarga falhar, os dados antigos continuam sendo servidos
+    e o erro fica em `ultimo_erro`.
+    """
+
+    def __init__(self, buscar, obter_marca=None, intervalo_verificacao=30.0, intervalo_maximo=600.0,
+                 inicial=None, idade_inicial=0.0):
+        self.buscar = buscar # buscar(atual) -> DataFrame novo, ou None se os dados não mudaram
+        self.obter_marca = obter_marca
+        self.intervalo_verificacao = intervalo_verificacao
+        self.intervalo_maximo = intervalo_maximo
+
+        self.ultimo_erro = None
+        self._marca = None
+        # (DataFrame, momento da última confirmação): trocado numa única atribuição
+        self._estado = None if inicial is None else (inicial, time.time() - idade_inicial)
+        self._lock = threading.Lock() # Uma recarga por vez
+        self._evento = threading.Event()
+        self._thread = None
+        self._parado = False
+
+    def obter(self):
+        """
+        Retorna (DataFrame, idade em segundos) da última versão boa.
+        Só espera a carga se ainda não houver nenhuma versão; aí, erros são propagados.
+        """
+        estado = self._estado
+        if estado is None:
+            # Quem esperou outra sessão terminar a primeira carga aproveita o resultado dela
+            self.atualizar(levantar=True, somente_se_vazio=True)
+            estado = self._estado
+        df, confirmado_em = estado
+        return df, time.time() - confirmado_em
+
+    @property
+    def idade(self):
+        """
+        Segundos desde que os dados atuais foram confirmados (infinito se ainda não há dados).
+        """
+        estado = self._estado
+        return float("inf") if estado is None else time.time() - estado[1]
+
+    @property
+    def versao(self):
+        estado = self._estado
+        return None if estado is None else estado[0].attrs.get("versao")
+
+    def _ler_marca(self):
+        if self.obter_marca is None:
+            return None
+        try:
+            return self.obter_marca()
+        except Exception as e:
+            # Sem a marca, vale só o intervalo máximo
+            logger.debug("Não foi possível ler a marca de modificação: %s", e)
+            return None
+
+    def atualizar(self, levantar=False, somente_se_vazio=False):
+        """
+        Recarrega os dados agora, na thread de quem chamou. Retorna True se deu certo.
+        Em caso de falha, mantém a versão atual (ou propaga o erro, se `levantar`).
+        Com `somente_se_vazio`, não faz nada se já houver uma versão carregada.
+        """
+        with self._lock:
+            if somente_se_vazio and self._estado is not None:
+                return True
+            atual = None if self._estado is None else self._estado[0]
+            marca = self._ler_marca()
+            try:
+                with metricas.etapa("atualizador/recarregar"):
+                    novo = self.buscar(atual)
+            except Exception as e:
+                self.ultimo_erro = str(e)
+                logger.warning("Falha ao atualizar os dados; mantendo a versão anterior: %s", e)
+                if levantar:
+                    raise
+                return False
+            # Troca atômica: leitores veem a versão antiga ou a nova, nunca um meio-termo
+            self._estado = (atual if novo is None else novo, time.time())
+            self._marca = marca
+            self.ultimo_erro = None
+            return True
+
+    def disparar(self):
+        """
+        Pede uma recarga em segundo plano, sem esperar.
+        """
+        self._evento.set()
+
+    def _precisa_atualizar(self):
+        estado = self._estado
+        if estado is None or time.time() - estado[1] >= self.intervalo_maximo:
+            return True
+        marca = self._ler_marca()
+        return marca is not None and marca != self._marca
+
+    def _executar(self):
+        while True:
+            disparado = self._evento.wait(self.intervalo_verificacao)
+            self._evento.clear()
+            if self._parado:
+                return
+            if disparado or self._precisa_atualizar():
+                self.atualizar()
+
+    def iniciar(self):
+        """
+        Inicia a thread de atualização (uma única vez). Se os dados iniciais
+        já estiverem velhos, a primeira recarga começa logo.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="atualizador-dados", daemon=True)
+            self._thread.start()
+            estado = self._estado
+            if estado is not None and time.time() - estado[1] >= self.intervalo_maximo:
+                self._evento.set()
+        return self
+
+    def parar(self, timeout=None):
+        """
+        Encerra a thread de atualização, esperando a recarga em andamento (se houver) terminar.
+        Os dados guardados continuam disponíveis em obter().
+        """
+        self._parado = True
+        self._evento.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
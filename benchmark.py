@@ -0,0 +1,221 @@
+# benchmark.py
+"""
+Mede o tempo das etapas do app com livros-caixa sintéticos de vários tamanhos,
+sem acessar o Google Sheets nem a OpenAI (usa planilha_fake.PlanilhaFake).
+
+Uso:
+    python benchmark.py                          # 1k, 10k, 100k e 1M linhas
+    python benchmark.py --tamanhos 1000 10000 --repeticoes 5 --saida bench_output.json
+
+O resultado é gravado em JSON (uma entrada por tamanho e etapa) para comparar
+versões do código e encontrar regressões.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# As cópias locais do benchmark não podem misturar com as do app; a pasta é apagada no fim
+_DIRETORIO_BENCH = tempfile.TemporaryDirectory(prefix="lovefintech-bench-")
+os.environ["LOVEFINTECH_CACHE"] = _DIRETORIO_BENCH.name
+
+import pandas as pd
+
+from planilha_fake import PlanilhaFake, PastaPlanilhaFake, gerar_linhas
+from armazenamento import ArmazenamentoParticionado
+from sincronizacao import sincronizar, descartar_copia
+from cache_local import tipar_dados, gravar_snapshot, ler_snapshot, CAMINHO_SNAPSHOT
+import sheets_connector
+from agregacoes import calcular_agregados, CASAL
+from consultas import IndiceLancamentos
+from graficos import (figura_despesas_categoria, figura_evolucao_saldo, figura_despesas_mensais_categoria,
+                      figura_mensal, figura_saldo_acumulado, figura_despesas_por_usuario)
+from gpt_insights import montar_prompt
+from resumo_dados import resumir_dados, contar_tokens
+from importacao import ler_extrato, importar_extrato, obter_indice_hashes
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def medir(funcao, repeticoes):
+    """
+    Executa `funcao` algumas vezes e retorna (tempos em segundos, último resultado).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def carregar_dados_do_zero(planilha):
+    """
+    sheets_connector.carregar_dados() como o app chama na primeira abertura
+    (sem snapshot nem cópia local), com a planilha fake no lugar do Google Sheets.
+    """
+    CAMINHO_SNAPSHOT.unlink(missing_ok=True)
+    descartar_copia(sheets_connector.NOME_ABA)
+    sheets_connector.obter_worksheet = lambda: planilha
+    sheets_connector.obter_armazenamento.clear()
+    sheets_connector._atualizador = None
+    return sheets_connector.carregar_dados()
+
+
+def parar_atualizador():
+    """
+    Encerra a thread de atualização criada por carregar_dados_do_zero, para que
+    ela não recarregue os dados (nem regrave o snapshot) no meio das próximas medições.
+    """
+    if sheets_connector._atualizador is not None:
+        sheets_connector._atualizador.parar()
+        sheets_connector._atualizador = None
+
+
+def executar(tamanho, repeticoes):
+    """
+    Roda todas as etapas para um livro-caixa de `tamanho` linhas e retorna os resultados.
+    """
+    resultados = []
+
+    def registrar(etapa, tempos, **extra):
+        resultados.append({
+            "linhas": tamanho,
+            "etapa": etapa,
+            "min_s": min(tempos),
+            "mediana_s": statistics.median(tempos),
+            "repeticoes": len(tempos),
+            **extra,
+        })
+        print(f"{tamanho:>9} linhas  {etapa:<40} {min(tempos) * 1000:>10.1f} ms", file=sys.stderr)
+
+    linhas = gerar_linhas(tamanho)
+    planilha = PlanilhaFake(linhas)
+
+    # Carga: sincronização completa, incremental e montagem do DataFrame (carregar_dados)
+    tempos, (cabecalho, linhas_sync, versao) = medir(lambda: sincronizar(planilha, "bench", forcar_completa=True), 1)
+    registrar("carregar_dados/sincronizacao_completa", tempos)
+
+    planilha.valores.extend(gerar_linhas(100, semente=7))
+    tempos, (cabecalho, linhas_sync, versao) = medir(lambda: sincronizar(planilha, "bench"), 1)
+    registrar("carregar_dados/sincronizacao_incremental_100", tempos)
+
+    # A etapa inteira, de ponta a ponta: sincronização, DataFrame, tipos e snapshot
+    tempos = []
+    for _ in range(repeticoes):
+        tempo, df_app = medir(lambda: carregar_dados_do_zero(planilha), 1)
+        tempos.extend(tempo)
+        parar_atualizador() # Fora da medição
+    registrar("carregar_dados/total", tempos, linhas_carregadas=len(df_app))
+
+    # Mesmos lançamentos em uma aba por ano: primeira carga (todas as abas, em paralelo) e
+    # recargas seguintes (anos encerrados vêm da cópia permanente, só o ano atual é relido)
+    pasta = PastaPlanilhaFake([planilha])
+    ArmazenamentoParticionado(lambda: pasta).migrar(planilha)
+    particionado = ArmazenamentoParticionado(lambda: pasta)
+    tempos, _ = medir(particionado.carregar, 1)
+    registrar("particoes/carregar_primeira", tempos, particoes=len(pasta.abas) - 1)
+    tempos, _ = medir(particionado.carregar, repeticoes)
+    registrar("particoes/carregar_seguinte", tempos)
+
+    tempos, bruto = medir(lambda: pd.DataFrame(linhas_sync, columns=cabecalho), repeticoes)
+    registrar("carregar_dados/dataframe", tempos)
+
+    # Conversão de tipos (antes feita no app.py a cada rerun)
+    tempos, df = medir(lambda: tipar_dados(bruto), repeticoes)
+    registrar("tipagem/tipar_dados", tempos)
+
+    tempos, _ = medir(lambda: gravar_snapshot(df, versao), 1)
+    registrar("snapshot/gravar", tempos)
+    tempos, _ = medir(ler_snapshot, repeticoes)
+    registrar("snapshot/ler", tempos)
+
+    # Agregações e índice
+    tempos, agregados = medir(lambda: calcular_agregados(df), repeticoes)
+    registrar("agregacoes/calcular_agregados", tempos)
+
+    tempos, indice = medir(lambda: IndiceLancamentos(df), repeticoes)
+    registrar("consultas/construir_indice", tempos)
+    tempos, _ = medir(lambda: indice.filtrar(usuario="Carol", tipo="Despesa", categorias=["Lazer"], texto="cinema"), repeticoes)
+    registrar("consultas/filtrar", tempos)
+
+    # Construção de cada gráfico (usuário e casal) e tamanho do JSON enviado ao navegador
+    agg_ind, agg_casal = agregados["Carol"], agregados[CASAL]
+    graficos = {
+        "despesas_categoria": lambda: figura_despesas_categoria(agg_ind["despesas_categoria"], "t"),
+        "evolucao_saldo": lambda: figura_evolucao_saldo(agg_ind["saldo_diario"], "t", "#0041BB"),
+        "despesas_mensais_categoria": lambda: figura_despesas_mensais_categoria(agg_ind["despesas_mensais_categoria"], "t"),
+        "mensal": lambda: figura_mensal(agg_ind["mensal"], "t", "#DC3545"),
+        "saldo_acumulado": lambda: figura_saldo_acumulado(agg_ind["saldo_mensal"], "t"),
+        "casal/despesas_categoria": lambda: figura_despesas_categoria(agg_casal["despesas_categoria"], "t"),
+        "casal/evolucao_saldo": lambda: figura_evolucao_saldo(agg_casal["saldo_diario"], "t", "#007BFF"),
+        "casal/despesas_por_usuario": lambda: figura_despesas_por_usuario(agg_casal["despesas_por_usuario"], "t"),
+        "casal/mensal": lambda: figura_mensal(agg_casal["mensal"], "t", "#C5C5C5"),
+        "casal/saldo_acumulado": lambda: figura_saldo_acumulado(agg_casal["saldo_mensal"], "t"),
+    }
+    for nome, construir in graficos.items():
+        tempos, figura = medir(construir, repeticoes)
+        registrar(f"graficos/{nome}", tempos, bytes_json=len(figura.to_json()))
+
+    # Montagem do prompt do insight (sem chamar a IA)
+    tempos, prompt = medir(lambda: montar_prompt(resumir_dados(df)), repeticoes)
+    registrar("insight/montar_prompt", tempos, tokens_prompt=contar_tokens(prompt))
+
+    # Importação de um extrato CSV (formato brasileiro) com a deduplicação contra o livro-caixa
+    extrato = ("Data;Descrição;Valor\n" + "".join(
+        f"{l[1][8:]}/{l[1][5:7]}/{l[1][:4]};{l[4]};{'-' if l[2] == 'Despesa' else ''}{l[5].replace('.', ',')}\n"
+        for l in gerar_linhas(tamanho, semente=99)
+    )).encode("utf-8")
+    tempos, existentes = medir(lambda: obter_indice_hashes(df), 1)
+    registrar("importacao/indice_hashes", tempos)
+    tempos, resumo = medir(lambda: importar_extrato(ler_extrato(io.BytesIO(extrato), "extrato.csv"), "Carol",
+                                                    existentes, lambda lote: None), repeticoes)
+    registrar("importacao/importar_extrato_csv", tempos, importadas=resumo["importadas"])
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do Lovefintech com dados sintéticos.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO, help="Quantidades de linhas a testar")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições de cada etapa (vale o menor tempo)")
+    parser.add_argument("--saida", default="bench_output.json", help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    resultados = []
+    try:
+        for tamanho in args.tamanhos:
+            resultados.extend(executar(tamanho, args.repeticoes))
+    finally:
+        _DIRETORIO_BENCH.cleanup()
+
+    saida = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _versao_codigo(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
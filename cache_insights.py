@@ -0,0 +1,72 @@
+# cache_insights.py
+import json
+import os
+import threading
+import time
+
+from sincronizacao import DIRETORIO_CACHE
+
+CAMINHO_CACHE_INSIGHTS = DIRETORIO_CACHE / "insights.json"
+
+
+class CacheInsights:
+    """
+    Cache persistente de insights gerados, com validade (TTL) e limite de
+    entradas (remove as menos usadas recentemente).
+
+    Pedidos simultâneos do mesmo insight são agrupados em gpt_insights (ver
+    GeracaoInsight), que só guarda aqui o texto completo.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_INSIGHTS, ttl=24 * 60 * 60, max_entradas=200):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._entradas = self._ler()
+
+    def _ler(self):
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar(self):
+        """
+        Grava o cache em disco de forma atômica. Chamado com o lock já adquirido.
+        """
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self._entradas, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def obter(self, chave):
+        """
+        Retorna o insight guardado para a chave, ou None se não existir ou tiver vencido.
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            agora = time.time()
+            if agora - entrada["criado_em"] > self.ttl:
+                del self._entradas[chave]
+                self._gravar()
+                return None
+            entrada["usado_em"] = agora
+            return entrada["texto"]
+
+    def guardar(self, chave, texto):
+        with self._lock:
+            agora = time.time()
+            self._entradas[chave] = {"texto": texto, "criado_em": agora, "usado_em": agora}
+            # Descarta as entradas vencidas e, se ainda passar do limite, as menos usadas
+            self._entradas = {
+                k: v for k, v in self._entradas.items() if agora - v["criado_em"] <= self.ttl
+            }
+            if len(self._entradas) > self.max_entradas:
+                mais_recentes = sorted(self._entradas.items(), key=lambda kv: kv[1]["usado_em"], reverse=True)
+                self._entradas = dict(mais_recentes[:self.max_entradas])
+            self._gravar()
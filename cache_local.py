@@ -0,0 +1,96 @@
+# cache_local.py
+import os
+import time
+
+import pandas as pd
+
+from sincronizacao import DIRETORIO_CACHE
+
+# Snapshot colunar (Parquet) do livro-caixa, já com os tipos corretos
+CAMINHO_SNAPSHOT = DIRETORIO_CACHE / "lancamentos.parquet"
+
+COLUNAS_CATEGORICAS = ["Usuario", "Tipo", "Categoria", "Forma_pgto"]
+
+
+def tipar_dados(df):
+    """
+    Converte os registros crus da planilha para colunas tipadas.
+    Feito uma única vez, na gravação do snapshot, e não a cada rerun do app.
+    """
+    if df.empty or "Valor" not in df.columns:
+        return df
+
+    df = df.copy()
+    # Garante que as colunas 'Valor' e 'Data' estão no formato correto
+    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce").astype("float64")
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce").dt.normalize()
+
+    # Remove linhas com valores nulos que podem ter surgido da conversão
+    df = df.dropna(subset=["Valor", "Data"]).reset_index(drop=True)
+
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype(str).astype("category")
+
+    # A sincronização converte textos numéricos (ex.: descrição "2024") em números,
+    # e o Parquet não aceita uma coluna de texto misturada com inteiros
+    for coluna in df.columns.difference(["Valor", "Data", *COLUNAS_CATEGORICAS]):
+        if df[coluna].dtype == object:
+            df[coluna] = df[coluna].fillna("").astype(str)
+
+    # Colunas de mês para análises mensais: o período (ordenável) e o rótulo 'AAAA-MM' para os gráficos
+    df["Mes"] = df["Data"].dt.to_period("M")
+    meses = sorted(df["Mes"].unique())
+    df["Mes/Ano"] = pd.Categorical(df["Mes"].astype(str), categories=[str(m) for m in meses], ordered=True)
+    return df
+
+
+def ler_snapshot():
+    """
+    Lê o snapshot local direto nos tipos certos. Retorna None se ainda não existir.
+    """
+    try:
+        return pd.read_parquet(CAMINHO_SNAPSHOT, memory_map=True)
+    except (OSError, ValueError):
+        return None
+
+
+def idade_snapshot():
+    """
+    Segundos desde a última vez que o snapshot foi confirmado com a planilha.
+    """
+    try:
+        return time.time() - os.path.getmtime(CAMINHO_SNAPSHOT)
+    except OSError:
+        return float("inf")
+
+
+def gravar_snapshot(df, versao):
+    """
+    Grava o snapshot tipado junto com a versão (checksum) dos dados de origem.
+    """
+    DIRETORIO_CACHE.mkdir(parents=True, exist_ok=True)
+    df.attrs["versao"] = versao
+    temporario = CAMINHO_SNAPSHOT.with_suffix(".tmp")
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, CAMINHO_SNAPSHOT)
+
+
+def marcar_snapshot_atualizado():
+    """
+    Registra que o snapshot continua igual à planilha (atualiza a data de modificação).
+    """
+    try:
+        os.utime(CAMINHO_SNAPSHOT)
+    except OSError:
+        pass
+
+
+def invalidar_snapshot():
+    """
+    Marca o snapshot como vencido, para que a próxima carga consulte a planilha.
+    """
+    try:
+        os.utime(CAMINHO_SNAPSHOT, (0, 0))
+    except OSError:
+        pass
@@ -0,0 +1,131 @@
+# consultas.py
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agregacoes import versao_dados
+import metricas
+
+COLUNAS_INDEXADAS = ["Usuario", "Tipo", "Categoria", "Mes/Ano"]
+
+
+class IndiceLancamentos:
+    """
+    Índices pré-calculados sobre os lançamentos, para filtrar sem varrer a tabela inteira.
+
+    Os lançamentos ficam ordenados por data; cada valor de Usuario, Tipo,
+    Categoria e Mes/Ano aponta para as posições (ordenadas) das suas linhas.
+    Filtros por período viram uma busca binária. A consulta parte do filtro
+    mais seletivo e confere os demais só nas linhas candidatas, pelos códigos
+    de cada coluna.
+    """
+
+    def __init__(self, df):
+        self.df = df.sort_values("Data", kind="stable").reset_index(drop=True)
+        self._datas = self.df["Data"].to_numpy()
+        self._codigos = {}
+        self._indices = {}
+        for coluna in COLUNAS_INDEXADAS:
+            if coluna not in self.df.columns:
+                continue
+            codigos, valores = pd.factorize(self.df[coluna].astype(str))
+            self._codigos[coluna] = (codigos, {v: i for i, v in enumerate(valores)})
+            ordem = np.argsort(codigos, kind="stable")
+            limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+            self._indices[coluna] = {v: ordem[limites[i]:limites[i + 1]] for i, v in enumerate(valores)}
+
+    def valores(self, coluna):
+        """
+        Valores distintos de uma coluna indexada (para montar os filtros da tela).
+        """
+        return sorted(self._indices.get(coluna, {}))
+
+    def _posicoes(self, coluna, valores, inicio, fim):
+        """
+        Posições (ordenadas) das linhas com algum dos valores, dentro do período [inicio, fim).
+        """
+        indice = self._indices.get(coluna, {})
+        partes = []
+        for v in valores:
+            if v in indice:
+                posicoes = indice[v]
+                partes.append(posicoes[np.searchsorted(posicoes, inicio):np.searchsorted(posicoes, fim)])
+        if not partes:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(partes)) if len(partes) > 1 else partes[0]
+
+    def filtrar(self, usuario=None, tipo=None, categorias=None, meses=None,
+                data_inicio=None, data_fim=None, texto=None):
+        """
+        Retorna as posições (em ordem de data) dos lançamentos que atendem a todos os filtros.
+        Filtros com None não restringem nada; usuario/tipo aceitam um valor,
+        categorias/meses aceitam uma lista.
+        """
+        # Período: as linhas estão ordenadas por data, então o intervalo é contínuo
+        inicio = 0 if data_inicio is None else np.searchsorted(self._datas, np.datetime64(pd.Timestamp(data_inicio)), "left")
+        fim = len(self.df) if data_fim is None else np.searchsorted(self._datas, np.datetime64(pd.Timestamp(data_fim)), "right")
+        filtros = {
+            coluna: [str(v) for v in valores]
+            for coluna, valores in (("Usuario", [usuario] if usuario else None),
+                                    ("Tipo", [tipo] if tipo else None),
+                                    ("Categoria", categorias or None),
+                                    ("Mes/Ano", meses or None))
+            if valores
+        }
+
+        if not filtros:
+            posicoes = np.arange(inicio, fim)
+        else:
+            # Começa pelo filtro com menos linhas no índice...
+            def tamanho(coluna):
+                return sum(len(self._indices[coluna].get(v, ())) for v in filtros[coluna])
+            primeira = min(filtros, key=tamanho)
+            posicoes = self._posicoes(primeira, filtros[primeira], inicio, fim)
+
+            # ...e confere os outros só nas candidatas
+            for coluna, valores in filtros.items():
+                if coluna == primeira or len(posicoes) == 0:
+                    continue
+                codigos, mapa = self._codigos[coluna]
+                desejados = [mapa[v] for v in valores if v in mapa]
+                posicoes = posicoes[np.isin(codigos[posicoes], desejados)]
+
+        # A busca por texto só olha as linhas que sobraram dos outros filtros
+        if texto:
+            descricoes = self.df["Descricao"].iloc[posicoes].astype(str)
+            contem = descricoes.str.contains(texto, case=False, regex=False).to_numpy()
+            posicoes = posicoes[contem]
+
+        return posicoes
+
+    def selecionar(self, **filtros):
+        """
+        Mesmo que filtrar, mas devolve o DataFrame com as linhas encontradas.
+        """
+        return self.df.iloc[self.filtrar(**filtros)]
+
+    def pagina(self, posicoes, numero, tamanho=50, mais_recentes_primeiro=True):
+        """
+        Retorna (DataFrame da página, total de páginas). As páginas começam em 1.
+        """
+        total_paginas = max(1, math.ceil(len(posicoes) / tamanho))
+        numero = min(max(1, numero), total_paginas)
+        if mais_recentes_primeiro:
+            posicoes = posicoes[::-1]
+        trecho = posicoes[(numero - 1) * tamanho:numero * tamanho]
+        return self.df.iloc[trecho], total_paginas
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _indice_por_versao(versao, _df):
+    metricas.marcar_execucao()
+    return IndiceLancamentos(_df)
+
+
+def obter_indice(df):
+    """
+    Retorna o índice dos lançamentos, construído uma vez por versão dos dados.
+    """
+    return metricas.chamar_cacheado("indice", _indice_por_versao, versao_dados(df), df)
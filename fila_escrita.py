@@ -0,0 +1,247 @@
+# fila_escrita.py
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+
+from sincronizacao import DIRETORIO_CACHE
+
+# Diário local (write-ahead) dos lançamentos que ainda não chegaram na planilha
+CAMINHO_FILA = DIRETORIO_CACHE / "fila_lancamentos.jsonl"
+# Depois de tantos bytes já enviados no início do diário, ele é compactado mesmo sem ter esvaziado
+LIMITE_COMPACTACAO = 4 * 1024 * 1024
+
+
+def _caminho_posicao(caminho):
+    return caminho.with_suffix(".pos")
+
+
+def _ler_posicao(caminho):
+    """
+    Até onde (em bytes) o diário já foi enviado. A posição só vale para o mesmo
+    arquivo (mesmo inode): se o diário foi compactado depois dela, recomeça do zero.
+    """
+    try:
+        with open(_caminho_posicao(caminho), encoding="utf-8") as f:
+            posicao = json.load(f)
+        estado = os.stat(caminho)
+    except (OSError, ValueError):
+        return 0
+    if posicao.get("inode") != estado.st_ino or not 0 <= posicao.get("bytes", 0) <= estado.st_size:
+        return 0
+    return posicao["bytes"]
+
+
+def ha_pendentes(caminho=CAMINHO_FILA):
+    """
+    Se há lançamentos no diário esperando envio, sem precisar criar a fila.
+    """
+    try:
+        return os.path.getsize(caminho) > _ler_posicao(caminho)
+    except OSError:
+        return False
+
+
+class FilaEscrita:
+    """
+    Fila durável de lançamentos a serem gravados na planilha.
+
+    Cada lançamento é gravado primeiro no diário local (um JSON por linha) e
+    depois enviado em lotes com append_rows por uma thread em segundo plano,
+    com novas tentativas e espera exponencial em caso de falha. O lançamento
+    só sai do diário depois que a planilha confirmou o envio.
+
+    O diário não é reescrito a cada lote: um arquivo ao lado (.pos) guarda até
+    que byte ele já foi enviado, e cada lote é lido a partir dali. O arquivo só
+    é recriado quando esvazia ou quando a parte já enviada passa de
+    LIMITE_COMPACTACAO, então esvaziar o diário custa o mesmo por lançamento,
+    seja qual for o tamanho dele.
+    """
+
+    def __init__(self, obter_worksheet, caminho=CAMINHO_FILA, tamanho_lote=500,
+                 atraso_lote=1.0, espera_inicial=2.0, espera_maxima=300.0, ao_descarregar=None, chave_lote=None):
+        self.obter_worksheet = obter_worksheet # Função que devolve a aba (aberta só no primeiro envio)
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.atraso_lote = atraso_lote # Espera um pouco para juntar lançamentos no mesmo lote
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        # Chamado uma vez ao fim de cada descarga que enviou algo (não a cada lote: uma importação
+        # grande gera dezenas de lotes, e quem recarrega os dados só precisa saber no fim)
+        self.ao_descarregar = ao_descarregar
+        # chave_lote(linha): um lote só junta linhas com a mesma chave (por exemplo, a mesma aba de
+        # partição), para que cada append_rows vá para um único lugar e possa ser reenviado por inteiro
+        self.chave_lote = chave_lote
+
+        self.enviados = 0
+        self.ultimo_erro = None
+        self._falhas_seguidas = 0
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._thread = None
+        self._posicao = _ler_posicao(caminho) # Bytes do início do diário já enviados
+        self._pendentes = self._contar_pendentes()
+
+    def _contar_pendentes(self):
+        try:
+            with open(self.caminho, "rb") as f:
+                f.seek(self._posicao)
+                return sum(1 for l in f if l.strip())
+        except OSError:
+            return 0
+
+    def _ler_lote(self):
+        """
+        Lê até `tamanho_lote` lançamentos a partir da parte ainda não enviada.
+        Retorna (lançamentos, posição no arquivo logo depois de cada um).
+        """
+        linhas, fins = [], []
+        posicao = self._posicao
+        try:
+            with open(self.caminho, "rb") as f:
+                f.seek(posicao)
+                for bruta in f:
+                    if not bruta.endswith(b"\n"):
+                        break # Linha ainda sendo gravada por enfileirar_lote
+                    posicao += len(bruta)
+                    if bruta.strip():
+                        linhas.append(json.loads(bruta))
+                        fins.append(posicao)
+                        if len(linhas) == self.tamanho_lote:
+                            break
+        except OSError:
+            pass
+        return linhas, fins
+
+    def linhas_pendentes(self):
+        """
+        Todos os lançamentos que ainda estão no diário esperando envio.
+        """
+        with self._lock:
+            try:
+                with open(self.caminho, "rb") as f:
+                    f.seek(self._posicao)
+                    return [json.loads(l) for l in f if l.strip()]
+            except OSError:
+                return []
+
+    @property
+    def pendentes(self):
+        return self._pendentes
+
+    def enfileirar(self, linha):
+        """
+        Grava o lançamento no diário local e acorda a thread de envio.
+        """
+        self.enfileirar_lote([linha])
+
+    def enfileirar_lote(self, linhas):
+        """
+        Grava vários lançamentos no diário de uma vez (um único fsync), como numa importação de extrato.
+        """
+        if not linhas:
+            return
+        with self._lock:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(linha, ensure_ascii=False) + "\n" for linha in linhas)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendentes += len(linhas)
+        self._evento.set()
+
+    def _gravar_posicao(self, posicao):
+        # Chamado com _lock adquirido. Gravação atômica de um arquivo pequeno, o diário não é tocado
+        caminho = _caminho_posicao(self.caminho)
+        temporario = caminho.with_suffix(".pos.tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"bytes": posicao, "inode": os.stat(self.caminho).st_ino}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+        self._posicao = posicao
+
+    def _compactar(self):
+        """
+        Recria o diário só com a parte ainda não enviada (chamado com _lock adquirido).
+        Se o processo cair entre a troca do arquivo e a nova posição, o inode
+        diferente faz a posição antiga ser descartada: nada é perdido nem pulado.
+        """
+        temporario = self.caminho.with_suffix(".tmp")
+        with open(self.caminho, "rb") as origem, open(temporario, "wb") as destino:
+            origem.seek(self._posicao)
+            shutil.copyfileobj(origem, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+        os.replace(temporario, self.caminho)
+        self._gravar_posicao(0)
+
+    def _remover_enviados(self, quantidade, posicao):
+        """
+        Marca os primeiros lançamentos (já enviados) como fora do diário, avançando a posição.
+        """
+        with self._lock:
+            self._pendentes -= quantidade
+            if self._pendentes == 0 or posicao >= LIMITE_COMPACTACAO:
+                self._posicao = posicao
+                self._compactar()
+            else:
+                self._gravar_posicao(posicao)
+
+    def descarregar(self):
+        """
+        Envia para a planilha tudo o que estiver no diário, em lotes.
+        Retorna quantos lançamentos foram enviados. Erros de envio são propagados.
+        """
+        total = 0
+        try:
+            while True:
+                lote, fins = self._ler_lote()
+                if not lote:
+                    return total
+                if self.chave_lote is not None:
+                    chave = self.chave_lote(lote[0])
+                    lote = list(itertools.takewhile(lambda linha: self.chave_lote(linha) == chave, lote))
+
+                self.obter_worksheet().append_rows(lote)
+                # Se o processo cair entre o envio e a remoção, o lote é reenviado na próxima vez
+                self._remover_enviados(len(lote), fins[len(lote) - 1])
+                self.enviados += len(lote)
+                total += len(lote)
+        finally:
+            # Também quando um lote falha no meio: os anteriores já estão na planilha
+            if total and self.ao_descarregar:
+                self.ao_descarregar()
+
+    def _executar(self):
+        while True:
+            if self._falhas_seguidas:
+                espera = min(self.espera_inicial * 2 ** (self._falhas_seguidas - 1), self.espera_maxima)
+            else:
+                espera = None
+            # Acorda quando chegar lançamento novo ou quando for hora de tentar de novo
+            if self._evento.wait(espera):
+                time.sleep(self.atraso_lote)
+            self._evento.clear()
+
+            try:
+                self.descarregar()
+                self._falhas_seguidas = 0
+                self.ultimo_erro = None
+            except Exception as e:
+                self._falhas_seguidas += 1
+                self.ultimo_erro = str(e)
+
+    def iniciar(self):
+        """
+        Inicia a thread de envio (uma única vez). Lançamentos pendentes de
+        execuções anteriores são enviados logo no início.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+            self._thread.start()
+            if self._pendentes:
+                self._evento.set()
+        return self
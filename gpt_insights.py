@@ -1,61 +1,389 @@
 # gpt_insights.py
-import openai
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from dotenv import load_dotenv, find_dotenv # Importe find_dotenv também
+import streamlit as st
 import os
+from cache_insights import CacheInsights
+import metricas
+from resumo_dados import resumir_dados, contar_tokens
 
-# Carregar variáveis de ambiente do arquivo .env
-# Adicione um print para ver se load_dotenv está encontrando o arquivo
-dotenv_path = find_dotenv()
-print(f"DEBUG: Caminho do .env encontrado por find_dotenv: {dotenv_path}")
-load_dotenv(dotenv_path) # Passe o caminho explícito para load_dotenv
+logger = logging.getLogger(__name__)
 
-# Obtém a chave da API da OpenAI da variável de ambiente
-# AQUI ESTÁ A CORREÇÃO CRÍTICA: os.getenv() deve receber o NOME da variável.
-api_key = os.getenv("OPENAI_API_KEY")
+MODELO = "gpt-3.5-turbo" # Você pode experimentar outros modelos como "gpt-4" se tiver acesso
+# O texto do prompt já entra na chave do cache; aumente ao mudar algo da geração que não aparece
+# nele (temperatura, tamanho da resposta...), para não reaproveitar insights gerados do jeito antigo
+VERSAO_PROMPT = 2
+MENSAGEM_SISTEMA = "Você é um assistente financeiro inteligente para casais. Forneça insights concisos e acionáveis."
+COLUNAS_INSIGHT = ['Data', 'Tipo', 'Categoria', 'Descricao', 'Valor', 'Forma_pgto']
+# Tempo máximo (segundos) de uma geração; depois disso ela é cancelada
+TIMEOUT_INSIGHT = float(os.getenv("INSIGHTS_TIMEOUT", "60"))
 
-# Verifica se a chave da API foi carregada corretamente
-if not api_key:
-    raise ValueError("A chave da API da OpenAI (OPENAI_API_KEY) não foi encontrada nas variáveis de ambiente. Certifique-se de que está definida no seu arquivo .env")
 
-# Crie uma instância do cliente OpenAI, passando a chave diretamente
-client = openai.OpenAI(api_key=api_key)
+class BackendOpenAI:
+    """
+    Gera os insights com a API de chat da OpenAI.
+    """
+    nome = "openai"
 
-def gerar_insight(df_user):
+    def __init__(self, client, modelo=MODELO):
+        self.client = client
+        self.modelo = modelo
+
+    def gerar(self, mensagens, temperature=0.7, max_tokens=200):
+        inicio = time.perf_counter()
+        try:
+            # Nova forma de chamar a API no openai>=1.0.0
+            resposta = self.client.chat.completions.create(
+                model=self.modelo,
+                messages=mensagens,
+                temperature=temperature, # Controla a criatividade da resposta (0.0 a 1.0)
+                max_tokens=max_tokens # Limita o tamanho da resposta em tokens
+            )
+        except Exception as e:
+            metricas.registrar_api("openai", "chat.completions", time.perf_counter() - inicio, erro=str(e))
+            raise
+        uso = getattr(resposta, "usage", None)
+        metricas.registrar_api("openai", "chat.completions", time.perf_counter() - inicio,
+                               tokens_prompt=getattr(uso, "prompt_tokens", 0) or 0,
+                               tokens_resposta=getattr(uso, "completion_tokens", 0) or 0)
+        return resposta.choices[0].message.content.strip()
+
+    def gerar_stream(self, mensagens, temperature=0.7, max_tokens=200, timeout=TIMEOUT_INSIGHT):
+        """
+        Mesmo que gerar, mas devolve os pedaços do texto conforme a API os envia.
+        Fechar o gerador fecha a conexão (cancela a geração).
+        """
+        inicio = time.perf_counter()
+        uso = None
+        erro = None
+        try:
+            resposta = self.client.chat.completions.create(
+                model=self.modelo,
+                messages=mensagens,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}, # O último pedaço traz a contagem de tokens
+                timeout=timeout,
+            )
+            with resposta:
+                for pedaco in resposta:
+                    if pedaco.usage:
+                        uso = pedaco.usage
+                    if pedaco.choices and pedaco.choices[0].delta.content:
+                        yield pedaco.choices[0].delta.content
+        except Exception as e:
+            erro = str(e)
+            raise
+        except GeneratorExit:
+            erro = "cancelado"
+            raise
+        finally:
+            metricas.registrar_api("openai", "chat.completions.stream", time.perf_counter() - inicio, erro=erro,
+                                   tokens_prompt=getattr(uso, "prompt_tokens", 0) or 0,
+                                   tokens_resposta=getattr(uso, "completion_tokens", 0) or 0)
+
+
+class BackendLocal:
     """
-    Gera insights financeiros baseados nos dados do usuário usando a API da OpenAI.
+    Backend offline, sem rede nem chave de API: devolve um texto determinístico
+    a partir do prompt. Serve para testar o cache e medir tempos localmente.
     """
-    if df_user.empty:
-        return "Não há dados suficientes para gerar insights. Por favor, adicione alguns lançamentos."
+    nome = "local"
+
+    def __init__(self, atraso=0.0, atraso_token=0.0):
+        self.modelo = "local"
+        self.atraso = atraso # Simula a latência da API, em segundos
+        self.atraso_token = atraso_token # Intervalo entre os pedaços no modo streaming
+
+    def gerar(self, mensagens, temperature=0.7, max_tokens=200):
+        time.sleep(self.atraso)
+        prompt = mensagens[-1]["content"]
+        return f"Insight local (offline): prompt com {len(prompt)} caracteres e {prompt.count(chr(10))} linhas."
+
+    def gerar_stream(self, mensagens, temperature=0.7, max_tokens=200, timeout=TIMEOUT_INSIGHT):
+        texto = self.gerar(mensagens, temperature, max_tokens)
+        for palavra in texto.split(" "):
+            yield palavra + " "
+            time.sleep(self.atraso_token)
+
+
+@st.cache_resource(show_spinner=False)
+def _backend_padrao():
+    """
+    Cria o backend na primeira vez que um insight for pedido.
+    Escolhe o backend pela variável de ambiente INSIGHTS_BACKEND ("openai" ou "local").
+    O .env e o pacote openai só são carregados aqui, para não pesar na abertura do app.
+    """
+    from dotenv import load_dotenv, find_dotenv # Importe find_dotenv também
+
+    # Carregar variáveis de ambiente do arquivo .env
+    # Registra (em nível debug) se o load_dotenv está encontrando o arquivo
+    dotenv_path = find_dotenv()
+    logger.debug("Caminho do .env encontrado por find_dotenv: %s", dotenv_path)
+    load_dotenv(dotenv_path) # Passe o caminho explícito para load_dotenv
+
+    if os.getenv("INSIGHTS_BACKEND", "openai").lower() == "local":
+        return BackendLocal()
+
+    # Obtém a chave da API da OpenAI da variável de ambiente
+    # AQUI ESTÁ A CORREÇÃO CRÍTICA: os.getenv() deve receber o NOME da variável.
+    api_key = os.getenv("OPENAI_API_KEY")
 
-    # Prepara os dados para o prompt
-    # Seleciona apenas as colunas relevantes para a IA
-    dados_para_ia = df_user[['Data', 'Tipo', 'Categoria', 'Descricao', 'Valor', 'Forma_pgto']].to_string(index=False)
+    # Verifica se a chave da API foi carregada corretamente
+    if not api_key:
+        raise ValueError("A chave da API da OpenAI (OPENAI_API_KEY) não foi encontrada nas variáveis de ambiente. Certifique-se de que está definida no seu arquivo .env")
 
-    prompt = f"""
-    Com base nos seguintes dados financeiros de um casal (Carol e Marcio), gere um insight inteligente e acionável.
+    import openai
+
+    # Crie uma instância do cliente OpenAI, passando a chave diretamente
+    return BackendOpenAI(openai.OpenAI(api_key=api_key))
+
+
+_backend_definido = None
+cache = CacheInsights()
+
+
+def obter_backend():
+    """
+    Backend em uso: o definido com definir_backend ou o padrão, criado no primeiro uso.
+    """
+    return _backend_definido or _backend_padrao()
+
+
+def definir_backend(novo_backend):
+    """
+    Troca o backend usado para gerar os insights (por exemplo, BackendLocal em testes).
+    """
+    global _backend_definido
+    _backend_definido = novo_backend
+
+
+def _chave_insight(mensagens, backend):
+    """
+    Chave do cache: hash das mensagens enviadas (o prompt final, com o resumo
+    dos dados) + backend, modelo e versão do prompt. Tudo o que muda o prompt,
+    como quem fez cada lançamento, muda a chave.
+    """
+    conteudo = json.dumps([backend.nome, backend.modelo, VERSAO_PROMPT, mensagens], ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def montar_prompt(resumo):
+    return f"""
+    Com base no seguinte resumo dos dados financeiros de um casal (Carol e Marcio), gere um insight inteligente e acionável.
     Analise tendências, padrões de gastos, e o saldo geral. Aponte áreas de melhoria ou pontos positivos.
-    Os dados são:
+    O resumo é:
 
-    {dados_para_ia}
+    {resumo}
 
     Insight:
     """
 
-    try:
-        # Nova forma de chamar a API no openai>=1.0.0
-        resposta = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Você pode experimentar outros modelos como "gpt-4" se tiver acesso
-            messages=[
-                {"role": "system", "content": "Você é um assistente financeiro inteligente para casais. Forneça insights concisos e acionáveis."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7, # Controla a criatividade da resposta (0.0 a 1.0)
-            max_tokens=200 # Limita o tamanho da resposta em tokens
-        )
-        return resposta.choices[0].message.content.strip()
 
+def medir_prompt(df_user, prompt, modelo=MODELO):
+    """
+    Registra o tamanho do prompt em tokens (no log e no painel de desempenho do
+    ?debug=1) e quanto teria o prompt antigo com todas as linhas. Esse segundo
+    número é caro em históricos grandes: só é calculado no modo debug ou com
+    INSIGHTS_MEDIR_PROMPT=1. Retorna os números.
+    """
+    medidas = {"linhas": len(df_user), "tokens_resumo": contar_tokens(prompt, modelo)}
+    # Lido a cada chamada: o .env só é carregado quando o primeiro insight é pedido
+    if metricas.ativo() or os.getenv("INSIGHTS_MEDIR_PROMPT") == "1":
+        completo = df_user[COLUNAS_INSIGHT].to_string(index=False)
+        medidas["tokens_completo"] = contar_tokens(completo, modelo)
+    logger.info("Prompt de insight: %s", medidas)
+    metricas.registrar_prompt("insight", medidas["linhas"], medidas["tokens_resumo"], medidas.get("tokens_completo"))
+    return medidas
+
+
+def _mensagem_erro(e):
+    return f"Erro ao gerar insight com IA: {e}. Verifique sua conexão e chave da API."
+
+
+# Threads que conversam com a IA, fora da thread do script do Streamlit
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="insight")
+_lock_andamento = threading.Lock()
+_em_andamento = {} # chave -> GeracaoInsight ainda sem terminar
+
+
+class GeracaoInsight:
+    """
+    Um insight sendo gerado em segundo plano. Os pedaços do texto ficam
+    guardados conforme chegam, e cada chamada a tokens() os repete desde o
+    começo: quem pede o mesmo insight durante a geração acompanha a mesma
+    chamada à IA em vez de abrir outra.
+
+    A geração é cancelada quando o último leitor desiste antes do fim (por
+    exemplo, quando o Streamlit interrompe o script num rerun) ou quando passa
+    do prazo. Só o texto completo vai para o cache.
+    """
+
+    def __init__(self, chave=None, texto=None):
+        self.chave = chave
+        self._pedacos = [] if texto is None else [texto]
+        self._fim = texto is not None # Criada com o texto pronto (cache ou mensagem), já nasce terminada
+        self._erro = None
+        self._leitores = 0
+        self._prazo = float("inf")
+        self._cancelada = threading.Event()
+        self._cond = threading.Condition()
+
+    @property
+    def concluida(self):
+        return self._fim
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        self._cancelada.set()
+
+    def iniciar(self, backend, mensagens, timeout=TIMEOUT_INSIGHT):
+        self._prazo = time.monotonic() + timeout
+        _executor.submit(self._produzir, backend, mensagens, timeout)
+        return self
+
+    def _produzir(self, backend, mensagens, timeout):
+        inicio = time.perf_counter()
+        completo = False
+        try:
+            if hasattr(backend, "gerar_stream"):
+                fluxo = backend.gerar_stream(mensagens, timeout=timeout)
+            else:
+                fluxo = iter([backend.gerar(mensagens)]) # Backend sem streaming: um pedaço só
+            try:
+                for pedaco in fluxo:
+                    if self._cancelada.is_set():
+                        break
+                    if time.monotonic() > self._prazo:
+                        raise TimeoutError(f"a geração passou de {timeout:.0f} s")
+                    if not self._pedacos:
+                        metricas.registrar_etapa("insight/primeiro_token", time.perf_counter() - inicio)
+                    with self._cond:
+                        self._pedacos.append(pedaco)
+                        self._cond.notify_all()
+                else:
+                    completo = True
+            finally:
+                # Fecha a conexão com a IA, inclusive quando a geração foi cancelada
+                fechar = getattr(fluxo, "close", None)
+                if fechar is not None:
+                    fechar()
+        except Exception as e:
+            logger.warning("Falha ao gerar insight: %s", e)
+            self._erro = e
+        finally:
+            texto = "".join(self._pedacos).strip()
+            if completo and texto:
+                cache.guardar(self.chave, texto)
+            metricas.registrar_etapa("insight/gerar", time.perf_counter() - inicio)
+            with _lock_andamento:
+                if _em_andamento.get(self.chave) is self:
+                    del _em_andamento[self.chave]
+            with self._cond:
+                self._fim = True
+                self._cond.notify_all()
+
+    def tokens(self):
+        """
+        Gerador com os pedaços do texto conforme chegam (para st.write_stream).
+        Em caso de erro ou de prazo esgotado, termina com a mensagem de erro.
+        """
+        with self._cond:
+            self._leitores += 1
+        lidos = 0
+        try:
+            while True:
+                with self._cond:
+                    while lidos == len(self._pedacos) and not self._fim:
+                        restante = self._prazo - time.monotonic()
+                        if restante <= 0:
+                            break
+                        self._cond.wait(restante)
+                    novos = self._pedacos[lidos:]
+                    fim = self._fim and lidos + len(novos) == len(self._pedacos)
+                if not novos and not fim:
+                    # A IA parou de responder: desiste sem esperar a thread
+                    self.cancelar()
+                    yield ("\n\n" if lidos else "") + _mensagem_erro(TimeoutError("tempo esgotado"))
+                    return
+                lidos += len(novos)
+                yield from novos
+                if fim:
+                    break
+            if self._erro is not None:
+                yield ("\n\n" if lidos else "") + _mensagem_erro(self._erro)
+        finally:
+            with self._cond:
+                self._leitores -= 1
+                abandonada = self._leitores == 0 and not self._fim
+            if abandonada:
+                self.cancelar()
+
+
+def iniciar_insight(df_user, timeout=TIMEOUT_INSIGHT):
+    """
+    Começa a gerar o insight dos dados em segundo plano e retorna na hora a
+    GeracaoInsight, sem esperar a IA. Se os dados não mudaram desde o último
+    pedido, ela já vem pronta com o insight do cache. Vários insights podem
+    ser iniciados antes de ler o primeiro, para serem gerados ao mesmo tempo.
+    """
+    if df_user.empty:
+        return GeracaoInsight(texto="Não há dados suficientes para gerar insights. Por favor, adicione alguns lançamentos.")
+
+    # Prepara os dados para o prompt: um resumo de tamanho limitado em vez de todas as linhas
+    with metricas.etapa("insight/montar_prompt", len(df_user)):
+        prompt = montar_prompt(resumir_dados(df_user))
+
+    mensagens = [
+        {"role": "system", "content": MENSAGEM_SISTEMA},
+        {"role": "user", "content": prompt}
+    ]
+
+    try:
+        backend = obter_backend()
+        medir_prompt(df_user, prompt, backend.modelo)
+        chave = _chave_insight(mensagens, backend)
+        texto = cache.obter(chave)
     except Exception as e:
         # Retorna uma mensagem de erro mais útil se a IA falhar
-        return f"Erro ao gerar insight com IA: {e}. Verifique sua conexão e chave da API."
+        return GeracaoInsight(texto=_mensagem_erro(e))
+
+    if texto is not None:
+        metricas.registrar_cache("insight", acerto=True)
+        return GeracaoInsight(chave, texto)
+
+    # Pedidos iguais (mesmos dados, modelo e prompt) acompanham a geração que já está em andamento
+    with _lock_andamento:
+        geracao = _em_andamento.get(chave)
+        nova = geracao is None or geracao.cancelada
+        if nova:
+            geracao = GeracaoInsight(chave)
+            _em_andamento[chave] = geracao
+    metricas.registrar_cache("insight", acerto=not nova)
+    return geracao.iniciar(backend, mensagens, timeout) if nova else geracao
 
+
+def gerar_insight_stream(df_user):
+    """
+    Gera o insight em segundo plano e devolve os pedaços do texto conforme chegam.
+    Uso: `st.write_stream(gerar_insight_stream(df_user))`.
+    """
+    return iniciar_insight(df_user).tokens()
+
+
+def gerar_insight(df_user):
+    """
+    Gera insights financeiros baseados nos dados do usuário usando a API da OpenAI.
+    Se os dados não mudaram desde o último pedido, devolve o insight já gerado.
+    Espera o texto completo; para mostrá-lo enquanto é gerado, use gerar_insight_stream.
+    """
+    return "".join(iniciar_insight(df_user).tokens()).strip()
@@ -0,0 +1,87 @@
+# graficos.py
+import plotly.express as px
+import streamlit as st
+
+from agregacoes import reduzir_lttb
+import metricas
+
+# Número máximo de pontos enviados ao navegador no gráfico de evolução do saldo
+PONTOS_MAX_SALDO = 800
+# A partir de quantos pontos o gráfico passa a usar WebGL (scattergl)
+LIMITE_WEBGL = 400
+# Abaixo disso ainda vale a pena desenhar marcadores e a curva suavizada
+LIMITE_MARCADORES = 120
+
+
+def figura_despesas_categoria(despesas_categoria, titulo):
+    return px.pie(despesas_categoria, values='Valor', names='Categoria',
+                  title=titulo,
+                  hole=0.3,
+                  color_discrete_sequence=px.colors.qualitative.Pastel) # Manter pastel para diversidade
+
+
+def figura_despesas_mensais_categoria(despesas_mensais_categoria, titulo):
+    return px.bar(despesas_mensais_categoria, x='Mes/Ano', y='Valor', color='Categoria',
+                  title=titulo,
+                  barmode='group',
+                  color_discrete_sequence=px.colors.qualitative.Set2) # Manter Set2 para diversidade
+
+
+def figura_mensal(mensal, titulo, cor_despesa):
+    return px.bar(mensal, x='Mes/Ano', y='Valor Mensal', color='Tipo de Lançamento',
+                  title=titulo,
+                  barmode='group',
+                  color_discrete_map={'Receita': '#007BFF', 'Despesa': cor_despesa})
+
+
+def figura_saldo_acumulado(saldo_mensal, titulo):
+    return px.line(saldo_mensal, x='Mes/Ano', y='Saldo Acumulado Mensal',
+                   title=titulo,
+                   markers=True,
+                   line_shape='spline',
+                   color_discrete_sequence=['#007BFF']) # Azul vibrante
+
+
+def figura_despesas_por_usuario(despesas_por_usuario, titulo):
+    return px.bar(despesas_por_usuario, x='Usuario', y='Valor',
+                  title=titulo,
+                  color='Usuario',
+                  color_discrete_map={'Carol': '#007BFF', 'Marcio': '#DC3545'}) # Azul e Vermelho
+
+
+def figura_evolucao_saldo(saldo_diario, titulo, cor, pontos_max=PONTOS_MAX_SALDO):
+    """
+    Gráfico de linha do saldo diário, reduzido por LTTB para no máximo
+    `pontos_max` pontos, de modo que o tamanho do gráfico não cresça com o histórico.
+    """
+    x = saldo_diario["Data"].to_numpy().astype("int64")
+    indices = reduzir_lttb(x, saldo_diario["Saldo Diario"].to_numpy(), pontos_max)
+    serie = saldo_diario.iloc[indices]
+
+    poucos_pontos = len(serie) <= LIMITE_MARCADORES
+    fig = px.line(serie, x='Data', y='Saldo Diario',
+                  title=titulo,
+                  markers=poucos_pontos,
+                  # O modo WebGL não suporta curva suavizada
+                  line_shape='spline' if len(serie) <= LIMITE_WEBGL else 'linear',
+                  render_mode='webgl' if len(serie) > LIMITE_WEBGL else 'svg',
+                  color_discrete_sequence=[cor])
+    fig.update_xaxes(tickformat="%d/%m/%Y")
+    return fig
+
+
+# cache_data (e não cache_resource): cada chamada recebe uma cópia da figura, então
+# uma sessão que altere a sua (update_layout, tema...) não mexe na das outras
+@st.cache_data(max_entries=64, show_spinner=False)
+def _figura_por_versao(versao, usuario, nome, _construir):
+    metricas.marcar_execucao()
+    return _construir()
+
+
+def figura_memorizada(versao, usuario, nome, construir):
+    """
+    Constrói a figura `nome` uma única vez por (usuário, versão dos dados) e,
+    nos reruns seguintes, devolve uma cópia dela. `construir` é chamado sem
+    argumentos só quando a figura ainda não existe.
+    """
+    return metricas.chamar_cacheado(f"figura/{nome}", _figura_por_versao, versao, usuario, nome, construir)
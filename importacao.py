@@ -0,0 +1,301 @@
+# importacao.py
+import codecs
+import csv
+import io
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agregacoes import versao_dados
+import metricas
+
+# Linhas lidas do arquivo por vez: a memória usada não cresce com o tamanho do extrato
+TAMANHO_BLOCO = 5000
+# Lançamentos gravados por chamada ao armazenamento (vira um único append na planilha)
+TAMANHO_LOTE = 500
+
+# Nomes de coluna aceitos nos CSVs dos bancos (sem acento e em minúsculas)
+COLUNAS_CSV = {
+    "Data": ["data", "date", "data lancamento", "data do lancamento", "data movimento", "dt"],
+    "Valor": ["valor", "value", "amount", "quantia", "valor (r$)", "valor r$"],
+    "Descricao": ["descricao", "historico", "description", "memo", "lancamento", "estabelecimento", "titulo"],
+}
+
+# Regras de categoria, testadas em ordem na descrição (sem acento e em minúsculas).
+# Receitas vão sempre para "Salário"; despesas sem regra vão para "Outros".
+REGRAS_CATEGORIA = [
+    (r"mercado|supermerc|padaria|restaurante|ifood|rappi|feira|lanchonete|acougue|hortifruti", "Alimentação"),
+    (r"uber|99app|99 pop|combust|posto|ipiranga|onibus|metro|estacionamento|pedagio|sem parar", "Transporte"),
+    (r"cinema|netflix|spotify|streaming|viagem|ingresso|show|disney|hbo|prime video|\bbar\b", "Lazer"),
+    (r"aluguel|condominio|energia|enel|\bluz\b|\bagua\b|sabesp|internet|vivo|claro|\btim\b", "Moradia"),
+    (r"farmacia|drogaria|droga raia|consulta|plano de saude|academia|hospital|laboratorio", "Saúde"),
+    (r"curso|livraria|livro|faculdade|escola|udemy|alura", "Educação"),
+    (r"tesouro|cdb|aplicacao|corretora|invest", "Investimento"),
+]
+
+
+def _sem_acento(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii").lower().strip()
+
+
+def _texto(arquivo):
+    """
+    Abre o arquivo enviado (binário) como texto, sem carregá-lo inteiro.
+    Extratos de bancos brasileiros costumam vir em Latin-1 em vez de UTF-8.
+    """
+    arquivo.seek(0)
+    inicio = arquivo.read(65536)
+    arquivo.seek(0)
+    try:
+        # Incremental: um caractere cortado no fim da amostra não conta como erro
+        codecs.getincrementaldecoder("utf-8")().decode(inicio, final=False)
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "cp1252"
+    return io.TextIOWrapper(arquivo, encoding=codificacao, errors="replace", newline="")
+
+
+def converter_valores(valores):
+    """
+    Converte valores como '1.234,56', '-45,90', 'R$ 10,00' ou '45.90' para float (NaN se inválido).
+    """
+    valores = valores.astype(str).str.replace(r"[^\d,.\-]", "", regex=True)
+    # Com vírgula, ela é o separador decimal e os pontos são de milhar
+    virgula = valores.str.contains(",", regex=False)
+    valores = valores.where(~virgula, valores.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(valores, errors="coerce")
+
+
+def converter_datas(datas):
+    """
+    Converte datas ISO (2024-01-31) ou no formato brasileiro (31/01/2024) para datetime (NaT se inválida).
+    """
+    datas = datas.astype(str).str.strip()
+    iso = datas.str.match(r"\d{4}-\d{2}-\d{2}")
+    resultado = pd.to_datetime(datas.where(iso), format="ISO8601", errors="coerce")
+    if not iso.all():
+        resultado = resultado.fillna(pd.to_datetime(datas.where(~iso), dayfirst=True, format="mixed", errors="coerce"))
+    return resultado.dt.normalize()
+
+
+def ler_csv(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê um extrato CSV em blocos, devolvendo DataFrames com Data, Valor (com sinal) e Descricao.
+    O separador (vírgula, ponto e vírgula ou tabulação) é detectado pelo início do arquivo.
+    """
+    texto = _texto(arquivo)
+    amostra = texto.read(8192)
+    texto.seek(0)
+    try:
+        separador = csv.Sniffer().sniff(amostra, delimiters=",;\t").delimiter
+    except csv.Error:
+        separador = ","
+
+    try:
+        for bloco in pd.read_csv(texto, sep=separador, dtype=str, chunksize=tamanho_bloco, skipinitialspace=True):
+            nomes = {_sem_acento(c): c for c in bloco.columns}
+            colunas = {}
+            for coluna, apelidos in COLUNAS_CSV.items():
+                encontrada = next((nomes[a] for a in apelidos if a in nomes), None)
+                if encontrada is None:
+                    raise ValueError(f"Coluna '{coluna}' não encontrada no CSV (colunas: {', '.join(bloco.columns)})")
+                colunas[coluna] = encontrada
+            yield pd.DataFrame({
+                "Data": converter_datas(bloco[colunas["Data"]]),
+                "Valor": converter_valores(bloco[colunas["Valor"]]),
+                "Descricao": bloco[colunas["Descricao"]].fillna("").astype(str).str.strip(),
+            })
+    finally:
+        # Solta o arquivo sem fechá-lo: quem o abriu ainda consulta a posição (barra de progresso)
+        texto.detach()
+
+
+_TRANSACAO_OFX = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_CAMPO_OFX = re.compile(r"<(DTPOSTED|TRNAMT|MEMO|NAME)>([^<\r\n]*)", re.IGNORECASE)
+
+
+def ler_ofx(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê um extrato OFX (SGML ou XML) em blocos, com as mesmas colunas de ler_csv.
+    O arquivo é lido aos pedaços; só a transação (<STMTTRN>) em andamento fica no buffer.
+    """
+    texto = _texto(arquivo)
+    buffer = ""
+    transacoes = []
+
+    def bloco_pronto():
+        bloco = pd.DataFrame(transacoes, columns=["Data", "Valor", "Descricao"])
+        return pd.DataFrame({
+            "Data": converter_datas(bloco["Data"].str[:8].str.replace(r"(\d{4})(\d{2})(\d{2})", r"\1-\2-\3", regex=True)),
+            "Valor": converter_valores(bloco["Valor"]),
+            "Descricao": bloco["Descricao"].str.strip(),
+        })
+
+    try:
+        while True:
+            pedaco = texto.read(65536)
+            buffer += pedaco
+            consumido = 0
+            for transacao in _TRANSACAO_OFX.finditer(buffer):
+                campos = {nome.upper(): valor.strip() for nome, valor in _CAMPO_OFX.findall(transacao.group(1))}
+                transacoes.append([campos.get("DTPOSTED", ""), campos.get("TRNAMT", ""),
+                                   campos.get("MEMO") or campos.get("NAME", "")])
+                consumido = transacao.end()
+                if len(transacoes) >= tamanho_bloco:
+                    yield bloco_pronto()
+                    transacoes = []
+            buffer = buffer[consumido:]
+            if not pedaco:
+                break
+            # Fora de uma transação só há o cabeçalho do extrato: não precisa guardar
+            inicio = buffer.upper().rfind("<STMTTRN>")
+            buffer = buffer[inicio:] if inicio >= 0 else buffer[-len("<STMTTRN>"):]
+        if transacoes:
+            yield bloco_pronto()
+    finally:
+        texto.detach() # Ver ler_csv
+
+
+def ler_extrato(arquivo, nome, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Escolhe o leitor pela extensão do arquivo (.csv ou .ofx).
+    """
+    extensao = nome.rsplit(".", 1)[-1].lower()
+    if extensao == "ofx":
+        return ler_ofx(arquivo, tamanho_bloco)
+    if extensao in ("csv", "txt"):
+        return ler_csv(arquivo, tamanho_bloco)
+    raise ValueError(f"Formato de extrato não suportado: .{extensao} (use CSV ou OFX)")
+
+
+def categorizar(descricoes, tipos):
+    """
+    Aplica REGRAS_CATEGORIA às descrições: a primeira regra que casar define a categoria.
+    """
+    normalizadas = descricoes.map(_sem_acento)
+    categorias = pd.Series(np.where(tipos == "Receita", "Salário", None), index=descricoes.index, dtype=object)
+    for padrao, categoria in REGRAS_CATEGORIA:
+        livres = categorias.isna()
+        if not livres.any():
+            break
+        casou = livres & normalizadas.str.contains(padrao, regex=True)
+        categorias[casou] = categoria
+    return categorias.fillna("Outros")
+
+
+def hashes_lancamentos(usuarios, datas, valores, descricoes):
+    """
+    Hash de (Usuario, Data, Valor, Descricao) de cada lançamento. Lançamentos
+    iguais têm o mesmo hash; quantas vezes cada um se repete é contado à parte
+    (ver importar_extrato), para que dois cafés iguais no mesmo dia continuem
+    sendo dois lançamentos.
+    """
+    chaves = pd.DataFrame({
+        "Usuario": np.asarray(usuarios, dtype=object).astype(str),
+        "Data": pd.DatetimeIndex(datas).strftime("%Y-%m-%d"),
+        "Valor": np.round(np.abs(np.asarray(valores, dtype="float64")) * 100).astype("int64"),
+        "Descricao": pd.Series(descricoes, dtype=object).astype(str).str.strip().str.lower().to_numpy(),
+    })
+    return pd.util.hash_pandas_object(chaves, index=False).to_numpy()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _indice_hashes(versao, _df):
+    metricas.marcar_execucao()
+    if _df.empty:
+        return np.empty(0, dtype="uint64"), np.empty(0, dtype="int64")
+    return np.unique(hashes_lancamentos(_df["Usuario"], _df["Data"], _df["Valor"], _df["Descricao"]), return_counts=True)
+
+
+def obter_indice_hashes(df, pendentes=None):
+    """
+    (hashes ordenados, quantas vezes cada um aparece) dos lançamentos que já
+    estão no livro-caixa, calculados uma vez por versão dos dados.
+
+    `pendentes` (DataFrame cru, com as colunas da planilha) são lançamentos já
+    salvos que ainda não estão em `df`, como os que esperam na fila de envio:
+    entram no índice para que importar o mesmo extrato de novo não os duplique.
+    """
+    chaves, contagens = metricas.chamar_cacheado("indice_hashes", _indice_hashes, versao_dados(df), df)
+    if pendentes is None or pendentes.empty:
+        return chaves, contagens
+
+    datas = converter_datas(pendentes["Data"])
+    valores = pd.to_numeric(pendentes["Valor"], errors="coerce")
+    validos = (datas.notna() & valores.notna()).to_numpy()
+    novos = hashes_lancamentos(pendentes["Usuario"].to_numpy()[validos], datas[validos], valores[validos],
+                               pendentes["Descricao"].to_numpy()[validos])
+    # Soma as contagens sem alterar os arrays guardados no cache
+    chaves, inverso = np.unique(np.concatenate([chaves, novos]), return_inverse=True)
+    contagens = np.bincount(inverso, weights=np.concatenate([contagens, np.ones(len(novos), dtype="int64")]),
+                            minlength=len(chaves)).astype("int64")
+    return chaves, contagens
+
+
+def importar_extrato(blocos, usuario, existentes, salvar, forma_pgto="Transferência",
+                     tamanho_lote=TAMANHO_LOTE, ao_progresso=None):
+    """
+    Importa os blocos de um extrato (ver ler_extrato) para o livro-caixa.
+
+    Valores negativos viram despesas e positivos, receitas. Se um lançamento
+    aparece k vezes em `existentes` (ver obter_indice_hashes), as k primeiras
+    ocorrências dele no arquivo são ignoradas e as seguintes, importadas; a
+    contagem continua de um bloco para o outro. As linhas novas são passadas
+    para `salvar` em lotes de `tamanho_lote`. `ao_progresso(resumo)` é
+    chamado a cada bloco lido.
+
+    Retorna um dicionário com o total de linhas lidas, importadas, duplicadas e inválidas.
+    """
+    resumo = {"lidas": 0, "importadas": 0, "duplicadas": 0, "invalidas": 0}
+    chaves_existentes, contagens = existentes
+    # Cópias de cada lançamento existente que ainda não apareceram no arquivo: a memória
+    # usada é a do livro-caixa, não cresce com o tamanho do extrato
+    restantes = contagens.astype("int64")
+    lote = []
+
+    for bloco in blocos:
+        resumo["lidas"] += len(bloco)
+        validas = bloco["Data"].notna() & bloco["Valor"].notna() & (bloco["Valor"] != 0)
+        resumo["invalidas"] += int((~validas).sum())
+        bloco = bloco[validas]
+
+        if not bloco.empty:
+            hashes = hashes_lancamentos(np.full(len(bloco), usuario), bloco["Data"], bloco["Valor"], bloco["Descricao"])
+            if len(chaves_existentes):
+                posicoes = np.minimum(np.searchsorted(chaves_existentes, hashes), len(chaves_existentes) - 1)
+                existe = chaves_existentes[posicoes] == hashes
+                # Ocorrência de cada lançamento dentro do bloco (0, 1, 2...) comparada com as cópias que ainda restam
+                ocorrencia = pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy()
+                duplicado = existe & (ocorrencia < restantes[posicoes])
+                np.subtract.at(restantes, posicoes[duplicado], 1)
+            else:
+                duplicado = np.zeros(len(hashes), dtype=bool)
+            novos = ~duplicado
+            resumo["duplicadas"] += int(duplicado.sum())
+
+            bloco = bloco[novos]
+            tipos = np.where(bloco["Valor"] < 0, "Despesa", "Receita")
+            categorias = categorizar(bloco["Descricao"], tipos)
+            lote.extend(
+                [usuario, data, tipo, categoria, descricao, valor, forma_pgto]
+                for data, tipo, categoria, descricao, valor in zip(
+                    bloco["Data"].dt.strftime("%Y-%m-%d").tolist(), tipos.tolist(), categorias.tolist(),
+                    bloco["Descricao"].tolist(), bloco["Valor"].abs().round(2).tolist())
+            )
+            while len(lote) >= tamanho_lote:
+                salvar(lote[:tamanho_lote])
+                resumo["importadas"] += tamanho_lote
+                lote = lote[tamanho_lote:]
+
+        if ao_progresso:
+            ao_progresso(resumo)
+
+    if lote:
+        salvar(lote)
+        resumo["importadas"] += len(lote)
+    if ao_progresso:
+        ao_progresso(resumo)
+    return resumo
@@ -0,0 +1,337 @@
+# metricas.py
+"""
+Instrumentação leve do app: tempo de cada etapa, linhas processadas,
+acertos e faltas dos caches e chamadas às APIs externas (Google Sheets e
+OpenAI) com latência e tokens.
+
+Desligada por padrão. LOVEFINTECH_METRICAS=1 liga para o processo todo;
+ativar_sessao(), chamado pelo app ao abrir com ?debug=1, liga só para as
+execuções do script daquela sessão e, enquanto ela estiver aberta, para as
+threads de segundo plano (atualizador, fila de envio, insights), que servem
+a todas as sessões. Desligada, cada ponto de medição custa só a checagem de
+um booleano.
+
+Os eventos recentes ficam num buffer em memória de tamanho fixo. Com
+LOVEFINTECH_METRICAS_ARQUIVO definido, também são gravados em lotes nesse
+arquivo (uma linha JSON por evento), que é rotacionado ao passar de
+TAMANHO_MAXIMO_ARQUIVO.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+CAMINHO_METRICAS = os.getenv("LOVEFINTECH_METRICAS_ARQUIVO") # None: só em memória
+TAMANHO_MAXIMO_ARQUIVO = 5 * 1024 * 1024 # Acima disso, o arquivo vira .1 e um novo começa
+# Quantos eventos recentes ficam em memória para o painel
+MAX_EVENTOS = 200
+# Sessões em debug que não executam o script há mais que isso (aba fechada) deixam de contar
+VALIDADE_SESSAO = 10 * 60
+# Eventos juntados antes de gravar no arquivo (um único open/append por lote)
+TAMANHO_LOTE_ARQUIVO = 100
+
+_ativo = os.getenv("LOVEFINTECH_METRICAS") == "1"
+_sessoes = {} # Sessões do Streamlit abertas com ?debug=1 -> última execução
+_lock = threading.Lock()
+_lock_arquivo = threading.Lock()
+_local = threading.local()
+_etapas = {}
+_caches = {}
+_apis = {}
+_prompts = {}
+_eventos = deque(maxlen=MAX_EVENTOS)
+_a_gravar = deque(maxlen=10 * TAMANHO_LOTE_ARQUIVO) # Se o disco não der conta, os mais antigos são descartados
+
+
+def ativo():
+    """
+    Se as medições valem para quem chamou: no processo todo ou na sessão do script em execução.
+    """
+    if _ativo:
+        return True
+    if not _sessoes:
+        return False
+    contexto = get_script_run_ctx(suppress_warning=True)
+    if contexto is None:
+        # Thread de segundo plano: mede enquanto alguma sessão estiver em debug
+        return max(_sessoes.values(), default=0) > time.time() - VALIDADE_SESSAO
+    return contexto.session_id in _sessoes
+
+
+def ativar():
+    global _ativo
+    _ativo = True
+
+
+def desativar():
+    global _ativo
+    _ativo = False
+
+
+def ativar_sessao(ligar=True):
+    """
+    Liga (ou desliga) as medições só para a sessão do Streamlit que está executando o script.
+    Chamado a cada execução: sessões que param de chamar expiram depois de VALIDADE_SESSAO.
+    """
+    contexto = get_script_run_ctx(suppress_warning=True)
+    if contexto is None:
+        return
+    agora = time.time()
+    with _lock:
+        for sessao, visto_em in list(_sessoes.items()):
+            if visto_em < agora - VALIDADE_SESSAO:
+                del _sessoes[sessao]
+        if ligar:
+            _sessoes[contexto.session_id] = agora
+        else:
+            _sessoes.pop(contexto.session_id, None)
+
+
+def limpar():
+    """
+    Zera tudo o que foi medido até agora (o arquivo de métricas não é apagado).
+    """
+    with _lock:
+        _etapas.clear()
+        _caches.clear()
+        _apis.clear()
+        _prompts.clear()
+        _eventos.clear()
+
+
+def _registrar_evento(evento):
+    # Chamado com _lock adquirido
+    evento = {"em": datetime.now().isoformat(timespec="milliseconds"), **evento}
+    _eventos.append(evento)
+    if CAMINHO_METRICAS:
+        _a_gravar.append(evento)
+
+
+def gravar_arquivo(forcar=False):
+    """
+    Grava no arquivo de métricas os eventos acumulados, quando formam um lote
+    (ou sempre, com `forcar`). Chamado fora do _lock, por quem registrou o evento.
+    """
+    if not CAMINHO_METRICAS or not _a_gravar or (len(_a_gravar) < TAMANHO_LOTE_ARQUIVO and not forcar):
+        return
+    if not _lock_arquivo.acquire(blocking=False):
+        return # Outra thread já está gravando
+    try:
+        eventos = []
+        while _a_gravar:
+            eventos.append(_a_gravar.popleft())
+        os.makedirs(os.path.dirname(os.path.abspath(CAMINHO_METRICAS)), exist_ok=True)
+        try:
+            if os.path.getsize(CAMINHO_METRICAS) > TAMANHO_MAXIMO_ARQUIVO:
+                os.replace(CAMINHO_METRICAS, CAMINHO_METRICAS + ".1")
+        except OSError:
+            pass # Arquivo ainda não existe
+        with open(CAMINHO_METRICAS, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(evento, ensure_ascii=False, default=str) + "\n" for evento in eventos)
+    except OSError:
+        pass # Sem onde gravar, as métricas continuam em memória
+    finally:
+        _lock_arquivo.release()
+
+
+def registrar_etapa(nome, duracao, linhas=None):
+    if not ativo():
+        return
+    with _lock:
+        etapa = _etapas.setdefault(nome, {"chamadas": 0, "total_s": 0.0, "max_s": 0.0, "linhas": 0})
+        etapa["chamadas"] += 1
+        etapa["total_s"] += duracao
+        etapa["max_s"] = max(etapa["max_s"], duracao)
+        if linhas is not None:
+            etapa["linhas"] += linhas
+        _registrar_evento({"tipo": "etapa", "nome": nome, "duracao_ms": round(duracao * 1000, 3), "linhas": linhas})
+    gravar_arquivo()
+
+
+def registrar_cache(nome, acerto):
+    if not ativo():
+        return
+    with _lock:
+        contagem = _caches.setdefault(nome, {"acertos": 0, "faltas": 0})
+        contagem["acertos" if acerto else "faltas"] += 1
+        _registrar_evento({"tipo": "cache", "nome": nome, "acerto": acerto})
+    gravar_arquivo()
+
+
+def registrar_api(servico, operacao, duracao, erro=None, tokens_prompt=0, tokens_resposta=0):
+    if not ativo():
+        return
+    with _lock:
+        api = _apis.setdefault((servico, operacao), {"chamadas": 0, "erros": 0, "total_s": 0.0, "max_s": 0.0,
+                                                     "tokens_prompt": 0, "tokens_resposta": 0})
+        api["chamadas"] += 1
+        api["erros"] += erro is not None
+        api["total_s"] += duracao
+        api["max_s"] = max(api["max_s"], duracao)
+        api["tokens_prompt"] += tokens_prompt
+        api["tokens_resposta"] += tokens_resposta
+        _registrar_evento({"tipo": "api", "servico": servico, "operacao": operacao,
+                           "duracao_ms": round(duracao * 1000, 3), "erro": erro,
+                           "tokens_prompt": tokens_prompt, "tokens_resposta": tokens_resposta})
+    gravar_arquivo()
+
+
+def registrar_prompt(nome, linhas, tokens, tokens_completo=None):
+    """
+    Guarda o tamanho, em tokens, do último prompt `nome` enviado e, se medido,
+    o do prompt antigo com todas as `linhas` (para comparar o antes e o depois).
+    """
+    if not ativo():
+        return
+    with _lock:
+        prompt = _prompts.setdefault(nome, {"chamadas": 0})
+        prompt["chamadas"] += 1
+        prompt.update(linhas=linhas, tokens=tokens, tokens_completo=tokens_completo)
+        _registrar_evento({"tipo": "prompt", "nome": nome, "linhas": linhas, "tokens": tokens,
+                           "tokens_completo": tokens_completo})
+    gravar_arquivo()
+
+
+class _Medicao:
+    """
+    Mede o tempo de um bloco `with`. Atribua `linhas` dentro do bloco para registrar quantas foram processadas.
+    """
+    __slots__ = ("nome", "linhas", "_inicio")
+
+    def __init__(self, nome, linhas=None):
+        self.nome = nome
+        self.linhas = linhas
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        registrar_etapa(self.nome, time.perf_counter() - self._inicio, self.linhas)
+        return False
+
+
+class _SemMedicao:
+    __slots__ = ()
+    linhas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        return False
+
+    def __setattr__(self, nome, valor):
+        pass # Desligado: `linhas` é ignorado
+
+
+_SEM_MEDICAO = _SemMedicao()
+
+
+def etapa(nome, linhas=None):
+    """
+    Uso: `with metricas.etapa("carregar_dados/tipar") as m: ...; m.linhas = len(df)`.
+    Desligado, devolve sempre o mesmo objeto que não faz nada.
+    """
+    return _Medicao(nome, linhas) if ativo() else _SEM_MEDICAO
+
+
+def marcar_execucao():
+    """
+    Chamado dentro de uma função com st.cache_*: indica a chamar_cacheado que o cache não tinha o resultado.
+    """
+    _local.executou = True
+
+
+def chamar_cacheado(nome, funcao, *args, **kwargs):
+    """
+    Chama uma função com cache do Streamlit medindo o tempo e se foi acerto
+    (a função precisa chamar marcar_execucao() no seu corpo).
+    """
+    if not ativo():
+        return funcao(*args, **kwargs)
+    anterior = getattr(_local, "executou", False)
+    _local.executou = False
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args, **kwargs)
+    finally:
+        acerto = not _local.executou
+        _local.executou = anterior
+        registrar_etapa(nome, time.perf_counter() - inicio)
+        registrar_cache(nome, acerto)
+
+
+class WorksheetMedida:
+    """
+    Envolve a aba do gspread contando as chamadas à API do Google Sheets,
+    com a latência de cada uma. O resto da interface passa direto para a aba original.
+    """
+    OPERACOES = {"get", "get_all_values", "get_all_records", "append_row", "append_rows", "update", "batch_update"}
+
+    @property
+    def spreadsheet(self):
+        return PlanilhaMedida(self._worksheet.spreadsheet)
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._worksheet, nome)
+        if nome not in self.OPERACOES or not callable(atributo):
+            return atributo
+
+        def chamada(*args, **kwargs):
+            if not ativo():
+                return atributo(*args, **kwargs)
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                return atributo(*args, **kwargs)
+            except Exception as e:
+                erro = str(e)
+                raise
+            finally:
+                registrar_api("sheets", nome, time.perf_counter() - inicio, erro)
+        return chamada
+
+
+class PlanilhaMedida(WorksheetMedida):
+    """
+    O mesmo para a planilha (o arquivo): metadados e lista de abas.
+    """
+    OPERACOES = {"get_lastUpdateTime", "worksheets", "worksheet", "add_worksheet"}
+
+    @property
+    def spreadsheet(self):
+        return self
+
+
+def resumo():
+    """
+    Cópia do que foi medido: {"etapas": [...], "caches": [...], "apis": [...], "prompts": [...], "eventos": [...]}.
+    """
+    gravar_arquivo(forcar=True)
+    with _lock:
+        return {
+            "ativo": ativo(),
+            "etapas": [
+                {"etapa": nome, **valores, "media_ms": valores["total_s"] / valores["chamadas"] * 1000}
+                for nome, valores in sorted(_etapas.items())
+            ],
+            "caches": [
+                {"cache": nome, **valores, "taxa_acerto": valores["acertos"] / (valores["acertos"] + valores["faltas"])}
+                for nome, valores in sorted(_caches.items())
+            ],
+            "apis": [
+                {"servico": servico, "operacao": operacao, **valores,
+                 "media_ms": valores["total_s"] / valores["chamadas"] * 1000}
+                for (servico, operacao), valores in sorted(_apis.items())
+            ],
+            "prompts": [{"prompt": nome, **valores} for nome, valores in sorted(_prompts.items())],
+            "eventos": list(_eventos),
+        }
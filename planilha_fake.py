@@ -0,0 +1,138 @@
+# planilha_fake.py
+import random
+import re
+import time
+from datetime import date, datetime, timedelta
+
+# Mesmo cabeçalho da aba "Sheet1" da planilha "Base Lovefintech"
+CABECALHO = ["Usuario", "Data", "Tipo", "Categoria", "Descricao", "Valor", "Forma_pgto"]
+
+CATEGORIAS_DESPESA = ["Alimentação", "Transporte", "Lazer", "Moradia", "Outros", "Investimento", "Educação", "Saúde"]
+FORMAS_PGTO = ["Pix", "Crédito", "Débito", "Dinheiro", "Transferência"]
+DESCRICOES = {
+    "Alimentação": ["Mercado", "Padaria", "Restaurante", "iFood", "Feira"],
+    "Transporte": ["Uber", "Combustível", "Ônibus", "Estacionamento"],
+    "Lazer": ["Cinema", "Streaming", "Viagem", "Show", "Bar"],
+    "Moradia": ["Aluguel", "Condomínio", "Luz", "Água", "Internet"],
+    "Outros": ["Presente", "Farmácia", "Loja"],
+    "Investimento": ["Tesouro Direto", "CDB", "Ações"],
+    "Educação": ["Curso", "Livros", "Faculdade"],
+    "Saúde": ["Plano de saúde", "Consulta", "Academia"],
+}
+
+
+def gerar_linhas(quantidade, inicio=date(2015, 1, 1), semente=42):
+    """
+    Gera lançamentos sintéticos no formato da planilha (listas de strings),
+    espalhados de `inicio` até hoje e em ordem de data, como se tivessem
+    sido digitados no formulário do app.
+    """
+    aleatorio = random.Random(semente)
+    dias = max(1, (date.today() - inicio).days)
+    linhas = []
+    for i in range(quantidade):
+        dia = inicio + timedelta(days=i * dias // max(1, quantidade))
+        usuario = aleatorio.choice(["Carol", "Marcio"])
+        if aleatorio.random() < 0.1:
+            tipo, categoria, descricao = "Receita", "Salário", aleatorio.choice(["Salário", "Freelance", "Reembolso"])
+            valor = aleatorio.uniform(500, 8000)
+        else:
+            categoria = aleatorio.choice(CATEGORIAS_DESPESA)
+            tipo, descricao = "Despesa", aleatorio.choice(DESCRICOES[categoria])
+            valor = aleatorio.lognormvariate(4, 1)
+        linhas.append([usuario, dia.strftime("%Y-%m-%d"), tipo, categoria, descricao,
+                       f"{valor:.2f}", aleatorio.choice(FORMAS_PGTO)])
+    return linhas
+
+
+class PlanilhaFake:
+    """
+    Aba de planilha em memória, com a parte da interface do gspread.Worksheet
+    que o app usa. Permite rodar benchmarks e testes sem acesso ao Google Sheets.
+    `latencia` simula o tempo de ida e volta de cada chamada, em segundos.
+    """
+
+    def __init__(self, linhas=None, cabecalho=CABECALHO, title="Sheet1", latencia=0.0):
+        self.title = title
+        self.latencia = latencia
+        self.valores = [list(cabecalho)] + [list(l) for l in (linhas or [])]
+        self.chamadas = 0
+        self.modificada_em = datetime.now().isoformat()
+
+    def _chamada(self):
+        self.chamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def get_all_values(self):
+        self._chamada()
+        return [list(map(str, l)) for l in self.valores]
+
+    def get_all_records(self):
+        self._chamada()
+        cabecalho = self.valores[0]
+        return [dict(zip(cabecalho, l)) for l in self.valores[1:]]
+
+    def get(self, range_name):
+        """
+        Suporta intervalos no formato 'A<linha>:<coluna>' (até o fim da aba), como os usados na sincronização.
+        """
+        self._chamada()
+        linha_inicial = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        return [list(map(str, l)) for l in self.valores[linha_inicial - 1:]]
+
+    def append_row(self, valores, **kwargs):
+        self._chamada()
+        self.valores.append(list(valores))
+        self.modificada_em = datetime.now().isoformat()
+
+    def append_rows(self, valores, **kwargs):
+        self._chamada()
+        self.valores.extend(list(v) for v in valores)
+        self.modificada_em = datetime.now().isoformat()
+
+    @property
+    def spreadsheet(self):
+        # Aqui a aba faz também o papel da planilha (só para o metadado de modificação)
+        return self
+
+    def get_lastUpdateTime(self):
+        self._chamada()
+        return self.modificada_em
+
+
+class PastaPlanilhaFake:
+    """
+    Planilha (o arquivo, com várias abas) em memória, com a parte da interface
+    do gspread.Spreadsheet usada pelas partições (armazenamento.ArmazenamentoParticionado).
+    """
+
+    def __init__(self, abas=None, latencia=0.0):
+        self.latencia = latencia
+        self.abas = {aba.title: aba for aba in (abas or [])}
+        self.chamadas = 0
+
+    def _chamada(self):
+        self.chamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def worksheets(self):
+        self._chamada()
+        return list(self.abas.values())
+
+    def worksheet(self, title):
+        self._chamada()
+        return self.abas[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self._chamada()
+        if title in self.abas:
+            raise ValueError(f"Já existe uma aba chamada '{title}'")
+        self.abas[title] = PlanilhaFake(cabecalho=[], title=title, latencia=self.latencia)
+        self.abas[title].valores = []
+        return self.abas[title]
+
+    def get_lastUpdateTime(self):
+        self._chamada()
+        return max((aba.modificada_em for aba in self.abas.values()), default="")
@@ -0,0 +1,108 @@
+# resumo_dados.py
+import pandas as pd
+
+try:
+    import tiktoken # Opcional: contagem exata de tokens
+except ImportError:
+    tiktoken = None
+
+# Limites do resumo: o tamanho do prompt não deve depender do tamanho do histórico
+MESES_RESUMO = 12
+MAX_CATEGORIAS = 10
+MAX_DESCRICOES = 5
+MAX_ANOMALIAS = 5
+
+
+def contar_tokens(texto, modelo="gpt-3.5-turbo"):
+    """
+    Conta os tokens do texto com o tiktoken, se estiver instalado.
+    Sem ele, usa a estimativa de ~4 caracteres por token.
+    """
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(modelo).encode(texto))
+        except KeyError:
+            pass
+    return max(1, len(texto) // 4)
+
+
+def _moeda(valor):
+    return f"R$ {valor:,.2f}"
+
+
+def resumir_dados(df):
+    """
+    Transforma os lançamentos em um resumo estatístico de tamanho limitado
+    para o prompt: totais, meses recentes, categorias, maiores gastos,
+    tendência e lançamentos fora do padrão.
+    """
+    df = df.assign(Data=pd.to_datetime(df["Data"]), Valor=pd.to_numeric(df["Valor"], errors="coerce"))
+    df = df.dropna(subset=["Data", "Valor"])
+    despesas = df[df["Tipo"] == "Despesa"]
+    receitas = df[df["Tipo"] == "Receita"]
+
+    receita_total = receitas["Valor"].sum()
+    despesa_total = despesas["Valor"].sum()
+    linhas = [
+        f"Período: {df['Data'].min():%d/%m/%Y} a {df['Data'].max():%d/%m/%Y} ({len(df)} lançamentos)",
+        f"Receita total: {_moeda(receita_total)} | Despesa total: {_moeda(despesa_total)} | Saldo: {_moeda(receita_total - despesa_total)}",
+    ]
+
+    # Totais por usuário (visão do casal)
+    if "Usuario" in df.columns and df["Usuario"].nunique() > 1:
+        por_usuario = df.pivot_table(index="Usuario", columns="Tipo", values="Valor", aggfunc="sum", fill_value=0, observed=True)
+        linhas.append("")
+        linhas.append("Por usuário:")
+        for usuario, valores in por_usuario.iterrows():
+            linhas.append(f"- {usuario}: receitas {_moeda(valores.get('Receita', 0))}, despesas {_moeda(valores.get('Despesa', 0))}")
+
+    # Meses mais recentes
+    mensal = (
+        df.pivot_table(index=df["Data"].dt.to_period("M"), columns="Tipo", values="Valor", aggfunc="sum", fill_value=0, observed=True)
+        .reindex(columns=["Receita", "Despesa"], fill_value=0)
+        .sort_index()
+    )
+    linhas.append("")
+    linhas.append(f"Últimos {min(MESES_RESUMO, len(mensal))} meses (receita / despesa / saldo):")
+    for mes, valores in mensal.tail(MESES_RESUMO).iterrows():
+        linhas.append(f"- {mes}: {_moeda(valores['Receita'])} / {_moeda(valores['Despesa'])} / {_moeda(valores['Receita'] - valores['Despesa'])}")
+
+    # Tendência: média de despesas dos últimos 3 meses contra os 3 anteriores
+    if len(mensal) >= 6:
+        recente = mensal["Despesa"].iloc[-3:].mean()
+        anterior = mensal["Despesa"].iloc[-6:-3].mean()
+        if anterior > 0:
+            variacao = (recente / anterior - 1) * 100
+            linhas.append(f"Tendência: despesa média dos últimos 3 meses {variacao:+.1f}% em relação aos 3 meses anteriores")
+
+    if not despesas.empty:
+        # Despesas por categoria
+        por_categoria = despesas.groupby("Categoria", observed=True)["Valor"].sum().sort_values(ascending=False)
+        linhas.append("")
+        linhas.append("Despesas por categoria:")
+        for categoria, valor in por_categoria.head(MAX_CATEGORIAS).items():
+            linhas.append(f"- {categoria}: {_moeda(valor)} ({valor / despesa_total:.0%})")
+
+        # Onde mais se gasta (descrições)
+        por_descricao = despesas.groupby("Descricao")["Valor"].agg(["sum", "count"]).sort_values("sum", ascending=False)
+        linhas.append("")
+        linhas.append("Maiores gastos por descrição:")
+        for descricao, valores in por_descricao.head(MAX_DESCRICOES).iterrows():
+            linhas.append(f"- {descricao or '(sem descrição)'}: {_moeda(valores['sum'])} em {int(valores['count'])} lançamento(s)")
+
+        # Formas de pagamento
+        por_forma = despesas.groupby("Forma_pgto", observed=True)["Valor"].sum().sort_values(ascending=False)
+        linhas.append("Despesas por forma de pagamento: " + ", ".join(f"{forma} {_moeda(valor)}" for forma, valor in por_forma.items()))
+
+        # Lançamentos fora do padrão da própria categoria (z-score > 3)
+        estatisticas = despesas.groupby("Categoria", observed=True)["Valor"].transform
+        desvio = estatisticas("std").replace(0, float("nan"))
+        z = (despesas["Valor"] - estatisticas("mean")) / desvio
+        anomalias = despesas[z.fillna(0) > 3].nlargest(MAX_ANOMALIAS, "Valor")
+        if not anomalias.empty:
+            linhas.append("")
+            linhas.append("Gastos fora do padrão:")
+            for _, lanc in anomalias.iterrows():
+                linhas.append(f"- {lanc['Data']:%d/%m/%Y} {lanc['Categoria']} '{lanc['Descricao']}': {_moeda(lanc['Valor'])}")
+
+    return "\n".join(linhas)
@@ -0,0 +1,119 @@
+# servidor_fake_openai.py
+"""
+Servidor local que imita a API de chat da OpenAI (POST /v1/chat/completions),
+com e sem streaming, para testar os insights sem rede nem chave de API.
+
+A resposta é enviada palavra por palavra, com `atraso` segundos entre elas,
+no mesmo formato SSE da API (`data: {...}` e, no fim, `data: [DONE]`).
+Conta quantos pedidos recebeu e quantos foram abandonados pelo cliente no meio.
+
+Uso:
+    python servidor_fake_openai.py --porta 8765 --atraso 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run app.py
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPOSTA_PADRAO = ("Vocês gastaram mais com Alimentação e Lazer nos últimos meses. "
+                   "Definam um limite mensal para delivery e reservem 10% da renda para investimentos.")
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    def log_message(self, formato, *args):
+        pass # Sem poluir o terminal a cada pedido
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        tamanho = int(self.headers.get("Content-Length", 0))
+        pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+        servidor = self.server
+        with servidor.lock:
+            servidor.pedidos += 1
+
+        palavras = servidor.resposta.split(" ")
+        prompt = " ".join(m.get("content", "") for m in pedido.get("messages", []))
+        uso = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(palavras),
+               "total_tokens": len(prompt.split()) + len(palavras)}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                "model": pedido.get("model", "fake")}
+
+        if not pedido.get("stream"):
+            time.sleep(servidor.atraso * len(palavras))
+            self._enviar_json({**base, "object": "chat.completion", "usage": uso, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": servidor.resposta}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        base["object"] = "chat.completion.chunk"
+        try:
+            self._enviar_evento({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                                      "finish_reason": None}]})
+            for i, palavra in enumerate(palavras):
+                time.sleep(servidor.atraso)
+                texto = palavra if i == 0 else " " + palavra
+                self._enviar_evento({**base, "choices": [{"index": 0, "delta": {"content": texto},
+                                                          "finish_reason": None}]})
+            self._enviar_evento({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (pedido.get("stream_options") or {}).get("include_usage"):
+                self._enviar_evento({**base, "choices": [], "usage": uso})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # O cliente fechou a conexão: a geração foi cancelada
+            with servidor.lock:
+                servidor.cancelados += 1
+
+    def _enviar_evento(self, dados):
+        self.wfile.write(b"data: " + json.dumps(dados, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def _enviar_json(self, dados):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def iniciar_servidor(porta=0, atraso=0.05, resposta=RESPOSTA_PADRAO):
+    """
+    Sobe o servidor numa thread e retorna (servidor, url base para o cliente da OpenAI).
+    Com porta=0, usa uma porta livre. Para parar: servidor.shutdown().
+    """
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), _Tratador)
+    servidor.daemon_threads = True
+    servidor.atraso = atraso
+    servidor.resposta = resposta
+    servidor.lock = threading.Lock()
+    servidor.pedidos = 0
+    servidor.cancelados = 0
+    threading.Thread(target=servidor.serve_forever, name="servidor-fake-openai", daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API de chat da OpenAI.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--atraso", type=float, default=0.05, help="Segundos entre as palavras da resposta")
+    args = parser.parse_args()
+
+    servidor, url = iniciar_servidor(args.porta, args.atraso)
+    print(f"Servidor fake da OpenAI em {url} (Ctrl+C para parar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
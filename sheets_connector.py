@@ -1,60 +1,244 @@
-import gspread
+import os
+import logging
+import threading
+from pathlib import Path
 import pandas as pd
 import streamlit as st
-# O módulo json não é mais estritamente necessário aqui se st.secrets já entrega um dict ou se não estamos parseando string
-# import json
-
-# Carregar credenciais do Google Sheets
-# Tenta carregar as credenciais dos segredos do Streamlit (st.secrets) primeiro
-try:
-    # Acessa as credenciais do TOML, usando a chave correta [google_credentials]
-    gc = gspread.service_account_from_dict(st.secrets["google_credentials"])
-    st.success("Credenciais carregadas do Streamlit Secrets!") # Mensagem de depuração
-except Exception as e:
-    st.warning(f"Não foi possível carregar credenciais do Streamlit Secrets: {e}") # Mensagem de depuração
-    st.info("Tentando carregar credenciais de 'credentials.json' localmente...")
+from cache_local import tipar_dados, ler_snapshot, idade_snapshot, gravar_snapshot, marcar_snapshot_atualizado, invalidar_snapshot
+from armazenamento import ArmazenamentoPlanilha, ArmazenamentoSQLite, ArmazenamentoParticionado, COLUNAS
+from atualizador import AtualizadorDados
+import metricas
+
+NOME_PLANILHA = "Base Lovefintech" # O nome da sua planilha
+NOME_ABA = "Sheet1" # O nome da sua aba
+
+# Onde os lançamentos ficam guardados: "planilha" (Google Sheets, padrão) ou "sqlite" (banco local)
+MOTOR_ARMAZENAMENTO = os.getenv("LOVEFINTECH_ARMAZENAMENTO", "planilha").lower()
+CAMINHO_SQLITE = os.getenv("LOVEFINTECH_SQLITE", str(Path(__file__).resolve().parent / "lovefintech.db"))
+# Com o SQLite, LOVEFINTECH_SYNC_PLANILHA=1 liga a sincronização nos dois sentidos com a planilha
+SYNC_PLANILHA = os.getenv("LOVEFINTECH_SYNC_PLANILHA") == "1"
+# Na planilha, LOVEFINTECH_PARTICAO=ano (ou mes) divide os lançamentos em uma aba por ano (ou por mês).
+# As abas de períodos encerrados ficam guardadas localmente e só são conferidas pela última linha
+# a cada TTL_DADOS: edições no meio delas feitas direto na planilha não aparecem sozinhas (apague a
+# cópia .cache/sync_particao_<período>.json para baixar a aba de novo).
+PARTICAO = os.getenv("LOVEFINTECH_PARTICAO", "").lower()
+# Com partições, LOVEFINTECH_CARREGAR_DESDE=AAAA-MM-DD deixa de fora os períodos anteriores a essa data
+CARREGAR_DESDE = os.getenv("LOVEFINTECH_CARREGAR_DESDE")
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource(show_spinner=False)
+def obter_cliente():
+    """
+    Cria o cliente autenticado do Google Sheets na primeira vez que for usado.
+    O gspread só é importado aqui, para não pesar na abertura do app.
+    """
+    import gspread
+
+    # Tenta carregar as credenciais dos segredos do Streamlit (st.secrets) primeiro
+    try:
+        # Acessa as credenciais do TOML, usando a chave correta [google_credentials]
+        return gspread.service_account_from_dict(st.secrets["google_credentials"])
+    except Exception as e:
+        try:
+            # Para desenvolvimento local, carregue do arquivo credentials.json
+            # Certifique-se de que credentials.json está no .gitignore!
+            return gspread.service_account(filename='credentials.json')
+        except Exception as e_local:
+            raise RuntimeError(
+                f"Não foi possível carregar credenciais do Streamlit Secrets ({e}) "
+                f"nem de 'credentials.json' localmente ({e_local})"
+            ) from e_local
+
+@st.cache_resource(show_spinner=False)
+def obter_planilha():
+    """
+    Abre a planilha na primeira vez que for usada e reaproveita a conexão.
+    """
+    try:
+        with metricas.etapa("sheets/abrir_planilha"):
+            # Conta as chamadas de metadados, como o lastUpdateTime consultado pelo atualizador
+            return metricas.PlanilhaMedida(obter_cliente().open(NOME_PLANILHA))
+    except Exception as e:
+        raise RuntimeError(f"Erro ao abrir a planilha '{NOME_PLANILHA}': {e}") from e
+
+@st.cache_resource(show_spinner=False)
+def obter_worksheet():
+    """
+    Abre a aba da planilha na primeira vez que for usada e reaproveita a conexão.
+    """
     try:
-        # Para desenvolvimento local, carregue do arquivo credentials.json
-        # Certifique-se de que credentials.json está no .gitignore!
-        gc = gspread.service_account(filename='credentials.json')
-        st.success("Credenciais carregadas de 'credentials.json' localmente!") # Mensagem de depuração
-    except Exception as e_local:
-        st.error(f"Erro ao carregar credenciais de 'credentials.json' localmente: {e_local}")
-        st.stop() # Interrompe a execução do app se as credenciais não puderem ser carregadas
-
-# Abra a planilha pelo nome
-try:
-    # Certifique-se que o nome da planilha e aba estão corretos
-    spreadsheet = gc.open("Base Lovefintech") # O nome da sua planilha
-    worksheet = spreadsheet.worksheet("Sheet1") # O nome da sua aba
-except Exception as e:
-    st.error(f"Erro ao abrir a planilha 'Base Lovefintech' ou a aba 'Sheet1': {e}") # Mensagem de erro atualizada para corresponder aos nomes da planilha e aba
-    st.stop() # Interrompe a execução do app se a planilha não puder ser acessada
+        # Certifique-se que o nome da planilha e aba estão corretos
+        worksheet = obter_planilha().worksheet(NOME_ABA)
+        # Conta as chamadas à API e a latência de cada uma (quando as métricas estão ligadas)
+        return metricas.WorksheetMedida(worksheet)
+    except Exception as e:
+        raise RuntimeError(f"Erro ao abrir a planilha '{NOME_PLANILHA}' ou a aba '{NOME_ABA}': {e}") from e
+
+def _dados_enviados():
+    """
+    Chamado pela fila (na thread dela) depois de enviar lançamentos: pede a recarga
+    ao atualizador, sem esperar. Pedidos feitos durante uma recarga viram uma só.
+    """
+    # Se o processo cair antes da recarga, o snapshot já fica marcado como vencido
+    invalidar_snapshot()
+    atualizador = obter_atualizador(criar=False)
+    if atualizador is not None:
+        atualizador.disparar()
+
+@st.cache_resource(show_spinner=False)
+def obter_armazenamento():
+    """
+    Armazenamento compartilhado por todas as sessões, escolhido por LOVEFINTECH_ARMAZENAMENTO.
+    Nenhum dos dois abre conexão com a planilha antes de precisar.
+    """
+    if MOTOR_ARMAZENAMENTO == "sqlite":
+        return ArmazenamentoSQLite(CAMINHO_SQLITE,
+                                   obter_worksheet=obter_worksheet if SYNC_PLANILHA else None,
+                                   nome_aba=NOME_ABA)
+    if PARTICAO:
+        return ArmazenamentoParticionado(obter_planilha, PARTICAO, ao_descarregar=_dados_enviados,
+                                         inicio=CARREGAR_DESDE, intervalo_revalidacao=TTL_DADOS)
+    return ArmazenamentoPlanilha(obter_worksheet, NOME_ABA, ao_descarregar=_dados_enviados)
+
+def migrar_para_particoes():
+    """
+    Copia os lançamentos da aba única (NOME_ABA) para as abas de partição.
+    Feito uma vez, à mão, antes de ligar LOVEFINTECH_PARTICAO no app:
+        LOVEFINTECH_PARTICAO=ano python -c "import sheets_connector as s; print(s.migrar_para_particoes())"
+    A aba antiga não é apagada. Pode ser repetida se falhar no meio.
+    Retorna o resumo de ArmazenamentoParticionado.migrar (copiadas, já migradas e datas inválidas).
+    """
+    armazenamento = obter_armazenamento()
+    if not isinstance(armazenamento, ArmazenamentoParticionado):
+        raise RuntimeError("Defina LOVEFINTECH_PARTICAO=ano (ou mes) para migrar para as partições.")
+    return armazenamento.migrar(obter_worksheet())
 
 def salvar_dado(usuario, data, tipo, categoria, descricao, valor, forma_pgto):
     """
-    Salva um novo lançamento financeiro na planilha Google Sheets.
+    Salva um novo lançamento financeiro.
+    Na planilha, o lançamento vai primeiro para a fila local e é enviado em segundo plano;
+    no SQLite, é gravado direto no banco.
+    Retorna True se o lançamento foi registrado.
     """
     try:
         # Formata a data para string para salvar na planilha
         data_str = data.strftime("%Y-%m-%d")
         
-        # Adiciona uma nova linha com os dados
-        worksheet.append_row([usuario, data_str, tipo, categoria, descricao, valor, forma_pgto])
+        salvar_lancamentos([[usuario, data_str, tipo, categoria, descricao, valor, forma_pgto]])
+        return True
     except Exception as e:
-        st.error(f"Erro ao salvar dado na planilha: {e}")
+        st.error(f"Erro ao salvar dado: {e}")
+        return False
+
+def salvar_lancamentos(linhas, recarregar=True):
+    """
+    Grava vários lançamentos de uma vez (listas na ordem das colunas da planilha).
+    Usado pelo formulário e pela importação de extratos; erros são propagados.
+    Quem grava em vários blocos passa recarregar=False e chama recarregar_dados() no fim.
+    """
+    obter_armazenamento().salvar(linhas)
+    if recarregar:
+        recarregar_dados()
+
+def recarregar_dados():
+    """
+    Com o armazenamento local, recarrega os dados na hora (os dados já mudaram e
+    recarregar é rápido). Na planilha, a recarga vem quando a fila enviar os lotes.
+    """
+    atualizador = obter_atualizador(criar=False)
+    if not obter_armazenamento().usa_snapshot and atualizador is not None:
+        atualizador.atualizar()
+
+def lancamentos_pendentes():
+    """
+    DataFrame cru (colunas da planilha) dos lançamentos salvos que ainda esperam
+    envio para a planilha e por isso não estão em carregar_dados().
+    """
+    return pd.DataFrame(obter_armazenamento().lancamentos_pendentes(), columns=COLUNAS)
+
+def status_fila():
+    """
+    Retorna (pendentes, enviados, ultimo_erro) do envio para a planilha.
+    """
+    return obter_armazenamento().status()
+
+TTL_DADOS = 600 # Recarrega os dados pelo menos a cada 10 minutos, mesmo sem sinal de mudança
+INTERVALO_VERIFICACAO = 30 # Segundos entre as consultas à data de modificação da planilha
+
+def _buscar_dados(atual):
+    """
+    Busca os lançamentos no armazenamento (em segundo plano, pelo AtualizadorDados).
+    Retorna o DataFrame tipado, ou None se a versão for a mesma de `atual`. Erros são propagados.
+    """
+    armazenamento = obter_armazenamento()
+    if not armazenamento.usa_snapshot and SYNC_PLANILHA:
+        try:
+            with metricas.etapa("carregar_dados/sincronizar_com_planilha"):
+                armazenamento.sincronizar_com_planilha()
+        except Exception as e:
+            # O erro aparece no status da fila; os dados locais continuam valendo
+            logger.warning("Não foi possível sincronizar com a planilha; usando os dados locais: %s", e)
+
+    # Na planilha, só as linhas novas são baixadas; o restante vem da cópia local (ver sincronizacao.py)
+    with metricas.etapa("carregar_dados/sincronizar") as m:
+        cabecalho, linhas, versao = armazenamento.carregar()
+        m.linhas = len(linhas)
+    if atual is not None and atual.attrs.get("versao") == versao:
+        # Nada mudou: evita converter os tipos de novo
+        if armazenamento.usa_snapshot:
+            marcar_snapshot_atualizado()
+        return None
+
+    # Converte para DataFrame do pandas e grava o snapshot tipado
+    with metricas.etapa("carregar_dados/tipar", len(linhas)):
+        df = tipar_dados(pd.DataFrame(linhas, columns=cabecalho))
+    df.attrs["versao"] = versao
+    if armazenamento.usa_snapshot:
+        with metricas.etapa("carregar_dados/gravar_snapshot", len(df)):
+            gravar_snapshot(df, versao)
+    return df
+
+_atualizador = None
+_lock_atualizador = threading.Lock()
+
+def obter_atualizador(criar=True):
+    """
+    Atualizador dos dados compartilhado por todas as sessões (ver atualizador.py).
+    Começa com o snapshot local (ver cache_local.py), se houver, e o renova em segundo plano.
+    Só é criado (e só começa a consultar a planilha) quando alguém carrega os dados;
+    com criar=False, retorna None se isso ainda não aconteceu.
+    """
+    global _atualizador
+    with _lock_atualizador:
+        if _atualizador is None and criar:
+            armazenamento = obter_armazenamento()
+            inicial = ler_snapshot() if armazenamento.usa_snapshot else None
+            _atualizador = AtualizadorDados(_buscar_dados, armazenamento.marca_modificacao,
+                                            intervalo_verificacao=INTERVALO_VERIFICACAO, intervalo_maximo=TTL_DADOS,
+                                            inicial=inicial,
+                                            idade_inicial=idade_snapshot() if inicial is not None else 0.0).iniciar()
+        return _atualizador
 
-@st.cache_data(ttl=600) # Cache os dados por 10 minutos
 def carregar_dados():
     """
-    Carrega todos os dados da planilha Google Sheets.
+    Retorna na hora a versão mais recente dos lançamentos, já tipados.
+    A atualização acontece em segundo plano; só a primeira carga, sem
+    snapshot local, espera a planilha.
     """
     try:
-        # Obtém todos os registros como uma lista de dicionários
-        data = worksheet.get_all_records()
-        # Converte para DataFrame do pandas
-        df = pd.DataFrame(data)
+        df, _ = obter_atualizador().obter()
         return df
     except Exception as e:
-        st.error(f"Erro ao carregar dados da planilha: {e}")
-        return pd.DataFrame() # Retorna um DataFrame vazio em caso de erro
\ No newline at end of file
+        st.error(f"Erro ao carregar dados: {e}")
+        return pd.DataFrame() # Retorna um DataFrame vazio se nunca foi possível carregar
+
+def estado_dados():
+    """
+    Retorna (idade dos dados em segundos, versão, erro da última tentativa de atualização ou None).
+    Se os dados ainda não foram carregados nesta execução do app, retorna (infinito, None, None).
+    """
+    atualizador = obter_atualizador(criar=False)
+    if atualizador is None:
+        return float("inf"), None, None
+    return atualizador.idade, atualizador.versao, atualizador.ultimo_erro
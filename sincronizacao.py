@@ -0,0 +1,233 @@
+# sincronizacao.py
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Pasta onde ficam as cópias locais da planilha (não vai para o git).
+# Pode ser trocada pela variável de ambiente LOVEFINTECH_CACHE (por exemplo, no benchmark).
+DIRETORIO_CACHE = Path(os.getenv("LOVEFINTECH_CACHE", Path(__file__).resolve().parent / ".cache"))
+
+# Mesmo sem detectar nada estranho, refaz a sincronização completa de tempos em tempos.
+# Edições no meio da planilha não aparecem no download incremental, então isso é a rede de segurança.
+INTERVALO_RESYNC_COMPLETO = 6 * 60 * 60  # 6 horas
+
+
+def _caminho_estado(nome_aba):
+    return DIRETORIO_CACHE / f"sync_{nome_aba}.json"
+
+
+# Última cópia lida ou gravada de cada aba, junto com a assinatura (mtime, tamanho) do arquivo:
+# enquanto o arquivo não mudar, as sincronizações seguintes não o releem nem recalculam o hash
+_estados = {}
+_lock_estados = threading.Lock()
+
+
+def _checksum(cabecalho, linhas):
+    """
+    Calcula um hash das linhas sincronizadas para validar a cópia local.
+    """
+    conteudo = json.dumps([cabecalho, linhas], ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _encadear(versao, novas):
+    """
+    Versão depois de acrescentar `novas` a uma cópia na `versao`: muda junto com
+    os dados, sem precisar passar de novo pelas linhas que já estavam lá.
+    """
+    conteudo = versao + json.dumps(novas, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _normalizar(linhas, tamanho):
+    """
+    Completa as linhas com células vazias (a API corta as células vazias do final)
+    e converte números da mesma forma que o get_all_records faz.
+    """
+    # Importado aqui (uma vez por sincronização), para o gspread não pesar na abertura do app
+    from gspread.utils import numericise_all
+
+    return [numericise_all(list(linha[:tamanho]) + [""] * (tamanho - len(linha))) for linha in linhas]
+
+
+def _assinatura(caminho):
+    estado = os.stat(caminho)
+    return estado.st_mtime_ns, estado.st_size
+
+
+def _guardar_em_memoria(nome_aba, estado):
+    with _lock_estados:
+        _estados[nome_aba] = (estado, _assinatura(_caminho_estado(nome_aba)))
+
+
+def _ler_arquivo(caminho):
+    """
+    A cópia local tem uma linha JSON com a aba inteira (da última sincronização
+    completa) seguida de uma linha por leva de linhas novas, cada uma com a versão
+    encadeada (ver _encadear). Retorna None se alguma parte não conferir.
+    """
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            estado = json.loads(f.readline())
+            if estado.get("checksum") != _checksum(estado.get("cabecalho"), estado.get("linhas")):
+                return None
+            estado.setdefault("versao", estado["checksum"])
+            for texto in f:
+                acrescimo = json.loads(texto)
+                versao = _encadear(estado["versao"], acrescimo["linhas"])
+                if acrescimo.get("versao") != versao:
+                    return None # Gravação interrompida no meio ou arquivo alterado
+                estado["linhas"].extend(acrescimo["linhas"])
+                estado["ultima_linha"] += len(acrescimo["linhas"])
+                estado["versao"] = versao
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return estado
+
+
+def _ler_estado(nome_aba):
+    """
+    Lê a cópia local da aba. Retorna None se não existir ou se estiver corrompida.
+    O estado devolvido é compartilhado: não deve ser alterado por quem o recebe.
+    """
+    caminho = _caminho_estado(nome_aba)
+    try:
+        assinatura = _assinatura(caminho)
+    except OSError:
+        return None
+    with _lock_estados:
+        guardado = _estados.get(nome_aba)
+    if guardado is not None and guardado[1] == assinatura:
+        return guardado[0]
+
+    estado = _ler_arquivo(caminho)
+    if estado is not None:
+        with _lock_estados:
+            _estados[nome_aba] = (estado, assinatura)
+    return estado
+
+
+def _gravar_estado(nome_aba, estado):
+    """
+    Grava a cópia local inteira de forma atômica (arquivo temporário + rename).
+    """
+    DIRETORIO_CACHE.mkdir(parents=True, exist_ok=True)
+    caminho = _caminho_estado(nome_aba)
+    temporario = caminho.with_suffix(".tmp")
+    estado["checksum"] = _checksum(estado["cabecalho"], estado["linhas"])
+    estado.setdefault("versao", estado["checksum"])
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(json.dumps(estado, ensure_ascii=False, default=str) + "\n")
+    os.replace(temporario, caminho)
+    _guardar_em_memoria(nome_aba, estado)
+
+
+def _acrescentar_linhas(nome_aba, estado, novas):
+    """
+    Acrescenta as linhas novas no fim da cópia local, sem reescrever o que já estava
+    lá. Retorna o novo estado (o anterior não é alterado, pois pode estar em uso).
+    """
+    versao = _encadear(estado["versao"], novas)
+    with open(_caminho_estado(nome_aba), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"linhas": novas, "versao": versao}, ensure_ascii=False, default=str) + "\n")
+    estado = {**estado, "linhas": estado["linhas"] + novas, "ultima_linha": estado["ultima_linha"] + len(novas),
+              "versao": versao}
+    _guardar_em_memoria(nome_aba, estado)
+    return estado
+
+
+def _sincronizacao_completa(worksheet, nome_aba, anterior=None):
+    """
+    Baixa a aba inteira e substitui a cópia local. Se os dados forem os mesmos
+    da cópia `anterior`, a versão continua a mesma.
+    """
+    valores = worksheet.get_all_values()
+    if not valores:
+        estado = {"cabecalho": [], "linhas": [], "ultima_linha": 0}
+    else:
+        cabecalho = valores[0]
+        linhas = _normalizar(valores[1:], len(cabecalho))
+        estado = {"cabecalho": cabecalho, "linhas": linhas, "ultima_linha": len(valores)}
+
+    if anterior is not None and anterior["cabecalho"] == estado["cabecalho"] and anterior["linhas"] == estado["linhas"]:
+        estado["versao"] = anterior["versao"]
+    estado["resync_completo_em"] = time.time()
+    _gravar_estado(nome_aba, estado)
+    return estado
+
+
+def sincronizar(worksheet, nome_aba="Sheet1", forcar_completa=False, intervalo_resync=INTERVALO_RESYNC_COMPLETO):
+    """
+    Sincroniza a cópia local com a aba da planilha e retorna (cabecalho, linhas, versao).
+    A versão muda sempre que os dados mudam.
+
+    Busca apenas as linhas adicionadas depois da última sincronização, relendo
+    também a última linha conhecida como âncora. Se a âncora mudou ou sumiu
+    (edição ou exclusão de linhas), faz uma sincronização completa. A cada
+    `intervalo_resync` segundos (nunca, se None) também faz uma completa de qualquer forma.
+    """
+    estado = None if forcar_completa else _ler_estado(nome_aba)
+
+    if (
+        estado is None
+        or not estado["cabecalho"]
+        or (intervalo_resync is not None and time.time() - estado.get("resync_completo_em", 0) > intervalo_resync)
+    ):
+        estado = _sincronizacao_completa(worksheet, nome_aba, estado)
+        return estado["cabecalho"], estado["linhas"], estado["versao"]
+
+    from gspread.utils import rowcol_to_a1
+
+    cabecalho = estado["cabecalho"]
+    ultima_linha = estado["ultima_linha"]
+    ultima_coluna = rowcol_to_a1(1, len(cabecalho)).rstrip("0123456789")
+
+    # Uma única chamada: a linha âncora e tudo que vier depois dela
+    valores = worksheet.get(f"A{ultima_linha}:{ultima_coluna}")
+    if not valores:
+        # A aba encolheu: linhas foram excluídas
+        estado = _sincronizacao_completa(worksheet, nome_aba, estado)
+        return estado["cabecalho"], estado["linhas"], estado["versao"]
+
+    if ultima_linha == 1:
+        ancora_ok = list(valores[0][:len(cabecalho)]) == cabecalho
+    else:
+        ancora_ok = _normalizar(valores[:1], len(cabecalho))[0] == estado["linhas"][-1]
+
+    if not ancora_ok:
+        # A última linha conhecida foi editada ou deslocada
+        estado = _sincronizacao_completa(worksheet, nome_aba, estado)
+        return estado["cabecalho"], estado["linhas"], estado["versao"]
+
+    novas = _normalizar(valores[1:], len(cabecalho))
+    if novas:
+        estado = _acrescentar_linhas(nome_aba, estado, novas)
+
+    return cabecalho, estado["linhas"], estado["versao"]
+
+
+def sincronizar_imutavel(worksheet, nome_aba):
+    """
+    Para abas que não mudam mais (como a partição de um ano já encerrado):
+    usa a cópia local sempre que ela existir, sem consultar a planilha, e só
+    baixa a aba inteira na primeira vez. Retorna (cabecalho, linhas, versao).
+    """
+    estado = _ler_estado(nome_aba)
+    if estado is None or not estado["cabecalho"]:
+        estado = _sincronizacao_completa(worksheet, nome_aba)
+    return estado["cabecalho"], estado["linhas"], estado["versao"]
+
+
+def descartar_copia(nome_aba):
+    """
+    Apaga a cópia local da aba: a próxima sincronização baixa tudo de novo.
+    """
+    with _lock_estados:
+        _estados.pop(nome_aba, None)
+    try:
+        _caminho_estado(nome_aba).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# As cópias locais dos testes não podem misturar com as do app (definido antes de importar os módulos)
+os.environ["LOVEFINTECH_CACHE"] = tempfile.mkdtemp(prefix="lovefintech-testes-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
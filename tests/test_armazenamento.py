@@ -0,0 +1,37 @@
+# tests/test_armazenamento.py
+import pandas as pd
+
+from agregacoes import agregar_cubo, calcular_agregados
+from armazenamento import ArmazenamentoPlanilha, ArmazenamentoSQLite
+from cache_local import tipar_dados
+from planilha_fake import PlanilhaFake
+
+
+def test_status_nao_cria_a_fila_sem_nada_para_enviar():
+    armazenamento = ArmazenamentoPlanilha(lambda: PlanilhaFake(), "Sheet1")
+    assert armazenamento.status() == (0, 0, None)
+    assert armazenamento._fila is None
+
+
+def test_sqlite_grava_datas_no_formato_iso(tmp_path):
+    armazenamento = ArmazenamentoSQLite(tmp_path / "lancamentos.db")
+    armazenamento.salvar([
+        ["Carol", "15/03/2024", "Despesa", "Lazer", "Cinema", 40.0, "Pix"],
+        ["Carol", "2024-04-01", "Receita", "Salário", "Salário", 3000.0, "Pix"],
+        ["Carol", "sem data", "Despesa", "Outros", "?", 1.0, "Pix"],
+    ])
+    cabecalho, linhas, _ = armazenamento.carregar()
+    assert [l[1] for l in linhas] == ["2024-03-15", "2024-04-01", "sem data"]
+
+    # O cubo feito no SQL e o calculado no pandas enxergam os mesmos lançamentos
+    df = tipar_dados(pd.DataFrame(linhas, columns=cabecalho))
+    no_sql = agregar_cubo(*armazenamento.consultar_cubo())["Carol"]["mensal"]
+    no_pandas = calcular_agregados(df)["Carol"]["mensal"]
+    pd.testing.assert_frame_equal(no_sql.reset_index(drop=True), no_pandas.reset_index(drop=True), check_dtype=False)
+
+
+def test_so_envia_para_a_planilha_quando_ha_planilha(tmp_path):
+    assert ArmazenamentoPlanilha(lambda: PlanilhaFake(), "Sheet1").envia_para_planilha
+    assert not ArmazenamentoSQLite(tmp_path / "local.db").envia_para_planilha
+    assert ArmazenamentoSQLite(tmp_path / "sincronizado.db", obter_worksheet=lambda: PlanilhaFake(),
+                               nome_aba="Sheet1").envia_para_planilha
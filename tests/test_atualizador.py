@@ -0,0 +1,57 @@
+# tests/test_atualizador.py
+import threading
+import time
+
+import pandas as pd
+
+from atualizador import AtualizadorDados
+
+
+def test_primeira_carga_simultanea_busca_uma_vez_so():
+    chamadas = []
+
+    def buscar(atual):
+        chamadas.append(atual)
+        time.sleep(0.2)
+        return pd.DataFrame({"Valor": [1.0]})
+
+    atualizador = AtualizadorDados(buscar)
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(atualizador.obter()[0])) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(chamadas) == 1
+    assert all(df is resultados[0] for df in resultados)
+
+
+def test_falha_mantem_a_versao_anterior():
+    respostas = [pd.DataFrame({"Valor": [1.0]}), RuntimeError("planilha fora do ar")]
+
+    def buscar(atual):
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    atualizador = AtualizadorDados(buscar)
+    df, _ = atualizador.obter()
+    assert atualizador.atualizar() is False
+    assert atualizador.obter()[0] is df
+    assert atualizador.ultimo_erro == "planilha fora do ar"
+
+
+def test_parar_encerra_a_thread_sem_novas_recargas():
+    chamadas = []
+    atualizador = AtualizadorDados(lambda atual: chamadas.append(1) or pd.DataFrame({"Valor": [1.0]}),
+                                   intervalo_verificacao=0.01, intervalo_maximo=0.0).iniciar()
+    atualizador.obter()
+    atualizador.parar(timeout=2)
+    assert not atualizador._thread.is_alive()
+    feitas = len(chamadas)
+    atualizador.disparar()
+    time.sleep(0.05)
+    assert len(chamadas) == feitas
+    assert atualizador.obter()[0]["Valor"].tolist() == [1.0]
@@ -0,0 +1,20 @@
+# tests/test_cache_local.py
+import pandas as pd
+
+from cache_local import tipar_dados, gravar_snapshot, ler_snapshot
+from planilha_fake import PlanilhaFake
+from sincronizacao import sincronizar
+
+
+def test_descricao_numerica_vai_para_o_snapshot_como_texto():
+    planilha = PlanilhaFake([
+        ["Carol", "2024-03-01", "Despesa", "Outros", "2024", 10.0, "Pix"],
+        ["Carol", "2024-03-02", "Despesa", "Lazer", "Cinema", 40.0, "Pix"],
+    ])
+    cabecalho, linhas, versao = sincronizar(planilha, "descricao_numerica", forcar_completa=True)
+    df = tipar_dados(pd.DataFrame(linhas, columns=cabecalho))
+    gravar_snapshot(df, versao)
+
+    snapshot = ler_snapshot()
+    assert snapshot["Descricao"].tolist() == ["2024", "Cinema"]
+    assert snapshot.attrs["versao"] == versao
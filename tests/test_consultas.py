@@ -0,0 +1,105 @@
+# tests/test_consultas.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache_local import tipar_dados
+from consultas import IndiceLancamentos
+from planilha_fake import CABECALHO, gerar_linhas
+
+
+@pytest.fixture(scope="module")
+def indice():
+    df = tipar_dados(pd.DataFrame(gerar_linhas(3000), columns=CABECALHO))
+    # Fora de ordem, como pode vir da planilha: o índice ordena por data
+    return IndiceLancamentos(df.sample(frac=1, random_state=1).reset_index(drop=True))
+
+
+def _esperado(df, usuario=None, tipo=None, categorias=None, meses=None, data_inicio=None, data_fim=None, texto=None):
+    """
+    Mesmo filtro com máscaras do pandas, varrendo a tabela inteira.
+    """
+    mascara = pd.Series(True, index=df.index)
+    if usuario:
+        mascara &= df["Usuario"].astype(str) == usuario
+    if tipo:
+        mascara &= df["Tipo"].astype(str) == tipo
+    if categorias:
+        mascara &= df["Categoria"].astype(str).isin(categorias)
+    if meses:
+        mascara &= df["Mes/Ano"].astype(str).isin(meses)
+    if data_inicio is not None:
+        mascara &= df["Data"] >= pd.Timestamp(data_inicio)
+    if data_fim is not None:
+        mascara &= df["Data"] <= pd.Timestamp(data_fim) # O último dia entra
+    if texto:
+        mascara &= df["Descricao"].astype(str).str.contains(texto, case=False, regex=False)
+    return np.flatnonzero(mascara.to_numpy())
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"data_inicio": "2018-03-10", "data_fim": "2019-07-31"},
+    {"data_inicio": "2020-01-01"},
+    {"data_fim": "2016-12-31"},
+    {"usuario": "Carol", "tipo": "Despesa"},
+    {"categorias": ["Lazer", "Saúde"], "data_inicio": "2017-01-01", "data_fim": "2021-12-31"},
+    {"usuario": "Marcio", "categorias": ["Alimentação", "Transporte", "Moradia"]},
+    {"meses": ["2019-05", "2023-11"], "tipo": "Receita"},
+    {"texto": "MERCADO"},
+    {"texto": "uber", "usuario": "Carol", "data_inicio": "2019-01-01"},
+    {"categorias": ["Lazer", "Categoria que não existe"]},
+])
+def test_filtrar_igual_as_mascaras_do_pandas(indice, filtros):
+    esperado = _esperado(indice.df, **filtros)
+    assert len(esperado) > 0
+    np.testing.assert_array_equal(indice.filtrar(**filtros), esperado)
+
+
+@pytest.mark.parametrize("filtros", [
+    {"categorias": ["Categoria que não existe"]},
+    {"usuario": "Fulano"},
+    {"meses": ["1999-01"]},
+    {"data_inicio": "2030-01-01"},
+    {"data_inicio": "2020-01-02", "data_fim": "2020-01-01"},
+    {"texto": "texto que não aparece em nenhuma descrição"},
+    {"usuario": "Carol", "tipo": "Receita", "categorias": ["Lazer"]},
+])
+def test_filtrar_sem_resultado(indice, filtros):
+    assert len(_esperado(indice.df, **filtros)) == 0
+    assert len(indice.filtrar(**filtros)) == 0
+    assert indice.selecionar(**filtros).empty
+
+
+def test_lancamentos_ficam_em_ordem_de_data(indice):
+    assert indice.df["Data"].is_monotonic_increasing
+    assert indice.valores("Usuario") == ["Carol", "Marcio"]
+
+
+def test_pagina_em_ordem_e_dentro_dos_limites(indice):
+    posicoes = indice.filtrar(usuario="Carol")
+    primeira, total = indice.pagina(posicoes, 1, tamanho=100)
+    assert total == -(-len(posicoes) // 100)
+    assert len(primeira) == 100
+    assert primeira["Data"].is_monotonic_decreasing # Mais recentes primeiro
+    assert primeira.index[0] == posicoes[-1]
+
+    ultima, _ = indice.pagina(posicoes, total, tamanho=100)
+    assert len(ultima) == len(posicoes) - 100 * (total - 1)
+    assert ultima.index[-1] == posicoes[0]
+
+    # Números fora do intervalo vão para a primeira ou a última página
+    assert indice.pagina(posicoes, 0, tamanho=100)[0].equals(primeira)
+    assert indice.pagina(posicoes, total + 5, tamanho=100)[0].equals(ultima)
+
+    antigas, _ = indice.pagina(posicoes, 1, tamanho=100, mais_recentes_primeiro=False)
+    assert antigas["Data"].is_monotonic_increasing and antigas.index[0] == posicoes[0]
+
+    # Todas as páginas juntas cobrem as posições uma única vez
+    todas = np.concatenate([indice.pagina(posicoes, n, tamanho=100)[0].index for n in range(1, total + 1)])
+    np.testing.assert_array_equal(todas, posicoes[::-1])
+
+
+def test_pagina_de_resultado_vazio(indice):
+    vazio, total = indice.pagina(np.empty(0, dtype=np.intp), 3)
+    assert total == 1 and vazio.empty
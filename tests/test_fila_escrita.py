@@ -0,0 +1,158 @@
+# tests/test_fila_escrita.py
+import time
+
+import pytest
+
+import fila_escrita
+from fila_escrita import FilaEscrita, ha_pendentes
+from planilha_fake import PlanilhaFake, gerar_linhas
+
+
+class PlanilhaInstavel(PlanilhaFake):
+    """
+    Falha nas primeiras `falhas` chamadas a append_rows, guardando o momento de cada tentativa.
+    """
+
+    def __init__(self, falhas):
+        super().__init__()
+        self.falhas = falhas
+        self.tentativas = []
+
+    def append_rows(self, valores, **kwargs):
+        self.tentativas.append(time.monotonic())
+        if len(self.tentativas) <= self.falhas:
+            raise ConnectionError("API do Sheets indisponível")
+        super().append_rows(valores, **kwargs)
+
+
+class PlanilhaLimitada(PlanilhaFake):
+    """
+    Aceita os primeiros `limite` lançamentos e depois falha em todo append_rows.
+    """
+
+    def __init__(self, limite):
+        super().__init__()
+        self.limite = limite
+
+    def append_rows(self, valores, **kwargs):
+        if len(self.valores) - 1 >= self.limite:
+            raise ConnectionError("API do Sheets indisponível")
+        super().append_rows(valores, **kwargs)
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return tmp_path / "fila.jsonl"
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_envia_em_lotes_na_ordem(caminho):
+    planilha = PlanilhaFake()
+    linhas = gerar_linhas(1200)
+    descarregados = []
+    fila = FilaEscrita(lambda: planilha, caminho=caminho, tamanho_lote=500,
+                       ao_descarregar=lambda: descarregados.append(True))
+    fila.enfileirar_lote(linhas[:700])
+    for linha in linhas[700:]:
+        fila.enfileirar(linha)
+    assert fila.pendentes == 1200
+
+    assert fila.descarregar() == 1200
+    assert planilha.chamadas == 3 # 500 + 500 + 200
+    assert planilha.valores[1:] == linhas
+    assert fila.pendentes == 0 and fila.enviados == 1200
+    assert descarregados == [True] # Uma recarga para a descarga inteira, não uma por lote
+
+
+def test_tenta_de_novo_com_espera_crescente(caminho):
+    planilha = PlanilhaInstavel(falhas=3)
+    descarregados = []
+    fila = FilaEscrita(lambda: planilha, caminho=caminho, atraso_lote=0, espera_inicial=0.1,
+                       ao_descarregar=lambda: descarregados.append(True))
+    fila.enfileirar_lote(gerar_linhas(10))
+    fila.iniciar()
+
+    # pendentes zera antes do fim da descarga (aviso de descarregado e limpeza do erro)
+    assert _esperar(lambda: fila.pendentes == 0 and descarregados and fila.ultimo_erro is None)
+    assert len(planilha.valores) == 11
+    assert fila.ultimo_erro is None and descarregados == [True]
+    esperas = [b - a for a, b in zip(planilha.tentativas, planilha.tentativas[1:])]
+    assert len(esperas) == 3
+    assert esperas[0] >= 0.1 and esperas[1] >= 0.2 and esperas[2] >= 0.4
+
+
+def test_diario_reenviado_depois_de_queda_entre_envio_e_remocao(caminho, monkeypatch):
+    planilha = PlanilhaFake()
+    linhas = gerar_linhas(5)
+    fila = FilaEscrita(lambda: planilha, caminho=caminho)
+    fila.enfileirar_lote(linhas)
+
+    def queda(quantidade, posicao):
+        raise SystemExit("processo caiu")
+
+    monkeypatch.setattr(fila, "_remover_enviados", queda)
+    with pytest.raises(SystemExit):
+        fila.descarregar()
+    assert len(planilha.valores) == 6 # A planilha recebeu, mas o diário não foi limpo
+
+    # Nova execução do app: o diário continua lá e o lote é reenviado (entrega ao menos uma vez)
+    nova = FilaEscrita(lambda: planilha, caminho=caminho)
+    assert nova.pendentes == 5
+    assert nova.descarregar() == 5
+    assert planilha.valores[1:] == linhas + linhas
+    assert nova.pendentes == 0
+    assert FilaEscrita(lambda: planilha, caminho=caminho).pendentes == 0
+
+
+def test_lotes_separados_por_chave(caminho):
+    planilha = PlanilhaFake()
+    lotes = []
+    planilha_append = planilha.append_rows
+    planilha.append_rows = lambda valores, **kwargs: (lotes.append([l[1][:4] for l in valores]),
+                                                      planilha_append(valores, **kwargs))
+    fila = FilaEscrita(lambda: planilha, caminho=caminho, tamanho_lote=3, chave_lote=lambda linha: linha[1][:4])
+    datas = ["2023-12-30", "2023-12-31", "2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2023-12-29"]
+    fila.enfileirar_lote([["Carol", d, "Despesa", "Outros", "x", "1.00", "Pix"] for d in datas])
+
+    assert fila.descarregar() == 7
+    assert lotes == [["2023", "2023"], ["2024", "2024", "2024"], ["2024"], ["2023"]]
+
+
+def test_diario_nao_e_reescrito_a_cada_lote(caminho):
+    planilha = PlanilhaLimitada(10)
+    linhas = gerar_linhas(25)
+    fila = FilaEscrita(lambda: planilha, caminho=caminho, tamanho_lote=5)
+    fila.enfileirar_lote(linhas)
+    inode, tamanho = caminho.stat().st_ino, caminho.stat().st_size
+
+    with pytest.raises(ConnectionError):
+        fila.descarregar()
+    assert fila.pendentes == 15
+    assert (caminho.stat().st_ino, caminho.stat().st_size) == (inode, tamanho) # Só a posição avançou
+    assert ha_pendentes(caminho)
+
+    # Outra execução do app continua de onde parou
+    nova = FilaEscrita(lambda: PlanilhaFake(), caminho=caminho)
+    assert nova.pendentes == 15 and nova.linhas_pendentes() == linhas[10:]
+    assert nova.descarregar() == 15
+    assert caminho.stat().st_size == 0 and not ha_pendentes(caminho)
+
+
+def test_diario_compactado_quando_a_parte_enviada_cresce(caminho, monkeypatch):
+    monkeypatch.setattr(fila_escrita, "LIMITE_COMPACTACAO", 500)
+    planilha = PlanilhaLimitada(20)
+    linhas = gerar_linhas(40)
+    fila = FilaEscrita(lambda: planilha, caminho=caminho, tamanho_lote=10)
+    fila.enfileirar_lote(linhas)
+    tamanho = caminho.stat().st_size
+
+    with pytest.raises(ConnectionError):
+        fila.descarregar()
+    assert caminho.stat().st_size < tamanho # Os lotes enviados saíram do arquivo
+    assert FilaEscrita(lambda: planilha, caminho=caminho).linhas_pendentes() == linhas[20:]
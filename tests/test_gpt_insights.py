@@ -0,0 +1,103 @@
+# tests/test_gpt_insights.py
+import time
+
+import openai
+import pandas as pd
+import pytest
+
+import gpt_insights
+import metricas
+from cache_insights import CacheInsights
+from cache_local import tipar_dados
+from planilha_fake import CABECALHO, gerar_linhas
+from servidor_fake_openai import RESPOSTA_PADRAO, iniciar_servidor
+
+
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    servidor, url = iniciar_servidor(atraso=0.05)
+    gpt_insights.definir_backend(gpt_insights.BackendOpenAI(openai.OpenAI(api_key="fake", base_url=url, max_retries=0)))
+    monkeypatch.setattr(gpt_insights, "cache", CacheInsights(caminho=tmp_path / "insights.json"))
+    yield servidor
+    gpt_insights.definir_backend(None)
+    servidor.shutdown()
+
+
+@pytest.fixture
+def df():
+    return tipar_dados(pd.DataFrame(gerar_linhas(300), columns=CABECALHO))
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_gerar_stream_entrega_o_primeiro_pedaco_logo(servidor):
+    backend = gpt_insights.obter_backend()
+    inicio = time.perf_counter()
+    fluxo = backend.gerar_stream([{"role": "user", "content": "oi"}])
+    primeiro = next(fluxo)
+    assert time.perf_counter() - inicio < 1.0
+    assert (primeiro + "".join(fluxo)) == RESPOSTA_PADRAO
+
+
+def test_insight_em_segundo_plano_vai_para_o_cache(servidor, df):
+    inicio = time.perf_counter()
+    pedacos = gpt_insights.iniciar_insight(df).tokens()
+    next(pedacos)
+    assert time.perf_counter() - inicio < 1.0
+    list(pedacos)
+
+    assert gpt_insights.gerar_insight(df) == RESPOSTA_PADRAO
+    assert servidor.pedidos == 1 # O segundo pedido veio do cache
+
+
+def test_mesmos_lancamentos_com_outro_autor_nao_reaproveitam_o_insight(servidor, df):
+    trocado = df.copy()
+    trocado["Usuario"] = trocado["Usuario"].map({"Carol": "Marcio", "Marcio": "Carol"}).astype("category")
+
+    assert gpt_insights.gerar_insight(df) == RESPOSTA_PADRAO
+    assert gpt_insights.gerar_insight(trocado) == RESPOSTA_PADRAO
+    assert servidor.pedidos == 2 # O prompt traz os totais por pessoa, então é outro insight
+
+
+def test_prazo_esgotado_cancela_a_geracao(servidor, df):
+    servidor.atraso = 1.0
+    inicio = time.perf_counter()
+    texto = "".join(gpt_insights.iniciar_insight(df, timeout=0.3).tokens())
+    assert texto.startswith("Erro ao gerar insight com IA")
+    assert time.perf_counter() - inicio < 2.0
+    assert _esperar(lambda: servidor.cancelados == 1)
+
+
+def test_ultimo_leitor_saindo_cancela_a_geracao(servidor, df):
+    servidor.atraso = 0.1
+    geracao = gpt_insights.iniciar_insight(df)
+    primeiro, segundo = geracao.tokens(), geracao.tokens()
+    next(primeiro)
+    next(segundo)
+    primeiro.close()
+    assert not geracao.cancelada # Ainda há quem esteja lendo
+    segundo.close()
+    assert geracao.cancelada
+    assert _esperar(lambda: servidor.cancelados == 1)
+    assert _esperar(lambda: geracao.concluida)
+    assert gpt_insights.cache.obter(geracao.chave) is None # Texto incompleto não vai para o cache
+
+
+def test_tamanho_do_prompt_vai_para_o_painel_de_debug(df, monkeypatch):
+    monkeypatch.delenv("INSIGHTS_MEDIR_PROMPT", raising=False)
+    metricas.limpar()
+    metricas.ativar()
+    try:
+        prompt = gpt_insights.montar_prompt(gpt_insights.resumir_dados(df))
+        gpt_insights.medir_prompt(df, prompt)
+        [medida] = metricas.resumo()["prompts"]
+    finally:
+        metricas.desativar()
+        metricas.limpar()
+    assert medida["prompt"] == "insight" and medida["linhas"] == len(df)
+    assert 0 < medida["tokens"] < medida["tokens_completo"]
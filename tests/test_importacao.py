@@ -0,0 +1,62 @@
+# tests/test_importacao.py
+import io
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import COLUNAS
+from cache_local import tipar_dados
+from fila_escrita import FilaEscrita
+from importacao import ler_extrato, importar_extrato, hashes_lancamentos, obter_indice_hashes
+from planilha_fake import PlanilhaFake
+
+SEM_EXISTENTES = (np.empty(0, dtype="uint64"), np.empty(0, dtype="int64"))
+CSV = b"Data;Descricao;Valor\n" + b"01/03/2024;Padaria;-10,00\n" * 3 + b"02/03/2024;Mercado;-50,00\n"
+
+
+def _existentes(linhas):
+    df = pd.DataFrame(linhas, columns=["Usuario", "Data", "Tipo", "Categoria", "Descricao", "Valor", "Forma_pgto"])
+    return np.unique(hashes_lancamentos(df["Usuario"], pd.to_datetime(df["Data"]), df["Valor"], df["Descricao"]),
+                     return_counts=True)
+
+
+def test_repeticoes_iguais_em_blocos_diferentes_sao_importadas():
+    salvas = []
+    resumo = importar_extrato(ler_extrato(io.BytesIO(CSV), "extrato.csv", tamanho_bloco=2), "Carol",
+                              SEM_EXISTENTES, salvas.extend)
+    assert resumo == {"lidas": 4, "importadas": 4, "duplicadas": 0, "invalidas": 0}
+    assert [l[4] for l in salvas].count("Padaria") == 3
+
+
+def test_so_as_copias_ja_existentes_sao_ignoradas():
+    existentes = _existentes([["Carol", "2024-03-01", "Despesa", "Alimentação", "Padaria", 10.0, "Pix"]] * 2)
+    for tamanho_bloco in (1, 2, 5000):
+        salvas = []
+        resumo = importar_extrato(ler_extrato(io.BytesIO(CSV), "extrato.csv", tamanho_bloco=tamanho_bloco), "Carol",
+                                  existentes, salvas.extend)
+        assert resumo["duplicadas"] == 2
+        assert sorted(l[4] for l in salvas) == ["Mercado", "Padaria"]
+
+
+def test_arquivo_continua_aberto_para_a_barra_de_progresso():
+    arquivo = io.BytesIO(CSV)
+    posicoes = []
+    importar_extrato(ler_extrato(arquivo, "extrato.csv"), "Carol", SEM_EXISTENTES, lambda lote: None,
+                     ao_progresso=lambda resumo: posicoes.append(arquivo.tell()))
+    assert not arquivo.closed
+    assert posicoes[-1] == len(CSV)
+
+
+def test_lancamentos_ainda_na_fila_contam_como_existentes(tmp_path):
+    fila = FilaEscrita(lambda: PlanilhaFake(), caminho=tmp_path / "fila.jsonl")
+    importar_extrato(ler_extrato(io.BytesIO(CSV), "extrato.csv"), "Carol", SEM_EXISTENTES, fila.enfileirar_lote)
+    assert fila.pendentes == 4
+
+    # A fila ainda não enviou nada: a planilha (e carregar_dados) continua sem esses lançamentos
+    livro = tipar_dados(pd.DataFrame([["Marcio", "2024-01-05", "Despesa", "Outros", "Padaria", 10.0, "Pix"]],
+                                     columns=COLUNAS))
+    pendentes = pd.DataFrame(fila.linhas_pendentes(), columns=COLUNAS)
+    salvas = []
+    resumo = importar_extrato(ler_extrato(io.BytesIO(CSV), "extrato.csv"), "Carol",
+                              obter_indice_hashes(livro, pendentes), salvas.extend)
+    assert resumo["duplicadas"] == 4 and salvas == []
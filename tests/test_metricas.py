@@ -0,0 +1,57 @@
+# tests/test_metricas.py
+import json
+
+import pytest
+
+import metricas
+from planilha_fake import PlanilhaFake
+
+
+@pytest.fixture
+def medindo():
+    metricas.limpar()
+    metricas.ativar()
+    yield
+    metricas.desativar()
+    metricas.limpar()
+
+
+def test_desligada_nao_registra():
+    metricas.limpar()
+    metricas.registrar_etapa("x", 0.1)
+    with metricas.etapa("y") as m:
+        m.linhas = 10
+    assert metricas.resumo()["etapas"] == []
+
+
+def test_eventos_ficam_num_buffer_de_tamanho_fixo(medindo):
+    for i in range(metricas.MAX_EVENTOS + 50):
+        metricas.registrar_cache("c", acerto=i % 2 == 0)
+    medidas = metricas.resumo()
+    assert len(medidas["eventos"]) == metricas.MAX_EVENTOS
+    assert medidas["caches"][0]["acertos"] + medidas["caches"][0]["faltas"] == metricas.MAX_EVENTOS + 50
+
+
+def test_arquivo_gravado_em_lotes_e_rotacionado(medindo, tmp_path, monkeypatch):
+    caminho = tmp_path / "metricas.jsonl"
+    monkeypatch.setattr(metricas, "CAMINHO_METRICAS", str(caminho))
+    monkeypatch.setattr(metricas, "TAMANHO_MAXIMO_ARQUIVO", 2000)
+
+    for _ in range(metricas.TAMANHO_LOTE_ARQUIVO - 1):
+        metricas.registrar_etapa("e", 0.001)
+    assert not caminho.exists() # Ainda não formou um lote
+    metricas.registrar_etapa("e", 0.001)
+    assert len(caminho.read_text(encoding="utf-8").splitlines()) == metricas.TAMANHO_LOTE_ARQUIVO
+
+    for _ in range(metricas.TAMANHO_LOTE_ARQUIVO):
+        metricas.registrar_etapa("e", 0.001)
+    assert (tmp_path / "metricas.jsonl.1").exists()
+    assert all(json.loads(l)["nome"] == "e" for l in caminho.read_text(encoding="utf-8").splitlines())
+
+
+def test_consulta_de_modificacao_da_planilha_e_contada(medindo):
+    aba = metricas.WorksheetMedida(PlanilhaFake())
+    aba.spreadsheet.get_lastUpdateTime()
+    aba.get_all_values()
+    operacoes = {a["operacao"]: a["chamadas"] for a in metricas.resumo()["apis"]}
+    assert operacoes == {"get_lastUpdateTime": 1, "get_all_values": 1}
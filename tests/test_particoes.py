@@ -0,0 +1,90 @@
+# tests/test_particoes.py
+from datetime import date
+
+import pytest
+
+from armazenamento import ArmazenamentoParticionado, chave_particao
+from planilha_fake import PlanilhaFake, PastaPlanilhaFake, gerar_linhas
+from sincronizacao import descartar_copia
+
+ANO_ATUAL = date.today().year
+
+
+@pytest.fixture
+def pasta():
+    linhas = gerar_linhas(600, inicio=date(ANO_ATUAL - 3, 1, 1))
+    pasta = PastaPlanilhaFake([PlanilhaFake(linhas, title="Sheet1")])
+    yield pasta
+    for ano in range(ANO_ATUAL - 3, ANO_ATUAL + 1):
+        descartar_copia(f"particao_{ano}")
+
+
+def _chamadas(pasta):
+    return {titulo: aba.chamadas for titulo, aba in pasta.abas.items()}
+
+
+def test_chave_particao():
+    assert chave_particao(date(2023, 5, 1)) == "2023"
+    assert chave_particao("2023-05-07", "mes") == "2023-05"
+    assert chave_particao("07/05/2023", "mes") == "2023-05"
+    assert chave_particao("ontem") is None
+
+
+def test_migracao_pode_ser_repetida_depois_de_uma_falha(pasta):
+    origem = pasta.abas["Sheet1"]
+    ano_com_falha = f"Lançamentos {ANO_ATUAL - 1}"
+    append_original = PlanilhaFake.append_rows
+
+    def append_com_falha(self, valores, **kwargs):
+        if self.title == ano_com_falha:
+            raise ConnectionError("quota excedida")
+        return append_original(self, valores, **kwargs)
+
+    armazenamento = ArmazenamentoParticionado(lambda: pasta)
+    PlanilhaFake.append_rows = append_com_falha
+    try:
+        with pytest.raises(ConnectionError):
+            armazenamento.migrar(origem)
+    finally:
+        PlanilhaFake.append_rows = append_original
+
+    resultado = armazenamento.migrar(origem)
+    assert resultado["ja_migradas"] > 0 and resultado["copiadas"] > 0
+    assert resultado["ja_migradas"] + resultado["copiadas"] == len(origem.valores) - 1
+    assert sum(len(a.valores) - 1 for t, a in pasta.abas.items() if t != "Sheet1") == len(origem.valores) - 1
+    assert armazenamento.migrar(origem)["copiadas"] == 0
+
+
+def test_migracao_lista_datas_invalidas(pasta):
+    origem = pasta.abas["Sheet1"]
+    origem.valores.append(["Carol", "ontem", "Despesa", "Outros", "?", "1.00", "Pix"])
+    resultado = ArmazenamentoParticionado(lambda: pasta).migrar(origem)
+    assert resultado["datas_invalidas"] == [(len(origem.valores), "ontem")]
+    assert resultado["copiadas"] == len(origem.valores) - 2
+
+
+def test_recarga_so_rele_o_periodo_atual_e_confere_os_encerrados(pasta):
+    ArmazenamentoParticionado(lambda: pasta).migrar(pasta.abas["Sheet1"])
+    armazenamento = ArmazenamentoParticionado(lambda: pasta, intervalo_revalidacao=3600)
+    _, linhas, versao = armazenamento.carregar()
+
+    antes = _chamadas(pasta)
+    assert armazenamento.carregar()[2] == versao
+    relidas = {t for t, n in _chamadas(pasta).items() if n != antes[t]}
+    assert relidas == {f"Lançamentos {ANO_ATUAL}"}
+
+    # Lançamento acrescentado direto na planilha num ano encerrado: aparece na conferência seguinte
+    pasta.abas[f"Lançamentos {ANO_ATUAL - 2}"].append_rows(
+        [["Carol", f"{ANO_ATUAL - 2}-12-31", "Despesa", "Outros", "atrasado", "5.00", "Pix"]])
+    assert len(armazenamento.carregar()[1]) == len(linhas)
+    armazenamento.intervalo_revalidacao = 0
+    assert len(armazenamento.carregar()[1]) == len(linhas) + 1
+
+
+def test_carga_ignora_periodos_fora_do_intervalo(pasta):
+    ArmazenamentoParticionado(lambda: pasta).migrar(pasta.abas["Sheet1"])
+    armazenamento = ArmazenamentoParticionado(lambda: pasta, inicio=f"{ANO_ATUAL - 1}-06-01")
+    antes = _chamadas(pasta)
+    _, linhas, _ = armazenamento.carregar()
+    assert min(l[1] for l in linhas) >= f"{ANO_ATUAL - 1}-01-01"
+    assert _chamadas(pasta)[f"Lançamentos {ANO_ATUAL - 3}"] == antes[f"Lançamentos {ANO_ATUAL - 3}"]
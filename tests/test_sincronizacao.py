@@ -0,0 +1,116 @@
+# tests/test_sincronizacao.py
+import time
+
+import pytest
+
+import sincronizacao
+from planilha_fake import PlanilhaFake, gerar_linhas
+from sincronizacao import sincronizar, descartar_copia
+
+
+class PlanilhaContada(PlanilhaFake):
+    """
+    Registra quantas vezes a aba foi baixada inteira (get_all_values) e lida a partir de uma linha (get).
+    """
+
+    def __init__(self, linhas):
+        super().__init__(linhas)
+        self.completas = 0
+        self.incrementais = 0
+
+    def get_all_values(self):
+        self.completas += 1
+        return super().get_all_values()
+
+    def get(self, range_name):
+        self.incrementais += 1
+        return super().get(range_name)
+
+
+@pytest.fixture
+def aba(request):
+    nome = request.node.name
+    descartar_copia(nome)
+    yield nome
+    descartar_copia(nome)
+
+
+def _sem_memoria(nome):
+    # Como numa nova execução do app: a cópia só existe no disco
+    sincronizacao._estados.pop(nome, None)
+
+
+def test_linhas_novas_acrescentadas_sem_reescrever_a_copia(aba):
+    planilha = PlanilhaContada(gerar_linhas(50))
+    _, _, versao = sincronizar(planilha, aba)
+    caminho = sincronizacao._caminho_estado(aba)
+    inicio = caminho.read_bytes()
+
+    assert sincronizar(planilha, aba)[2] == versao # Nada mudou: mesma versão
+    planilha.append_rows(gerar_linhas(3))
+    _, linhas, nova_versao = sincronizar(planilha, aba)
+    assert nova_versao != versao and len(linhas) == 53
+    assert caminho.read_bytes().startswith(inicio) # Só ganhou uma linha no fim
+    assert (planilha.completas, planilha.incrementais) == (1, 2)
+
+    _sem_memoria(aba)
+    assert sincronizar(planilha, aba) == (planilha.valores[0], linhas, nova_versao)
+    assert planilha.completas == 1
+
+
+def test_ancora_editada_faz_sincronizacao_completa(aba):
+    planilha = PlanilhaContada(gerar_linhas(20))
+    _, _, versao = sincronizar(planilha, aba)
+    planilha.valores[-1][4] = "Descrição editada"
+    planilha.append_rows(gerar_linhas(2))
+
+    _, linhas, nova_versao = sincronizar(planilha, aba)
+    assert planilha.completas == 2
+    assert linhas[19][4] == "Descrição editada" and len(linhas) == 22
+    assert nova_versao != versao
+
+
+def test_aba_que_encolheu_faz_sincronizacao_completa(aba):
+    planilha = PlanilhaContada(gerar_linhas(20))
+    sincronizar(planilha, aba)
+    del planilha.valores[5:]
+
+    _, linhas, _ = sincronizar(planilha, aba)
+    assert planilha.completas == 2 and len(linhas) == 4
+
+
+def test_sincronizacao_completa_periodica_mantem_a_versao_se_nada_mudou(aba):
+    planilha = PlanilhaContada(gerar_linhas(20))
+    sincronizar(planilha, aba)
+    planilha.append_rows(gerar_linhas(1))
+    _, _, versao = sincronizar(planilha, aba)
+
+    assert sincronizar(planilha, aba, intervalo_resync=0)[2] == versao
+    assert planilha.completas == 2
+    _sem_memoria(aba)
+    assert sincronizar(planilha, aba, intervalo_resync=None)[2] == versao
+    assert planilha.completas == 2
+
+
+def test_gravacao_interrompida_no_fim_da_copia_faz_sincronizacao_completa(aba):
+    planilha = PlanilhaContada(gerar_linhas(20))
+    sincronizar(planilha, aba)
+    planilha.append_rows(gerar_linhas(2))
+    sincronizar(planilha, aba)
+    caminho = sincronizacao._caminho_estado(aba)
+    caminho.write_bytes(caminho.read_bytes()[:-10])
+    _sem_memoria(aba)
+
+    _, linhas, _ = sincronizar(planilha, aba)
+    assert planilha.completas == 2 and len(linhas) == 22
+
+
+def test_copia_alterada_por_fora_e_relida(aba):
+    planilha = PlanilhaContada(gerar_linhas(20))
+    sincronizar(planilha, aba)
+    caminho = sincronizacao._caminho_estado(aba)
+    time.sleep(0.01)
+    caminho.write_text("{}", encoding="utf-8") # A memória não vale mais: o arquivo mudou
+
+    sincronizar(planilha, aba)
+    assert planilha.completas == 2